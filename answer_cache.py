@@ -0,0 +1,182 @@
+"""
+Semantic answer cache keyed on query embeddings
+Lets near-paraphrases of answered questions skip retrieval and generation
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+from faq_store import atomic_write
+from metrics import Metrics
+
+
+class SemanticAnswerCache:
+    """Caches localized answers for English queries, matched by cosine similarity"""
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 2000,
+                 ttl_seconds: float = 24 * 3600, path: Optional[str] = None, save_every: int = 20):
+        """
+        Initialize the cache
+
+        Args:
+            threshold: Minimum cosine similarity between query embeddings for a hit
+            max_entries: Maximum number of cached queries (LRU eviction)
+            ttl_seconds: Time after which cached answers expire
+            path: Optional .npz file used to persist the cache across restarts
+            save_every: Write the backing file after this many stores
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.save_every = save_every
+        self.metrics = Metrics()
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._next_id = 0
+        self._matrix = None
+        self._matrix_ids: List[int] = []
+        self._unsaved = 0
+
+        if path:
+            if os.path.exists(path):
+                self.load()
+            atexit.register(self._save_at_exit)
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        """Return the vector as a unit-length float32 array."""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _match(self, vector: np.ndarray) -> Optional[int]:
+        """Find the id of the most similar live entry above the threshold. Caller holds the lock."""
+        if not self._entries:
+            return None
+        if self._matrix is None:
+            self._matrix_ids = list(self._entries)
+            self._matrix = np.stack([self._entries[i]['vector'] for i in self._matrix_ids])
+
+        similarities = self._matrix @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+
+        entry_id = self._matrix_ids[best]
+        if time.time() - self._entries[entry_id]['created'] > self.ttl_seconds:
+            self._remove(entry_id)
+            self.metrics.incr('expired')
+            return None
+        return entry_id
+
+    def _remove(self, entry_id: int):
+        """Drop an entry and invalidate the similarity matrix. Caller holds the lock."""
+        del self._entries[entry_id]
+        self._matrix = None
+
+    def lookup(self, vector) -> Optional[Dict[str, str]]:
+        """
+        Find cached answers for a query embedding
+
+        Args:
+            vector: Embedding of the English query
+
+        Returns:
+            Dictionary of language code -> answer for the closest cached query,
+            or None if nothing is similar enough
+        """
+        vector = self._normalize(vector)
+        with self._lock:
+            entry_id = self._match(vector)
+            if entry_id is None:
+                self.metrics.incr('misses')
+                return None
+            self._entries.move_to_end(entry_id)
+            self.metrics.incr('hits')
+            return dict(self._entries[entry_id]['answers'])
+
+    def store(self, vector, query: str, answers: Dict[str, str]):
+        """
+        Store answers for a query embedding
+
+        Answers are merged into the matching entry if the query is already
+        cached, so one entry collects the answer in every language asked.
+
+        Args:
+            vector: Embedding of the English query
+            query: English query text
+            answers: Dictionary of language code -> answer (should include 'en')
+        """
+        vector = self._normalize(vector)
+        with self._lock:
+            entry_id = self._match(vector)
+            if entry_id is not None:
+                self._entries[entry_id]['answers'].update(answers)
+                self._entries.move_to_end(entry_id)
+            else:
+                self._entries[self._next_id] = {
+                    'vector': vector,
+                    'query': query,
+                    'answers': dict(answers),
+                    'created': time.time(),
+                }
+                self._next_id += 1
+                self._matrix = None
+                while len(self._entries) > self.max_entries:
+                    self._remove(next(iter(self._entries)))
+                    self.metrics.incr('evictions')
+
+            self._unsaved += 1
+            should_save = self.path and self._unsaved >= self.save_every
+
+        if should_save:
+            self.save()
+
+    def save(self):
+        """Write live entries to the backing file."""
+        if not self.path:
+            return
+        with self._lock:
+            entries = list(self._entries.values())
+            meta = [{'query': e['query'], 'answers': dict(e['answers']), 'created': e['created']} for e in entries]
+            self._unsaved = 0
+        if not entries:
+            # Don't leave expired or cleared entries behind for the next load
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+
+        with atomic_write(self.path, suffix=".npz") as tmp_path:
+            np.savez(tmp_path, vectors=np.stack([e['vector'] for e in entries]), meta=np.array(json.dumps(meta)))
+
+    def _save_at_exit(self):
+        """Persist unsaved entries when the process exits."""
+        if self._unsaved:
+            try:
+                self.save()
+            except OSError as e:
+                print(f"Could not save answer cache to {self.path}: {e}")
+
+    def load(self):
+        """Load unexpired entries from the backing file."""
+        data = np.load(self.path)
+        meta = json.loads(str(data['meta']))
+        now = time.time()
+        with self._lock:
+            for vector, item in zip(data['vectors'], meta):
+                if now - item['created'] > self.ttl_seconds:
+                    continue
+                self._entries[self._next_id] = dict(item, vector=vector)
+                self._next_id += 1
+            self._matrix = None
+        print(f"Loaded {len(self._entries)} cached answers from {self.path}")
+
+    def __len__(self) -> int:
+        """Number of cached queries."""
+        return len(self._entries)
@@ -0,0 +1,191 @@
+"""
+Pre-translated FAQ answers stored next to the FAISS index
+
+Usage:
+    python answer_translations.py --languages es,fr,de
+
+An offline job translates every FAQ answer into the configured languages with
+batched Translation requests and writes one SQLite sidecar per language
+(answers.<lang>.sqlite). Direct FAQ answers and fallback answers in those
+languages are then served from the sidecars without remote calls. Entries are
+keyed by a hash of the English answer, so an edited answer is never served a
+stale translation; re-run the job after updating the index to cover it.
+"""
+import argparse
+import glob
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+from faq_store import DOCSTORE_FILE, atomic_write
+from metrics import Metrics
+
+
+TRANSLATIONS_FILE = "answers.{language}.sqlite"
+_TRANSLATIONS_FILE_RE = re.compile(r"^answers\.([\w-]+)\.sqlite$")
+
+
+def answer_key(answer: str) -> str:
+    """Stable hash of an English answer, used as its key in the sidecars."""
+    return hashlib.sha256(answer.encode('utf-8')).hexdigest()[:16]
+
+
+def answer_languages() -> List[str]:
+    """Target languages of the pre-translation job, from ANSWER_LANGUAGES (comma-separated, default: none)."""
+    return [language.strip() for language in os.getenv("ANSWER_LANGUAGES", "").split(",") if language.strip()]
+
+
+class AnswerTranslations:
+    """Read-only lookup of pre-translated answers, one sidecar per language"""
+
+    def __init__(self, index_path: str, languages: Iterable[str]):
+        """
+        Open the sidecars of an index
+
+        Args:
+            index_path: Directory the index was saved to
+            languages: Languages with a sidecar in index_path
+        """
+        self.index_path = index_path
+        self.languages = sorted(languages)
+        self.metrics = Metrics()
+        self._lock = threading.Lock()
+        self._dbs: Dict[str, sqlite3.Connection] = {}
+        for language in self.languages:
+            path = os.path.join(index_path, TRANSLATIONS_FILE.format(language=language))
+            self._dbs[language] = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+    @classmethod
+    def load(cls, index_path: str) -> Optional["AnswerTranslations"]:
+        """Open every sidecar saved next to an index, or return None if there are none."""
+        languages = []
+        for path in glob.glob(os.path.join(index_path, TRANSLATIONS_FILE.format(language="*"))):
+            match = _TRANSLATIONS_FILE_RE.match(os.path.basename(path))
+            if match:
+                languages.append(match.group(1))
+        return cls(index_path, languages) if languages else None
+
+    def get(self, answer: str, language: str) -> Optional[str]:
+        """
+        Look up the translation of an English answer
+
+        Returns:
+            The pre-translated answer, or None if the language or answer is not covered
+        """
+        db = self._dbs.get(language)
+        if db is None:
+            self.metrics.incr('misses')
+            return None
+        with self._lock:
+            row = db.execute("SELECT text FROM answers WHERE key = ?", (answer_key(answer),)).fetchone()
+        self.metrics.incr('hits' if row else 'misses')
+        return row[0] if row else None
+
+    def close(self):
+        """Close the sidecar connections."""
+        for db in self._dbs.values():
+            db.close()
+        self._dbs = {}
+
+
+def _index_answers(index_path: str) -> List[str]:
+    """Distinct answers of the FAQs in a saved index."""
+    db = sqlite3.connect(f"file:{os.path.join(index_path, DOCSTORE_FILE)}?mode=ro", uri=True)
+    try:
+        return [answer for (answer,) in db.execute("SELECT DISTINCT answer FROM faqs ORDER BY position")]
+    finally:
+        db.close()
+
+
+def _read_existing(path: str) -> Dict[str, str]:
+    """Entries of an existing sidecar (key -> translation), or nothing."""
+    if not os.path.exists(path):
+        return {}
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return dict(db.execute("SELECT key, text FROM answers"))
+    finally:
+        db.close()
+
+
+def write_translations(index_path: str, language: str, translations: Dict[str, str]):
+    """Write the sidecar of one language atomically (key -> translation)."""
+    path = os.path.join(index_path, TRANSLATIONS_FILE.format(language=language))
+    with atomic_write(path) as tmp_path:
+        db = sqlite3.connect(tmp_path)
+        try:
+            db.execute("CREATE TABLE answers (key TEXT PRIMARY KEY, text TEXT NOT NULL) WITHOUT ROWID")
+            db.executemany("INSERT INTO answers (key, text) VALUES (?, ?)", sorted(translations.items()))
+            db.commit()
+            db.execute("VACUUM")
+        finally:
+            db.close()
+
+
+def translate_answers(index_path: str, languages: Iterable[str], translation_service,
+                      extra_texts: Iterable[str] = ()) -> Dict[str, Dict[str, int]]:
+    """
+    Pre-translate the answers of a saved index
+
+    Answers already in a language's sidecar are kept, the rest are translated
+    with batched requests, and entries for answers no longer in the index are
+    dropped.
+
+    Args:
+        index_path: Directory the index was saved to
+        languages: Target language codes
+        translation_service: TranslationService used for the batched requests
+        extra_texts: Other English texts to pre-translate (e.g. the no-answer message)
+
+    Returns:
+        Per language, the number of 'translated', 'kept' and 'dropped' entries
+    """
+    answers = list(dict.fromkeys([*_index_answers(index_path), *extra_texts]))
+    keys = [answer_key(answer) for answer in answers]
+    stats = {}
+    for language in languages:
+        if language == 'en':
+            continue
+        path = os.path.join(index_path, TRANSLATIONS_FILE.format(language=language))
+        existing = _read_existing(path)
+        missing = [i for i, key in enumerate(keys) if key not in existing]
+        translated = translation_service.translate_batch_from_english([answers[i] for i in missing], language)
+
+        translations = {key: existing[key] for key in keys if key in existing}
+        translations.update((keys[i], text) for i, text in zip(missing, translated))
+        write_translations(index_path, language, translations)
+        stats[language] = {
+            'translated': len(missing),
+            'kept': len(answers) - len(missing),
+            'dropped': len(set(existing) - set(keys)),
+        }
+        print(f"{language}: {len(missing)} answers translated, {stats[language]['kept']} kept, "
+              f"{stats[language]['dropped']} dropped")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-translate FAQ answers into sidecars next to the index")
+    parser.add_argument("--languages", help="comma-separated language codes (default: ANSWER_LANGUAGES)")
+    parser.add_argument("--index-path", default="faiss_index")
+    args = parser.parse_args()
+
+    load_dotenv()
+    languages = [language.strip() for language in args.languages.split(",")] if args.languages else answer_languages()
+    if not languages:
+        parser.error("no languages given (use --languages or set ANSWER_LANGUAGES)")
+
+    from pipeline import NO_ANSWER_TEXT
+    from rate_limiter import BATCH, request_priority
+    from services import create_translation_service
+    translation_service = create_translation_service()
+    with request_priority(BATCH):
+        translate_answers(args.index_path, languages, translation_service, extra_texts=[NO_ANSWER_TEXT])
+    print(f"Done: {translation_service.metrics.get('remote_calls')} Translation API calls")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,8 @@ Main Streamlit application for multilingual chatbot
 import streamlit as st
 import os
 from dotenv import load_dotenv
-from translation_service import TranslationService
-from vectorstore_service import VectorStoreService
-from vertexai_service import VertexAIService
+from pipeline import stream_query
+from services import create_answer_cache, create_services, create_single_flight, direct_answer_threshold
 
 load_dotenv()
 
@@ -191,60 +190,40 @@ st.markdown("""
 def init_services():
     """Initialize all services."""
     try:
-        project_id = os.getenv("GCP_PROJECT_ID")
-        region = os.getenv("GCP_REGION", "us-central1")
-        
-        if not project_id:
-            return None, None, None, "GCP_PROJECT_ID not found. Please set it in your .env file."
-        
-        print("Initializing translation service...")
-        translation_service = TranslationService()
-        
-        use_openai = bool(os.getenv("OPENAI_API_KEY")) and os.getenv("USE_OPENAI_EMBEDDINGS", "false").lower() == "true"
-        print("Initializing vector store service...")
-        vector_service = VectorStoreService(use_openai=use_openai)
-        
-        print("Initializing Vertex AI service...")
-        vertexai_service = VertexAIService(project_id=project_id, location=region)
-        
-        print("Loading vector store...")
-        vector_service.load_vectorstore()
-        
-        print("All services initialized successfully!")
+        translation_service, vector_service, vertexai_service = create_services()
         return translation_service, vector_service, vertexai_service, None
     except Exception as e:
         print(f"Error initializing services: {e}")
         return None, None, None, str(e)
 
 
-def process_query(user_input: str, translation_service, vector_service, vertexai_service):
-    """Process user query and generate AI-powered answer."""
-    try:
-        detected_lang, translated = translation_service.translate_with_detection(user_input)
-        relevant_faqs = vector_service.get_relevant_context(translated, k=5)
-        
-        if relevant_faqs:
-            context_parts = []
-            for i, faq in enumerate(relevant_faqs, 1):
-                context_parts.append(f"Q{i}: {faq['question']}\nA{i}: {faq['answer']}")
-            context_text = "\n\n".join(context_parts)
-        else:
-            context_text = "No relevant information found in the knowledge base."
-        
-        answer_en = vertexai_service.generate_answer(translated, context_text)
-        
-        if answer_en is None:
-            if relevant_faqs:
-                answer_en = relevant_faqs[0]['answer']
-            else:
-                answer_en = "I couldn't find relevant information to answer your question. Please try rephrasing or ask about something else."
-        
-        final_answer = translation_service.translate_from_english(answer_en, detected_lang)
-        return final_answer, None
-    except Exception as e:
-        error_msg = str(e)
-        print(f"Error in process_query: {error_msg}")
-        return None, f"Error processing query: {error_msg}"
+@st.cache_resource(show_spinner=False)
+def init_answer_cache():
+    """Initialize the semantic answer cache shared by all sessions."""
+    return create_answer_cache()
+
+
+@st.cache_resource(show_spinner=False)
+def init_single_flight():
+    """Initialize the request coalescing layer shared by all sessions."""
+    return create_single_flight()
+
+
+def message_html(role: str, content: str) -> str:
+    """Render a chat message as HTML."""
+    if role == "user":
+        return f"""
+                <div class="message user-message">
+                    <div class="message-label">You</div>
+                    {content}
+                </div>
+                """
+    return f"""
+                <div class="message assistant-message">
+                    <div class="message-label">Assistant</div>
+                    {content}
+                </div>
+                """
 
 
 def main():
@@ -258,6 +237,10 @@ def main():
     
     with st.spinner("Initializing services... This may take a minute on first run."):
         translation_service, vector_service, vertexai_service, error = init_services()
+        answer_cache = init_answer_cache()
+        single_flight = init_single_flight()
+    
+    answer_threshold = direct_answer_threshold()
     
     if error:
         st.markdown('<div class="main-content">', unsafe_allow_html=True)
@@ -282,25 +265,15 @@ def main():
         st.markdown('<div class="chat-messages">', unsafe_allow_html=True)
         
         for message in st.session_state.messages:
-            if message["role"] == "user":
-                st.markdown(f"""
-                <div class="message user-message">
-                    <div class="message-label">You</div>
-                    {message["content"]}
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                st.markdown(f"""
-                <div class="message assistant-message">
-                    <div class="message-label">Assistant</div>
-                    {message["content"]}
-                </div>
-                """, unsafe_allow_html=True)
+            st.markdown(message_html(message["role"], message["content"]), unsafe_allow_html=True)
         
         st.markdown('</div>', unsafe_allow_html=True)
     
         st.markdown('</div>', unsafe_allow_html=True)
     
+    # Filled while an answer is streaming; cleared by the rerun afterwards
+    response_placeholder = st.empty()
+    
     st.markdown('<div class="input-section">', unsafe_allow_html=True)
     st.markdown('<div class="input-wrapper">', unsafe_allow_html=True)
     
@@ -320,11 +293,29 @@ def main():
                 "content": user_input
             })
             
-            with st.spinner("Processing..."):
-                answer, error = process_query(user_input, translation_service, vector_service, vertexai_service)
+            def show_partial(text):
+                response_placeholder.markdown(
+                    message_html("user", user_input) + message_html("assistant", text),
+                    unsafe_allow_html=True
+                )
             
-            if error:
-                answer = f"I encountered an error: {error}"
+            answer = ""
+            try:
+                stream = stream_query(
+                    user_input, translation_service, vector_service, vertexai_service,
+                    answer_cache, answer_threshold, single_flight
+                )
+                with st.spinner("Processing..."):
+                    answer = next(stream, "")
+                show_partial(answer + "▌")
+                for chunk in stream:
+                    answer += chunk
+                    show_partial(answer + "▌")
+            except Exception as e:
+                error_msg = str(e)
+                print(f"Error in stream_query: {error_msg}")
+                error_text = f"I encountered an error: Error processing query: {error_msg}"
+                answer = f"{answer}\n\n{error_text}" if answer else error_text
             
             st.session_state.messages.append({
                 "role": "assistant",
@@ -0,0 +1,49 @@
+"""
+Helpers for running blocking client calls from asyncio code
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Get the shared, bounded thread pool for blocking calls
+
+    Its size is read from BLOCKING_POOL_SIZE (default: 32) on first use.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("BLOCKING_POOL_SIZE", "32")),
+                thread_name_prefix="rag-blocking"
+            )
+        return _executor
+
+
+async def run_blocking(func: Callable, *args, **kwargs):
+    """
+    Run a blocking function on the shared thread pool without blocking the event loop
+
+    The function runs in a copy of the caller's context, so context variables
+    such as the request priority of rate limits carry over.
+
+    Args:
+        func: Blocking callable
+        *args, **kwargs: Arguments passed to func
+
+    Returns:
+        The function's return value
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), functools.partial(context.run, func, *args, **kwargs))
@@ -0,0 +1,225 @@
+"""
+Batch question answering for offline bulk jobs (ticket backfills, eval runs)
+
+Usage:
+    python batch.py queries.jsonl answers.jsonl --concurrency 8
+
+Each input line is a JSON object with a "query" field and an optional "id"
+(a bare JSON string is also accepted). Results are written as JSON lines in
+completion order, so the output can be tailed while the job runs.
+"""
+import argparse
+import contextvars
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from dotenv import load_dotenv
+from pipeline import _direct_answer_faq, fallback_answer, localize_faq_answer, pipeline_metrics
+from rate_limiter import BATCH, request_priority
+
+
+def _query_error(item: Dict) -> Optional[str]:
+    """Why an input item cannot be answered, or None if it has a usable 'query'."""
+    query = item.get('query')
+    if not isinstance(query, str) or not query.strip():
+        return "'query' must be a non-empty string"
+    return None
+
+
+def read_queries(path: str) -> Iterator[Dict]:
+    """
+    Read queries from a JSONL file
+
+    Lines that are not valid JSON or have no usable query are yielded with
+    an 'error' instead of stopping the job; answer_batch writes them out
+    as error records.
+
+    Args:
+        path: Path to the input file
+
+    Yields:
+        Dictionaries with 'id' and 'query' (id defaults to the line number)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {'id': line_number, 'query': None, 'error': f"Invalid JSON on line {line_number}: {e}"}
+                continue
+            if isinstance(item, str):
+                item = {'query': item}
+            elif not isinstance(item, dict):
+                item = {'query': None}
+            item.setdefault('id', line_number)
+            error = _query_error(item)
+            if error is not None:
+                item['error'] = f"Invalid query on line {line_number}: {error}"
+            yield item
+
+
+def _chunks(items: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    """Split an iterable into lists of at most size items."""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _answer_one(item: Dict, detected_lang: str, translated: str, relevant_faqs: List[Dict],
+                translation_service, vector_service, vertexai_service, direct_answer_threshold: Optional[float],
+                answer_lang: str = 'en') -> Dict:
+    """Generate and localize the answer for one prepared query; the LLM answers in answer_lang."""
+    record = {'id': item['id'], 'query': item['query'], 'language': detected_lang}
+    try:
+        direct = _direct_answer_faq(relevant_faqs, direct_answer_threshold)
+        if direct is not None:
+            answer, record['source'] = direct['answer'], 'direct'
+        else:
+            answer = vertexai_service.generate_answer(translated, relevant_faqs, language=answer_lang)
+            record['source'] = 'llm' if answer is not None else 'fallback'
+            pipeline_metrics.incr('llm_answers' if answer is not None else 'llm_fallbacks')
+            if answer is None:
+                answer = fallback_answer(relevant_faqs)
+
+        if record['source'] != 'llm':
+            answer = localize_faq_answer(answer, detected_lang, translation_service, vector_service)
+        elif answer_lang != detected_lang:
+            answer = translation_service.translate_from_english(answer, detected_lang)
+        record['answer'] = answer
+        record['error'] = None
+    except Exception as e:
+        record['answer'] = None
+        record['error'] = f"Error processing query: {e}"
+    return record
+
+
+def _error_record(item: Dict, error: str) -> Dict:
+    """Result line for a query that could not be answered."""
+    return {'id': item.get('id'), 'query': item.get('query'), 'error': error}
+
+
+def _prepare_chunk(chunk: List[Dict], translation_service, vector_service, k: int) -> List[Tuple[str, str, List[Dict]]]:
+    """Translate (or detect), embed and search a chunk of queries with batched calls."""
+    texts = [item['query'] for item in chunk]
+    if vector_service.multilingual:
+        detections = list(zip(translation_service.detect_batch(texts), texts))
+    else:
+        detections = translation_service.translate_batch_with_detection(texts)
+    translated = [text for _, text in detections]
+    embeddings = vector_service.embed_queries(translated)
+    all_faqs = vector_service.search_by_vectors(embeddings, k=k, texts=translated)
+    return [(lang, text, faqs) for (lang, text), faqs in zip(detections, all_faqs)]
+
+
+def answer_batch(queries: Iterable[Dict], output: TextIO, translation_service, vector_service, vertexai_service,
+                 concurrency: int = 8, chunk_size: int = 256, k: int = 5,
+                 direct_answer_threshold: Optional[float] = None) -> Dict:
+    """
+    Answer many queries, writing one JSON line per result as it completes
+
+    Each chunk of queries is translated with batched Translation requests
+    (with cross-lingual retrieval, only their languages are detected),
+    embedded in one embed_documents call and searched with one FAISS call;
+    LLM calls are then dispatched with bounded concurrency. The next chunk
+    is prepared while the previous chunk's LLM calls are in flight. Remote
+    calls run at batch priority, so rate-limited services serve interactive
+    requests first.
+
+    Invalid queries, and every query of a chunk whose batched calls fail,
+    are written as error records and the job continues.
+
+    Args:
+        queries: Dictionaries with 'id' and 'query'
+        output: Text file the JSONL results are written to
+        translation_service, vector_service, vertexai_service: Initialized services
+        concurrency: Maximum number of LLM calls in flight
+        chunk_size: Number of queries prepared together
+        k: Number of FAQs retrieved per query
+        direct_answer_threshold: Similarity above which FAQ answers skip the LLM
+
+    Returns:
+        Summary with 'total', 'errors' and 'seconds'
+    """
+    start = time.perf_counter()
+    total = errors = 0
+
+    def write(record: Dict):
+        nonlocal total, errors
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+        total += 1
+        errors += record['error'] is not None
+
+    def drain(futures):
+        for future in as_completed(futures):
+            write(future.result())
+        if futures:
+            elapsed = time.perf_counter() - start
+            print(f"Answered {total} queries ({total / elapsed:.1f} queries/sec, {errors} errors)")
+
+    in_flight = []
+    with request_priority(BATCH), ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-llm") as pool:
+        for chunk in _chunks(queries, chunk_size):
+            valid = []
+            for item in chunk:
+                error = item.get('error') or _query_error(item)
+                if error is None:
+                    valid.append(item)
+                else:
+                    write(_error_record(item, error))
+
+            futures = []
+            try:
+                prepared = _prepare_chunk(valid, translation_service, vector_service, k) if valid else []
+            except Exception as e:
+                print(f"Error preparing batch chunk: {e}")
+                for item in valid:
+                    write(_error_record(item, f"Error processing query: {e}"))
+            else:
+                futures = [
+                    pool.submit(contextvars.copy_context().run, _answer_one, item, lang, text, faqs,
+                                translation_service, vector_service, vertexai_service, direct_answer_threshold,
+                                lang if vector_service.multilingual else 'en')
+                    for item, (lang, text, faqs) in zip(valid, prepared)
+                ]
+
+            drain(in_flight)
+            in_flight = futures
+        drain(in_flight)
+
+    return {'total': total, 'errors': errors, 'seconds': time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of queries")
+    parser.add_argument("input", help="JSONL file with one query per line")
+    parser.add_argument("output", help="JSONL file to write answers to")
+    parser.add_argument("--concurrency", type=int, default=8, help="maximum LLM calls in flight")
+    parser.add_argument("--chunk-size", type=int, default=256, help="queries translated/embedded/searched together")
+    parser.add_argument("--k", type=int, default=5, help="FAQs retrieved per query")
+    args = parser.parse_args()
+
+    load_dotenv()
+    from services import create_services, direct_answer_threshold
+    translation_service, vector_service, vertexai_service = create_services()
+
+    with open(args.output, 'w', encoding='utf-8') as output:
+        summary = answer_batch(
+            read_queries(args.input), output, translation_service, vector_service, vertexai_service,
+            concurrency=args.concurrency, chunk_size=args.chunk_size, k=args.k,
+            direct_answer_threshold=direct_answer_threshold()
+        )
+
+    print(f"Done: {summary['total']} queries in {summary['seconds']:.1f}s, {summary['errors']} errors")
+
+
+if __name__ == "__main__":
+    main()
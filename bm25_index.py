@@ -0,0 +1,156 @@
+"""
+In-memory BM25 inverted index over FAQ text
+Complements dense retrieval with exact-term matching (product names, error codes)
+"""
+import json
+import re
+from typing import Dict, List, Tuple
+import numpy as np
+from faq_store import atomic_write
+
+
+BM25_FILE = "bm25.npz"
+
+_TOKEN_RE = re.compile(r"\w+(?:[-.]\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens
+
+    Compound tokens such as error codes ('E-1042', 'v2.3') are kept whole,
+    joined ('e1042') and split into their parts, so every spelling matches.
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if '-' in token or '.' in token:
+            parts = [part for part in re.split(r"[-.]", token) if part]
+            tokens.append("".join(parts))
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over documents identified by docstore id"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize an empty index
+
+        Args:
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[str] = []
+        self._lengths: List[int] = []
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._frozen = None
+
+    def add(self, doc_id: str, text: str):
+        """Index one document."""
+        row = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        tokens = tokenize(text)
+        self._lengths.append(len(tokens))
+        for token in tokens:
+            postings = self._postings.setdefault(token, {})
+            postings[row] = postings.get(row, 0) + 1
+        self._frozen = None
+
+    def _freeze(self) -> Dict:
+        """Pack the postings into flat arrays for vectorized scoring."""
+        if self._frozen is None:
+            terms = sorted(self._postings)
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            rows, tfs = [], []
+            for i, term in enumerate(terms):
+                postings = self._postings[term]
+                rows.extend(postings)
+                tfs.extend(postings.values())
+                offsets[i + 1] = len(rows)
+            self._frozen = {
+                'vocab': {term: i for i, term in enumerate(terms)},
+                'offsets': offsets,
+                'rows': np.asarray(rows, dtype=np.int32),
+                'tfs': np.asarray(tfs, dtype=np.float32),
+                'lengths': np.asarray(self._lengths, dtype=np.float32),
+            }
+        return self._frozen
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Score documents against a query
+
+        Args:
+            query: Query text
+            k: Number of results
+
+        Returns:
+            List of (doc id, BM25 score), best first; only documents sharing a term
+        """
+        if not self.doc_ids:
+            return []
+        index = self._freeze()
+        lengths = index['lengths']
+        n_docs = len(lengths)
+        avg_length = max(float(lengths.mean()), 1.0)
+
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = index['vocab'].get(term)
+            if term_id is None:
+                continue
+            start, end = index['offsets'][term_id], index['offsets'][term_id + 1]
+            rows = index['rows'][start:end]
+            tfs = index['tfs'][start:end]
+            idf = np.log1p((n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[rows] / avg_length)
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(self.doc_ids[row], float(scores[row])) for row in candidates]
+
+    def save(self, path: str):
+        """Write the index as plain arrays (no pickle)."""
+        index = self._freeze()
+        terms = sorted(index['vocab'], key=index['vocab'].get)
+        # np.savez appends .npz to other names
+        with atomic_write(path, suffix=".tmp.npz") as tmp_path:
+            np.savez(
+                tmp_path,
+                params=np.array([self.k1, self.b]),
+                terms=np.array(json.dumps(terms)),
+                doc_ids=np.array(json.dumps(self.doc_ids)),
+                offsets=index['offsets'],
+                rows=index['rows'],
+                tfs=index['tfs'],
+                lengths=index['lengths'],
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Read an index written by save (for searching; rebuild to add documents)."""
+        data = np.load(path)
+        k1, b = data['params'].tolist()
+        bm25 = cls(k1=k1, b=b)
+        bm25.doc_ids = json.loads(str(data['doc_ids']))
+        bm25._lengths = data['lengths'].astype(int).tolist()
+        terms = json.loads(str(data['terms']))
+        bm25._frozen = {
+            'vocab': {term: i for i, term in enumerate(terms)},
+            'offsets': data['offsets'],
+            'rows': data['rows'],
+            'tfs': data['tfs'],
+            'lengths': data['lengths'],
+        }
+        return bm25
+
+    def __len__(self) -> int:
+        """Number of indexed documents."""
+        return len(self.doc_ids)
@@ -0,0 +1,174 @@
+"""
+Context assembly for the LLM prompt
+Drops low-scoring and redundant FAQ hits and fits the rest into a token budget
+"""
+import os
+from typing import Callable, Dict, List, NamedTuple, Optional
+import numpy as np
+from metrics import Metrics
+
+
+NO_CONTEXT_TEXT = "No relevant information found in the knowledge base."
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (Gemini averages about four characters per token on English text)."""
+    return max(1, -(-len(text) // 4)) if text else 0
+
+
+def format_faq(i: int, faq: Dict) -> str:
+    """Format one FAQ as a numbered question/answer pair."""
+    return f"Q{i}: {faq['question']}\nA{i}: {faq['answer']}"
+
+
+def format_context(faqs: List[Dict]) -> str:
+    """Format FAQs as the context block for the LLM prompt."""
+    if not faqs:
+        return NO_CONTEXT_TEXT
+    return "\n\n".join(format_faq(i, faq) for i, faq in enumerate(faqs, 1))
+
+
+class ContextResult(NamedTuple):
+    """Assembled context and what was left out of it"""
+    text: str
+    faqs: List[Dict]
+    tokens: int
+    below_min_score: int
+    duplicates: int
+    over_budget: int
+    truncated: int
+
+
+class ContextBuilder:
+    """Selects the retrieved FAQs sent to the LLM"""
+
+    def __init__(self, max_tokens: int = 1000, min_score: Optional[float] = 0.3,
+                 dedup_threshold: Optional[float] = 0.92,
+                 embed: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 token_counter: Callable[[str], int] = estimate_tokens):
+        """
+        Initialize the builder
+
+        Args:
+            max_tokens: Token budget of the context block
+            min_score: Minimum retrieval score of a FAQ (None: keep all)
+            dedup_threshold: Cosine similarity between answers above which a FAQ
+                             repeats a better-ranked one (None: no deduplication)
+            embed: Function embedding a list of texts, used to compare answers
+                   (None: only identical answers count as duplicates)
+            token_counter: Function counting the tokens of a text
+        """
+        self.max_tokens = max_tokens
+        self.min_score = min_score
+        self.dedup_threshold = dedup_threshold
+        self.embed = embed
+        self.token_counter = token_counter
+        self.metrics = Metrics()
+
+    @classmethod
+    def from_env(cls, embed: Optional[Callable[[List[str]], List[List[float]]]] = None) -> "ContextBuilder":
+        """
+        Build a builder from environment variables
+
+        CONTEXT_MAX_TOKENS (default 1000), CONTEXT_MIN_SCORE (default 0.3),
+        CONTEXT_DEDUP_THRESHOLD (default 0.92); an empty value disables the
+        score cutoff or deduplication
+        """
+        min_score = os.getenv("CONTEXT_MIN_SCORE", "0.3")
+        dedup_threshold = os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.92")
+        return cls(
+            max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "1000")),
+            min_score=float(min_score) if min_score else None,
+            dedup_threshold=float(dedup_threshold) if dedup_threshold else None,
+            embed=embed,
+        )
+
+    def _deduplicate(self, faqs: List[Dict]) -> List[Dict]:
+        """Keep each FAQ unless its answer is near-identical to a better-ranked kept one."""
+        if self.dedup_threshold is None or len(faqs) < 2:
+            return faqs
+
+        answers = [" ".join(faq['answer'].lower().split()) for faq in faqs]
+        if self.embed is None:
+            similarities = np.array([[float(a == b) for b in answers] for a in answers])
+        else:
+            vectors = np.asarray(self.embed([faq['answer'] for faq in faqs]), dtype=np.float32)
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+            similarities = vectors @ vectors.T
+
+        kept = []
+        for i in range(len(faqs)):
+            if not kept or similarities[i, kept].max() < self.dedup_threshold:
+                kept.append(i)
+        return [faqs[i] for i in kept]
+
+    def _truncate(self, i: int, faq: Dict, budget: int) -> Optional[Dict]:
+        """Shorten the FAQ's answer (at a word boundary) so that its block fits the budget."""
+        words = faq['answer'].split()
+        low, high = 0, len(words)
+        # Longest prefix of the answer whose formatted block fits
+        while low < high:
+            middle = (low + high + 1) // 2
+            candidate = dict(faq, answer=" ".join(words[:middle]) + " ...")
+            if self.token_counter(format_faq(i, candidate)) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        if low == 0:
+            return None
+        return dict(faq, answer=" ".join(words[:low]) + " ...")
+
+    def build(self, relevant_faqs: List[Dict]) -> ContextResult:
+        """
+        Assemble the context block from retrieved FAQs
+
+        FAQs are taken best first: those scoring below min_score and those
+        repeating an answer already kept are dropped, then FAQs are added
+        until the token budget is reached. The FAQ that crosses the budget
+        has its answer cut at a word boundary when part of it still fits.
+
+        Args:
+            relevant_faqs: Retrieved FAQs with 'question', 'answer' and 'score', best first
+
+        Returns:
+            ContextResult with the context text and the FAQs and tokens it contains
+        """
+        candidates = [faq for faq in relevant_faqs
+                      if self.min_score is None or faq.get('score', 1.0) >= self.min_score]
+        below_min_score = len(relevant_faqs) - len(candidates)
+        unique = self._deduplicate(candidates)
+        duplicates = len(candidates) - len(unique)
+
+        selected, tokens, truncated = [], 0, 0
+        separator = self.token_counter("\n\n")
+        for faq in unique:
+            i = len(selected) + 1
+            cost = self.token_counter(format_faq(i, faq)) + (separator if selected else 0)
+            if tokens + cost > self.max_tokens:
+                remaining = self.max_tokens - tokens - (separator if selected else 0)
+                shortened = self._truncate(i, faq, remaining)
+                if shortened is not None:
+                    selected.append(shortened)
+                    tokens += self.token_counter(format_faq(i, shortened)) + (separator if i > 1 else 0)
+                    truncated = 1
+                break
+            selected.append(faq)
+            tokens += cost
+
+        text = format_context(selected)
+        result = ContextResult(
+            text=text,
+            faqs=selected,
+            tokens=self.token_counter(text) if selected else 0,
+            below_min_score=below_min_score,
+            duplicates=duplicates,
+            over_budget=len(unique) - len(selected),
+            truncated=truncated,
+        )
+        self.metrics.observe('context_tokens', result.tokens)
+        self.metrics.observe('context_faqs', len(selected))
+        self.metrics.incr('below_min_score', below_min_score)
+        self.metrics.incr('duplicates', duplicates)
+        self.metrics.incr('over_budget', result.over_budget)
+        self.metrics.incr('truncated', truncated)
+        return result
@@ -0,0 +1,82 @@
+"""
+Embedding model construction shared by the vector store and the index builder
+"""
+import os
+from typing import Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+HUGGINGFACE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Maps paraphrases in 50+ languages close to each other, so queries need no translation
+MULTILINGUAL_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+OPENAI_MODEL = "text-embedding-3-small"
+BACKENDS = ('torch', 'onnx', 'onnx-int8')
+
+
+def embedding_backend() -> str:
+    """Read the HuggingFace encoder backend from EMBEDDING_BACKEND (torch, onnx or onnx-int8)."""
+    backend = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    return backend
+
+
+def multilingual_enabled() -> bool:
+    """Check whether MULTILINGUAL_EMBEDDINGS asks for the multilingual HuggingFace model."""
+    return os.getenv("MULTILINGUAL_EMBEDDINGS", "false").lower() == "true"
+
+
+def create_embeddings(use_openai: bool = False, cache_dir: Optional[str] = None,
+                      backend: Optional[str] = None, multilingual: bool = False) -> Tuple[str, Embeddings]:
+    """
+    Create the embedding model
+
+    Args:
+        use_openai: If True, use OpenAI embeddings (requires credits).
+                    If False, use free HuggingFace embeddings
+        cache_dir: Directory of a persistent embedding cache (None: no cache)
+        backend: Encoder for the HuggingFace model: 'torch' (sentence-transformers),
+                 'onnx' or 'onnx-int8' (ONNX Runtime, no PyTorch)
+                 (default: EMBEDDING_BACKEND environment variable)
+        multilingual: Use the multilingual HuggingFace model instead of the
+                      English one (ignored with OpenAI embeddings)
+
+    Returns:
+        Tuple of (model name, LangChain embeddings)
+    """
+    backend = backend or embedding_backend()
+    hf_model = MULTILINGUAL_MODEL if multilingual else HUGGINGFACE_MODEL
+    cache_name = None
+    if use_openai:
+        from langchain_openai import OpenAIEmbeddings
+        model_name, normalize = OPENAI_MODEL, False
+        embeddings = OpenAIEmbeddings(
+            model=OPENAI_MODEL,
+            api_key=os.getenv("OPENAI_API_KEY"),
+        )
+    elif backend != 'torch':
+        from onnx_encoder import ONNX_MODEL_FILES, OnnxEmbeddings
+        model_name, normalize = hf_model, True
+        embeddings = OnnxEmbeddings(
+            hf_model,
+            model_file=os.getenv("ONNX_MODEL_FILE") or ONNX_MODEL_FILES[backend],
+            model_dir=os.getenv("ONNX_MODEL_DIR") or None,
+            threads=int(os.getenv("ONNX_THREADS", "0")) or None,
+            max_length=128 if multilingual else 256,
+        )
+        # Same vector space as torch (indexes stay valid), but not bit-identical: cache separately
+        cache_name = f"{model_name}.{backend}"
+    else:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        model_name, normalize = hf_model, True
+        embeddings = HuggingFaceEmbeddings(
+            model_name=hf_model,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'normalize_embeddings': normalize}
+        )
+
+    if cache_dir:
+        embeddings = CachedEmbeddings(embeddings, EmbeddingCache(cache_dir, cache_name or model_name, normalize),
+                                      cache_queries=os.getenv("EMBEDDING_CACHE_QUERIES", "false").lower() == "true")
+    return model_name, embeddings
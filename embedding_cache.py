@@ -0,0 +1,221 @@
+"""
+Persistent embedding cache
+Vectors are appended to a memory-mapped float32 matrix per (model, normalization)
+pair, with a SQLite index from text hash to matrix row.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from metrics import Metrics
+
+
+_UNSAFE_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+_LOOKUP_CHUNK = 500
+
+
+def text_hash(text: str) -> str:
+    """Hash of the exact text being embedded."""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class EmbeddingCache:
+    """Stores embeddings keyed by (model name, normalization flag, text hash)"""
+
+    def __init__(self, directory: str, model_name: str, normalize: bool):
+        """
+        Open (or create) the cache for one embedding model
+
+        Args:
+            directory: Directory holding the cache files
+            model_name: Embedding model name
+            normalize: Whether the model's vectors are normalized to unit length
+        """
+        os.makedirs(directory, exist_ok=True)
+        name = _UNSAFE_RE.sub('_', model_name) + (".norm" if normalize else ".raw")
+        self.matrix_path = os.path.join(directory, name + ".f32")
+        self.db_path = os.path.join(directory, name + ".sqlite")
+        self.metrics = Metrics()
+
+        self._lock = threading.Lock()
+        # isolation_level=None: transactions are managed explicitly so appends can take the write lock first
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("CREATE TABLE IF NOT EXISTS vectors (hash TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'dimension'").fetchone()
+        self.dimension: Optional[int] = row[0] if row else None
+        self._matrix: Optional[np.memmap] = None
+
+    def _rows_on_disk(self) -> int:
+        """Number of complete vectors in the matrix file."""
+        if self.dimension is None or not os.path.exists(self.matrix_path):
+            return 0
+        return os.path.getsize(self.matrix_path) // (4 * self.dimension)
+
+    def _view(self, needed_rows: int) -> np.memmap:
+        """Memory-map the matrix, remapping if it has grown past the current view. Caller holds the lock."""
+        if self._matrix is None or len(self._matrix) < needed_rows:
+            self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode='r',
+                                     shape=(self._rows_on_disk(), self.dimension))
+        return self._matrix
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up cached vectors
+
+        Args:
+            texts: Texts to look up
+
+        Returns:
+            One vector per text, or None where the text is not cached
+        """
+        hashes = [text_hash(text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        with self._lock:
+            rows = {}
+            for start in range(0, len(hashes), _LOOKUP_CHUNK):
+                chunk = list(set(hashes[start:start + _LOOKUP_CHUNK]))
+                placeholders = ",".join("?" * len(chunk))
+                rows.update(self._db.execute(
+                    f"SELECT hash, row FROM vectors WHERE hash IN ({placeholders})", chunk
+                ).fetchall())
+            if rows:
+                matrix = self._view(max(rows.values()) + 1)
+                for i, key in enumerate(hashes):
+                    if key in rows:
+                        results[i] = np.array(matrix[rows[key]])
+
+        hits = sum(result is not None for result in results)
+        self.metrics.incr('hits', hits)
+        self.metrics.incr('misses', len(texts) - hits)
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors):
+        """
+        Add vectors to the cache
+
+        Args:
+            texts: Embedded texts
+            vectors: (n, d) embeddings of the texts
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        unique = {}
+        for text, vector in zip(texts, vectors):
+            unique.setdefault(text_hash(text), vector)
+
+        with self._lock:
+            # BEGIN IMMEDIATE serializes writers, including other processes sharing the directory
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self.dimension is None:
+                    self.dimension = vectors.shape[1]
+                    self._db.execute("INSERT OR REPLACE INTO meta VALUES ('dimension', ?)", (self.dimension,))
+                elif vectors.shape[1] != self.dimension:
+                    raise ValueError(f"Expected {self.dimension}-dimensional vectors, got {vectors.shape[1]}")
+
+                keys = list(unique)
+                known = set()
+                for start in range(0, len(keys), _LOOKUP_CHUNK):
+                    chunk = keys[start:start + _LOOKUP_CHUNK]
+                    placeholders = ",".join("?" * len(chunk))
+                    known.update(key for (key,) in self._db.execute(
+                        f"SELECT hash FROM vectors WHERE hash IN ({placeholders})", chunk
+                    ))
+                new_keys = [key for key in keys if key not in known]
+                if new_keys:
+                    first = self._rows_on_disk()
+                    with open(self.matrix_path, 'ab') as f:
+                        # Drop any partial row left by an interrupted write before appending
+                        f.truncate(first * 4 * self.dimension)
+                        f.write(np.stack([unique[key] for key in new_keys]).tobytes())
+                    self._db.executemany(
+                        "INSERT INTO vectors VALUES (?, ?)",
+                        [(key, first + i) for i, key in enumerate(new_keys)]
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        self.metrics.incr('stores', len(new_keys))
+
+    def __len__(self) -> int:
+        """Number of cached vectors."""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain embeddings wrapper that reuses vectors from an EmbeddingCache
+
+    Document (FAQ) embeddings are stored; query embeddings are only looked
+    up unless cache_queries is set, since user queries are unbounded and
+    would grow the cache without limit.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, cache_queries: bool = False):
+        """
+        Wrap an embedding model
+
+        Args:
+            embeddings: Model computing embeddings on cache misses
+            cache: Cache for this model
+            cache_queries: Also store the embeddings of queries
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.cache_queries = cache_queries
+
+    def lookup(self, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """
+        Split texts into cached vectors and misses
+
+        Returns:
+            Tuple of (vector or None per text, indices of the misses)
+        """
+        cached = self.cache.get_many(texts)
+        return cached, [i for i, vector in enumerate(cached) if vector is None]
+
+    def fill(self, texts: List[str], cached: List[Optional[np.ndarray]], missing: List[int], computed,
+             store: bool = True) -> np.ndarray:
+        """
+        Store vectors computed for the misses (unless store is False) and merge them with the cached ones
+
+        Returns:
+            (n, d) float32 embeddings in the order of texts
+        """
+        if missing:
+            computed = np.asarray(computed, dtype=np.float32)
+            if store:
+                self.cache.put_many([texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                cached[i] = vector
+        return np.stack(cached).astype(np.float32, copy=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, computing only those not in the cache."""
+        if not texts:
+            return []
+        cached, missing = self.lookup(texts)
+        computed = self.embeddings.embed_documents([texts[i] for i in missing]) if missing else []
+        return self.fill(texts, cached, missing, computed).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, reusing the cached vector of the same text."""
+        cached, missing = self.lookup([text])
+        computed = [self.embeddings.embed_query(text)] if missing else []
+        return self.fill([text], cached, missing, computed, store=self.cache_queries)[0].tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries in one call, reusing cached vectors of the same texts."""
+        if not texts:
+            return []
+        cached, missing = self.lookup(texts)
+        computed = self.embeddings.embed_documents([texts[i] for i in missing]) if missing else []
+        return self.fill(texts, cached, missing, computed, store=self.cache_queries).tolist()
@@ -0,0 +1,129 @@
+"""
+Latency, throughput and memory of the embedding encoder backends
+
+Usage:
+    python encoder_benchmark.py                               # torch, onnx, onnx-int8
+    python encoder_benchmark.py --backends torch,onnx-int8 --queries 500
+
+Each backend runs in a fresh process, so load time and resident memory are
+measured in isolation. Query vectors are compared with the first backend's
+(cosine similarity) to check that indexes built with it stay usable.
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+import numpy as np
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident memory of this process in megabytes."""
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def load_questions(faqs_file: str, limit: int) -> List[str]:
+    """First questions of the FAQ file."""
+    from index_builder import iter_faqs
+    return [faq['question'] for faq in itertools.islice(iter_faqs(faqs_file), limit)]
+
+
+def run_worker(backend: str, faqs_file: str, n_queries: int, n_documents: int, batch_size: int, output: str) -> Dict:
+    """Measure one backend in this process and save its query vectors."""
+    baseline_rss = _peak_rss_mb()
+    start = time.perf_counter()
+    from embedding_backends import create_embeddings
+    _, embeddings = create_embeddings(backend=backend)
+    embeddings.embed_query("warm up")
+    load_seconds = time.perf_counter() - start
+    loaded_rss = _peak_rss_mb()
+
+    queries = load_questions(faqs_file, n_queries)
+    latencies = []
+    vectors = []
+    for query in queries:
+        query_start = time.perf_counter()
+        vectors.append(embeddings.embed_query(query))
+        latencies.append((time.perf_counter() - query_start) * 1000)
+    np.save(output, np.asarray(vectors, dtype=np.float32))
+
+    documents = load_questions(faqs_file, n_documents)
+    batch_start = time.perf_counter()
+    for i in range(0, len(documents), batch_size):
+        embeddings.embed_documents(documents[i:i + batch_size])
+    throughput = len(documents) / (time.perf_counter() - batch_start)
+
+    return {
+        'backend': backend,
+        'load_s': load_seconds,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'docs_per_s': throughput,
+        'rss_loaded_mb': loaded_rss - baseline_rss,
+        'rss_peak_mb': _peak_rss_mb(),
+    }
+
+
+def run(backends: List[str], faqs_file: str, n_queries: int, n_documents: int, batch_size: int):
+    """Benchmark each backend in a subprocess and print a comparison table."""
+    print(f"{'backend':<10} {'load s':>7} {'p50 ms':>7} {'p95 ms':>7} {'docs/s':>8} "
+          f"{'load MB':>9} {'peak MB':>8} {'min cos':>8} {'mean cos':>9}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        reference = None
+        for backend in backends:
+            output = os.path.join(tmp, f"{backend}.npy")
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", backend, "--output", output,
+                 "--faqs-file", faqs_file, "--queries", str(n_queries),
+                 "--documents", str(n_documents), "--batch-size", str(batch_size)],
+                capture_output=True, text=True
+            )
+            if completed.returncode != 0:
+                print(f"{backend:<10} failed: {completed.stderr.strip().splitlines()[-1:]}")
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+
+            vectors = np.load(output)
+            if reference is None:
+                reference = vectors
+            # Both sides are unit length, so the row-wise dot product is the cosine similarity
+            cosines = np.sum(vectors * reference, axis=1)
+            print(f"{backend:<10} {result['load_s']:>7.2f} {result['p50_ms']:>7.2f} {result['p95_ms']:>7.2f} "
+                  f"{result['docs_per_s']:>8.0f} {result['rss_loaded_mb']:>9.0f} {result['rss_peak_mb']:>8.0f} "
+                  f"{cosines.min():>8.4f} {cosines.mean():>9.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding encoder backends")
+    parser.add_argument("--faqs-file", default="faqs.json")
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8",
+                        help="comma-separated; vectors are compared with the first")
+    parser.add_argument("--queries", type=int, default=200, help="single-query latency samples")
+    parser.add_argument("--documents", type=int, default=1000, help="texts embedded for throughput")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(args.worker, args.faqs_file, args.queries, args.documents, args.batch_size, args.output)
+        print(json.dumps(result))
+        return
+
+    run([backend for backend in args.backends.split(",") if backend],
+        args.faqs_file, args.queries, args.documents, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Near-duplicate FAQ detection at ingestion time
+Paraphrased questions whose answers are (nearly) the same collapse into one
+canonical FAQ: it is indexed once and the other questions are kept as its variants.
+"""
+import os
+from typing import Callable, List, Optional, Sequence, Tuple
+import faiss
+import numpy as np
+from bm25_index import tokenize
+
+
+Match = Tuple[str, int]  # ('index', FAISS position), ('pending', row) or ('batch', row)
+
+
+def answer_overlap(first: str, second: str) -> float:
+    """Jaccard similarity of the word sets of two answers."""
+    a, b = set(tokenize(first)), set(tokenize(second))
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class DuplicateDetector:
+    """Finds the canonical FAQ a new FAQ duplicates, if any"""
+
+    def __init__(self, threshold: float = 0.95, min_answer_overlap: float = 0.8, candidates: int = 4):
+        """
+        Initialize the detector
+
+        Args:
+            threshold: Minimum cosine similarity between question embeddings
+            min_answer_overlap: Minimum word overlap (Jaccard) between the answers,
+                                so similar questions with different answers stay apart
+            candidates: Nearest indexed FAQs checked per new FAQ
+        """
+        self.threshold = threshold
+        self.min_answer_overlap = min_answer_overlap
+        self.candidates = candidates
+
+    def to_dict(self):
+        """Settings that determine the clusters, recorded with the index."""
+        return {'threshold': self.threshold, 'min_answer_overlap': self.min_answer_overlap}
+
+    def match(self, vectors: np.ndarray, answers: Sequence[str],
+              index: Optional[faiss.Index] = None, index_answer: Optional[Callable[[int], str]] = None,
+              pending_vectors: Optional[np.ndarray] = None, pending_answers: Sequence[str] = ()) -> List[Optional[Match]]:
+        """
+        Match a batch of new FAQs against the canonical FAQs seen so far
+
+        Canonical FAQs are looked up in the FAISS index (approximately, with
+        the index's own search), among pending ones not added to it yet, and
+        among earlier FAQs of the batch that are canonical themselves.
+
+        Args:
+            vectors: (n, d) unit-length question embeddings of the new FAQs
+            answers: Answers of the new FAQs
+            index: Index of canonical FAQs (None or empty: not searched)
+            index_answer: Answer of the canonical FAQ at a FAISS position
+            pending_vectors: (m, d) embeddings of canonical FAQs not in the index yet
+            pending_answers: Answers of the pending FAQs
+
+        Returns:
+            Per new FAQ, the canonical FAQ it duplicates or None if it is canonical
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        candidates: List[List[Tuple[float, Match]]] = [[] for _ in range(len(vectors))]
+
+        if index is not None and index.ntotal and index.is_trained:
+            distances, ids = index.search(vectors, min(self.candidates, index.ntotal))
+            # Unit-length vectors: squared L2 distance d maps to cosine 1 - d / 2
+            for row, (row_distances, row_ids) in enumerate(zip(distances, ids)):
+                for distance, position in zip(row_distances, row_ids):
+                    if position >= 0 and 1.0 - distance / 2.0 >= self.threshold:
+                        candidates[row].append((1.0 - distance / 2.0, ('index', int(position))))
+
+        if pending_vectors is not None and len(pending_vectors):
+            similarities = vectors @ np.ascontiguousarray(pending_vectors, dtype=np.float32).T
+            for row, column in zip(*np.nonzero(similarities >= self.threshold)):
+                candidates[row].append((float(similarities[row, column]), ('pending', int(column))))
+
+        within = vectors @ vectors.T
+        matches: List[Optional[Match]] = []
+        for row in range(len(vectors)):
+            row_candidates = candidates[row] + [
+                (float(within[row, earlier]), ('batch', earlier))
+                for earlier in np.flatnonzero(within[row, :row] >= self.threshold)
+                if matches[earlier] is None
+            ]
+            match = None
+            for _, candidate in sorted(row_candidates, key=lambda item: item[0], reverse=True):
+                source, position = candidate
+                if source == 'index':
+                    answer = index_answer(position)
+                elif source == 'pending':
+                    answer = pending_answers[position]
+                else:
+                    answer = answers[position]
+                if answer_overlap(answers[row], answer) >= self.min_answer_overlap:
+                    match = candidate
+                    break
+            matches.append(match)
+        return matches
+
+
+def detector_from_env() -> Optional[DuplicateDetector]:
+    """
+    Near-duplicate detector configured by environment variables, or None if disabled
+
+    FAQ_DEDUP_THRESHOLD (question cosine similarity, default 0.95; empty: disabled),
+    FAQ_DEDUP_MIN_ANSWER_OVERLAP (default 0.8)
+    """
+    threshold = os.getenv("FAQ_DEDUP_THRESHOLD", "0.95")
+    if not threshold:
+        return None
+    return DuplicateDetector(
+        threshold=float(threshold),
+        min_answer_overlap=float(os.getenv("FAQ_DEDUP_MIN_ANSWER_OVERLAP", "0.8")),
+    )
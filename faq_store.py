@@ -0,0 +1,245 @@
+"""
+Native on-disk format for the FAQ vector store
+The FAISS index is written with faiss.write_index and memory-mapped when
+serving; questions and answers live in a SQLite sidecar read lazily by id.
+Nothing is pickled. Processes sharing an index directory serialize builds
+and updates with a lock file, and every file is replaced atomically.
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+import faiss
+from langchain_community.docstore.base import Docstore
+from langchain.docstore.document import Document
+
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, run a single process per index
+    fcntl = None
+
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.sqlite"
+LOCK_FILE = "index.lock"
+
+
+def faq_id(faq: Dict) -> str:
+    """Stable content hash of a FAQ, used as its docstore id."""
+    content = f"{faq['question']}\x1f{faq['answer']}"
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+
+def searchable_text(question: str, answer: str, variant_questions: Iterable[str] = ()) -> str:
+    """Text of a FAQ for keyword search, including the questions of its near-duplicates."""
+    return " ".join([question, *variant_questions, answer])
+
+
+@contextmanager
+def index_lock(index_path: str, shared: bool = False) -> Iterator[None]:
+    """
+    Hold the lock of an index directory (created if missing)
+
+    Args:
+        index_path: Directory the index is saved to
+        shared: Take a shared lock, e.g. to load the index, instead of the
+                exclusive lock held while building or updating it
+    """
+    os.makedirs(index_path, exist_ok=True)
+    with open(os.path.join(index_path, LOCK_FILE), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextmanager
+def atomic_write(path: str, suffix: str = ".tmp") -> Iterator[str]:
+    """
+    Yield a unique temporary path next to path, moved over it once written
+
+    The temporary file is removed if writing fails, and readers only ever
+    see the old or the new file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".",
+                                    suffix=suffix)
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_index(index: faiss.Index, index_path: str, name: str = INDEX_FILE):
+    """Write a FAISS index atomically, so processes that mapped the old file keep a valid view."""
+    with atomic_write(os.path.join(index_path, name)) as tmp_path:
+        faiss.write_index(index, tmp_path)
+
+
+def read_index(index_path: str, writable: bool = False, name: str = INDEX_FILE) -> faiss.Index:
+    """
+    Read a saved FAISS index
+
+    Args:
+        index_path: Directory the index was saved to
+        writable: Load into memory so vectors can be added or removed.
+                  Otherwise the index data is memory-mapped read-only and
+                  its pages are shared between processes.
+        name: Index file within the directory
+
+    Returns:
+        FAISS index
+    """
+    path = os.path.join(index_path, name)
+    if writable:
+        return faiss.read_index(path)
+    mmap_flag = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP)
+    return faiss.read_index(path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+
+
+def create_docstore(path: str) -> sqlite3.Connection:
+    """Open (or create) a writable FAQ sidecar database."""
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS faqs (position INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, "
+        "question TEXT NOT NULL, answer TEXT NOT NULL)"
+    )
+    # Near-duplicate FAQs collapsed into a canonical one: variant id -> canonical id
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS variants (id TEXT PRIMARY KEY, faq TEXT NOT NULL, question TEXT NOT NULL)"
+    )
+    return db
+
+
+def write_docstore(index_path: str, index_to_docstore_id: Dict[int, str], docstore: Docstore,
+                   variants: Optional[Dict[str, Tuple[str, str]]] = None):
+    """
+    Write the FAQ sidecar for an index
+
+    Args:
+        index_path: Directory the index is saved to
+        index_to_docstore_id: FAISS id -> document id
+        docstore: Docstore holding the documents
+        variants: Variant FAQ id -> (canonical document id, variant question)
+    """
+    with atomic_write(os.path.join(index_path, DOCSTORE_FILE)) as tmp_path:
+        db = create_docstore(tmp_path)
+        try:
+            rows = []
+            for position, doc_id in index_to_docstore_id.items():
+                doc = docstore.search(doc_id)
+                rows.append((int(position), doc_id, doc.page_content, doc.metadata['answer']))
+            db.executemany("INSERT INTO faqs VALUES (?, ?, ?, ?)", rows)
+            db.executemany(
+                "INSERT INTO variants VALUES (?, ?, ?)",
+                [(variant_id, doc_id, question) for variant_id, (doc_id, question) in (variants or {}).items()]
+            )
+            db.commit()
+        finally:
+            db.close()
+
+
+class SQLiteDocstore(Docstore):
+    """Read-only docstore that fetches FAQs from the sidecar on demand"""
+
+    def __init__(self, index_path: str):
+        """
+        Open the sidecar of a saved index
+
+        Args:
+            index_path: Directory the index was saved to
+        """
+        self.path = os.path.join(index_path, DOCSTORE_FILE)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+
+    @staticmethod
+    def _document(row: Tuple[str, str]) -> Document:
+        return Document(page_content=row[0], metadata={'answer': row[1]})
+
+    def search(self, search: str) -> Union[str, Document]:
+        """Fetch a document by id (LangChain Docstore interface)."""
+        with self._lock:
+            row = self._db.execute("SELECT question, answer FROM faqs WHERE id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return self._document(row)
+
+    def get_by_position(self, position: int) -> Optional[Document]:
+        """Fetch the document stored at a FAISS id, or None if there is none."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT question, answer FROM faqs WHERE position = ?", (int(position),)
+            ).fetchone()
+        return self._document(row) if row else None
+
+    def load_all(self) -> Tuple[Dict[str, Document], Dict[int, str]]:
+        """
+        Read the whole sidecar into memory, e.g. before modifying the index
+
+        Returns:
+            Tuple of (document id -> document, FAISS id -> document id)
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT position, id, question, answer FROM faqs ORDER BY position").fetchall()
+        documents = {doc_id: self._document((question, answer)) for _, doc_id, question, answer in rows}
+        return documents, {position: doc_id for position, doc_id, _, _ in rows}
+
+    def load_variants(self) -> Dict[str, Tuple[str, str]]:
+        """
+        Read the near-duplicate FAQs collapsed into canonical ones
+
+        Returns:
+            Variant FAQ id -> (canonical document id, variant question)
+        """
+        with self._lock:
+            has_table = self._db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'variants'"
+            ).fetchone()
+            rows = self._db.execute("SELECT id, faq, question FROM variants").fetchall() if has_table else []
+        return {variant_id: (doc_id, question) for variant_id, doc_id, question in rows}
+
+    def close(self):
+        """Close the sidecar connection."""
+        with self._lock:
+            self._db.close()
+
+
+class PositionMap(Mapping):
+    """Lazy FAISS id -> document id mapping backed by the sidecar"""
+
+    def __init__(self, docstore: SQLiteDocstore):
+        self.docstore = docstore
+
+    def __getitem__(self, position: int) -> str:
+        with self.docstore._lock:
+            row = self.docstore._db.execute(
+                "SELECT id FROM faqs WHERE position = ?", (int(position),)
+            ).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def _column(self, query: str) -> list:
+        with self.docstore._lock:
+            return [row[0] for row in self.docstore._db.execute(query)]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._column("SELECT position FROM faqs ORDER BY position"))
+
+    def __len__(self) -> int:
+        return self._column("SELECT COUNT(*) FROM faqs")[0]
+
+    def values(self):
+        return self._column("SELECT id FROM faqs ORDER BY position")
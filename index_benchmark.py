@@ -0,0 +1,137 @@
+"""
+Recall-vs-latency report for FAISS index types against the exact flat baseline
+
+Usage:
+    python index_benchmark.py                          # FAQ corpus from faqs.json
+    python index_benchmark.py --synthetic 1000000      # random unit vectors, to size larger KBs
+
+Each index type is built once; query-time knobs (nprobe for IVF, efSearch for
+HNSW) are swept and recall@k is measured against the flat index's results.
+"""
+import argparse
+import os
+import time
+from typing import List, Tuple
+import faiss
+import numpy as np
+from index_factory import IndexConfig, apply_search_params, build_index
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    """Normalize rows to unit length."""
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def synthetic_corpus(n_vectors: int, n_queries: int, dimension: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Random unit vectors, with queries drawn as noisy copies of corpus vectors."""
+    rng = np.random.default_rng(seed)
+    corpus = _unit(rng.standard_normal((n_vectors, dimension)).astype(np.float32))
+    picks = rng.integers(0, n_vectors, n_queries)
+    queries = _unit(corpus[picks] + 0.3 * rng.standard_normal((n_queries, dimension)).astype(np.float32) / np.sqrt(dimension))
+    return corpus, queries.astype(np.float32)
+
+
+def faq_corpus(faqs_file: str, n_queries: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Embed FAQ questions; queries are a random sample of questions with their last word dropped."""
+    from vectorstore_service import VectorStoreService
+    service = VectorStoreService(faqs_file=faqs_file, embedding_cache_dir=os.getenv("EMBEDDING_CACHE_DIR") or None)
+    faqs = service.load_faqs()
+    questions = [faq['question'] for faq in faqs]
+    corpus = np.asarray(service.embeddings.embed_documents(questions), dtype=np.float32)
+
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(questions), size=min(n_queries, len(questions)), replace=False)
+    query_texts = [" ".join(questions[i].split()[:-1]) or questions[i] for i in sample]
+    queries = np.asarray(service.embeddings.embed_documents(query_texts), dtype=np.float32)
+    return corpus, queries
+
+
+def measure(index: faiss.Index, queries: np.ndarray, truth: np.ndarray, k: int) -> Tuple[float, float, float]:
+    """
+    Search one query at a time
+
+    Returns:
+        Tuple of (recall@k, p50 latency ms, p95 latency ms)
+    """
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(ids[0].tolist()) & set(expected.tolist()))
+    return hits / truth.size, float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95))
+
+
+def run(corpus: np.ndarray, queries: np.ndarray, configs: List[IndexConfig], k: int,
+        nprobes: List[int], ef_searches: List[int]):
+    """Build each configuration and print recall and latency per query-time setting."""
+    print(f"Corpus: {corpus.shape[0]} vectors x {corpus.shape[1]} dims, {len(queries)} queries, k={k}")
+    print(f"{'index':<12} {'knob':<14} {'build s':>8} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'MB':>8}")
+
+    flat_start = time.perf_counter()
+    flat = build_index(IndexConfig('flat'), corpus)
+    flat_build = time.perf_counter() - flat_start
+    _, truth = flat.search(queries, k)
+    recall, p50, p95 = measure(flat, queries, truth, k)
+    print(f"{'flat':<12} {'-':<14} {flat_build:>8.2f} {recall:>7.3f} {p50:>8.3f} {p95:>8.3f} {_size_mb(flat):>8.1f}")
+
+    for config in configs:
+        build_start = time.perf_counter()
+        index = build_index(config, corpus)
+        build_seconds = time.perf_counter() - build_start
+
+        if config.index_type == 'hnsw':
+            knobs = [('efSearch', value) for value in ef_searches]
+        else:
+            knobs = [('nprobe', value) for value in nprobes]
+
+        for name, value in knobs:
+            if name == 'efSearch':
+                config.ef_search = value
+            else:
+                config.nprobe = value
+            apply_search_params(index, config)
+            recall, p50, p95 = measure(index, queries, truth, k)
+            print(f"{config.index_type:<12} {f'{name}={value}':<14} {build_seconds:>8.2f} "
+                  f"{recall:>7.3f} {p50:>8.3f} {p95:>8.3f} {_size_mb(index):>8.1f}")
+
+
+def _size_mb(index: faiss.Index) -> float:
+    """Serialized size of an index in megabytes."""
+    return faiss.serialize_index(index).nbytes / 1e6
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare FAISS index types against the flat baseline")
+    parser.add_argument("--faqs-file", default="faqs.json")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N random vectors instead of the FAQ corpus")
+    parser.add_argument("--dimension", type=int, default=384, help="dimension of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--types", default="ivf_flat,hnsw,ivf_pq")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF clusters (0: about 4 * sqrt(N))")
+    parser.add_argument("--nprobe", type=_int_list, default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=_int_list, default=[16, 64, 256])
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--pq-m", type=int, default=48)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        corpus, queries = synthetic_corpus(args.synthetic, args.queries, args.dimension)
+    else:
+        corpus, queries = faq_corpus(args.faqs_file, args.queries)
+
+    configs = [
+        IndexConfig(index_type, nlist=args.nlist, hnsw_m=args.hnsw_m, pq_m=args.pq_m)
+        for index_type in args.types.split(",") if index_type
+    ]
+    run(corpus, queries, configs, args.k, args.nprobe, args.ef_search)
+
+
+if __name__ == "__main__":
+    main()
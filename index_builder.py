@@ -0,0 +1,452 @@
+"""
+Streaming, parallel and resumable construction of the FAQ index
+FAQs are read lazily, embedded in batches (optionally across a process pool),
+appended to the FAISS index and the SQLite sidecar as they arrive, and
+checkpointed so an interrupted build picks up where it stopped. Near-duplicate
+FAQs can be collapsed into canonical ones on the way in, and answers can be
+embedded into a second index once the questions are done.
+"""
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import faiss
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from embedding_backends import create_embeddings, embedding_backend
+from bm25_index import BM25_FILE, BM25Index
+from embedding_cache import CachedEmbeddings
+from faq_dedup import DuplicateDetector
+from faq_store import (DOCSTORE_FILE, INDEX_FILE, atomic_write, create_docstore, faq_id, read_index, searchable_text,
+                       write_index)
+from index_factory import IndexConfig, _nlist_for, apply_search_params, create_empty_index
+from multi_vector import ANSWER_INDEX_FILE, ANSWER_OWNERS_FILE, AnswerVectors, MultiVectorConfig
+
+
+STATE_FILE = "build_state.json"
+
+Batch = List[Tuple]  # (doc id, question, answer), or (FAQ position, answer text); the text to embed comes second
+
+
+def iter_faqs(faqs_file: str, chunk_size: int = 1 << 16) -> Iterator[Dict]:
+    """
+    Yield FAQs one at a time without loading the whole file
+
+    Args:
+        faqs_file: JSON array of FAQ objects, or JSON Lines (.jsonl)
+        chunk_size: Characters read per step
+
+    Yields:
+        FAQ dictionaries with 'question' and 'answer' keys
+    """
+    with open(faqs_file, 'r', encoding='utf-8') as f:
+        if faqs_file.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        decoder = json.JSONDecoder()
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"{faqs_file} must contain a JSON array of FAQs")
+        pos = 1
+        eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                if pos >= len(buffer):
+                    raise json.JSONDecodeError("need more data", buffer, pos)
+                faq, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            yield faq
+
+
+# Embedding model of each pool worker, created once by _init_worker
+_worker_embeddings: Optional[Embeddings] = None
+
+
+def _init_worker(use_openai: bool, multilingual: bool, threads: int):
+    """Load the embedding model in a pool worker."""
+    global _worker_embeddings
+    if embedding_backend() == 'torch':
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+    else:
+        os.environ["ONNX_THREADS"] = str(threads)
+    _, _worker_embeddings = create_embeddings(use_openai, multilingual=multilingual)
+
+
+def _embed_in_worker(texts: List[str]) -> np.ndarray:
+    """Embed one batch in a pool worker."""
+    return np.asarray(_worker_embeddings.embed_documents(texts), dtype=np.float32)
+
+
+def _training_size(config: IndexConfig, n_vectors: int) -> int:
+    """Number of vectors to buffer before training an IVF index."""
+    return min(n_vectors, 64 * max(_nlist_for(config, n_vectors), 256))
+
+
+class IndexBuilder:
+    """Builds a saved FAQ index in batches"""
+
+    def __init__(self, embeddings: Embeddings, use_openai: bool = False, batch_size: int = 256,
+                 workers: int = 1, checkpoint_every: int = 20, multilingual: bool = False):
+        """
+        Initialize the builder
+
+        Args:
+            embeddings: Embedding model used when workers <= 1
+            use_openai: Which embedding backend pool workers load
+            batch_size: FAQs embedded per call
+            workers: Encoder processes (<= 1: embed in this process)
+            checkpoint_every: Save progress after this many batches
+            multilingual: Whether pool workers load the multilingual model
+        """
+        self.embeddings = embeddings
+        self.use_openai = use_openai
+        self.batch_size = batch_size
+        self.workers = workers
+        self.checkpoint_every = checkpoint_every
+        self.multilingual = multilingual
+
+    @classmethod
+    def from_env(cls, embeddings: Embeddings, use_openai: bool = False, multilingual: bool = False) -> "IndexBuilder":
+        """
+        Build a builder from environment variables
+
+        EMBED_BATCH_SIZE (default 256), EMBED_WORKERS (default 1),
+        EMBED_CHECKPOINT_EVERY (default 20 batches)
+        """
+        return cls(
+            embeddings,
+            use_openai=use_openai,
+            batch_size=int(os.getenv("EMBED_BATCH_SIZE", "256")),
+            workers=int(os.getenv("EMBED_WORKERS", "1")),
+            checkpoint_every=int(os.getenv("EMBED_CHECKPOINT_EVERY", "20")),
+            multilingual=multilingual,
+        )
+
+    def _batches(self, faqs: Iterable[Dict], seen: Set[str], consumed: int) -> Iterator[Tuple[Batch, int]]:
+        """Group unseen FAQs into batches, tagged with the number of FAQs read so far."""
+        batch = []
+        for consumed, faq in enumerate(faqs, start=consumed + 1):
+            doc_id = faq_id(faq)
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            batch.append((doc_id, faq['question'], faq['answer']))
+            if len(batch) >= self.batch_size:
+                yield batch, consumed
+                batch = []
+        if batch:
+            yield batch, consumed
+
+    def _embedded(self, batches: Iterator[Tuple[Batch, int]]) -> Iterator[Tuple[Batch, int, np.ndarray]]:
+        """
+        Embed batches in order, keeping a bounded number in flight on the process pool
+
+        With a cached model, the cache is consulted here and only misses are
+        sent to the workers, so the cache has a single writer.
+        """
+        if self.workers <= 1:
+            for batch, consumed in batches:
+                texts = [row[1] for row in batch]
+                yield batch, consumed, np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+            return
+
+        cache = self.embeddings if isinstance(self.embeddings, CachedEmbeddings) else None
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.use_openai, self.multilingual, threads),
+        ) as pool:
+            in_flight = deque()
+
+            def collect():
+                batch, consumed, texts, cached, missing, future = in_flight.popleft()
+                if cache is None:
+                    return batch, consumed, future.result()
+                computed = future.result() if future is not None else []
+                return batch, consumed, cache.fill(texts, cached, missing, computed)
+
+            for batch, consumed in batches:
+                texts = [row[1] for row in batch]
+                cached, missing = cache.lookup(texts) if cache is not None else (None, range(len(texts)))
+                future = pool.submit(_embed_in_worker, [texts[i] for i in missing]) if missing else None
+                in_flight.append((batch, consumed, texts, cached, list(missing), future))
+                if len(in_flight) >= 2 * self.workers:
+                    yield collect()
+            while in_flight:
+                yield collect()
+
+    @staticmethod
+    def _collapse(dedup: DuplicateDetector, batch: Batch, vectors: np.ndarray, index: faiss.Index, db,
+                  pending_rows: Batch, pending_vectors: List[np.ndarray]) -> Tuple[Batch, np.ndarray]:
+        """Record the batch's near-duplicates as variants and return its canonical FAQs."""
+        def indexed(position: int, column: str) -> str:
+            return db.execute(f"SELECT {column} FROM faqs WHERE position = ?", (position,)).fetchone()[0]
+
+        matches = dedup.match(
+            vectors, [answer for _, _, answer in batch],
+            index=index, index_answer=lambda position: indexed(position, 'answer'),
+            pending_vectors=np.concatenate(pending_vectors) if pending_vectors else None,
+            pending_answers=[answer for _, _, answer in pending_rows],
+        )
+        keep, variant_rows = [], []
+        for row, match in enumerate(matches):
+            if match is None:
+                keep.append(row)
+                continue
+            source, position = match
+            if source == 'index':
+                canonical = indexed(position, 'id')
+            elif source == 'pending':
+                canonical = pending_rows[position][0]
+            else:
+                canonical = batch[position][0]
+            variant_rows.append((batch[row][0], canonical, batch[row][1]))
+        db.executemany("INSERT INTO variants VALUES (?, ?, ?)", variant_rows)
+        return [batch[row] for row in keep], vectors[keep]
+
+    def _build_answer_index(self, db, config: IndexConfig, multi_vector: MultiVectorConfig) -> AnswerVectors:
+        """Embed the answers (and answer chunks) of the indexed FAQs into a second index."""
+        def rows() -> Iterator[Tuple[int, str]]:
+            for position, answer in db.execute("SELECT position, answer FROM faqs ORDER BY position"):
+                for text in multi_vector.answer_texts(answer):
+                    yield position, text
+
+        def batches() -> Iterator[Tuple[Batch, int]]:
+            batch = []
+            for row in rows():
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    yield batch, 0
+                    batch = []
+            if batch:
+                yield batch, 0
+
+        n_texts = sum(1 for _ in rows())
+        answers = None
+        pending_vectors: List[np.ndarray] = []
+        pending_owners: List[int] = []
+        for batch, _, vectors in self._embedded(batches()):
+            if answers is None:
+                answers = AnswerVectors.create(config, vectors.shape[1], n_texts)
+            pending_vectors.append(vectors)
+            pending_owners.extend(position for position, _ in batch)
+            if not answers.index.is_trained:
+                if len(pending_owners) < _training_size(config, n_texts):
+                    continue
+                answers.index.train(np.concatenate(pending_vectors))
+            answers.add(np.concatenate(pending_vectors), pending_owners)
+            pending_vectors.clear()
+            pending_owners.clear()
+
+        if pending_owners:
+            if not answers.index.is_trained:
+                answers.index.train(np.concatenate(pending_vectors))
+            answers.add(np.concatenate(pending_vectors), pending_owners)
+        apply_search_params(answers.index, config)
+        return answers
+
+    def build(self, faqs_file: str, index_path: str, config: IndexConfig, model_name: str,
+              dedup: Optional[DuplicateDetector] = None, multi_vector: Optional[MultiVectorConfig] = None) -> Dict:
+        """
+        Build the index and FAQ sidecar for a FAQ file
+
+        Work in progress lives in '<index_path>.partial' and is moved into
+        index_path when complete. A partial build for the same FAQ file,
+        model, index configuration, deduplication and multi-vector settings
+        is resumed (answer vectors are embedded after the questions and are
+        not checkpointed).
+
+        Args:
+            faqs_file: FAQ file (JSON array or JSON Lines)
+            index_path: Directory to save the index to
+            config: Index configuration
+            model_name: Embedding model name, recorded to validate resumes
+            dedup: Collapse near-duplicate FAQs into the first one of each
+                   cluster, keeping the others' questions as its variants
+            multi_vector: Also index answer (and answer chunk) vectors
+
+        Returns:
+            Build statistics: documents, embedded, resumed_from, seconds, docs_per_sec,
+            faqs (documents plus variants), compression_ratio (faqs per document)
+            and answer_vectors
+        """
+        work_dir = index_path.rstrip('/\\') + ".partial"
+        stat = os.stat(faqs_file)
+        identity = {
+            'faqs_signature': [stat.st_mtime_ns, stat.st_size],
+            'embedding_model': model_name,
+            'index_config': config.to_dict(),
+            'dedup': dedup.to_dict() if dedup is not None else None,
+            'multi_vector': multi_vector.to_dict() if multi_vector is not None else None,
+        }
+
+        state = self._read_state(work_dir)
+        if state is None or any(state.get(key) != value for key, value in identity.items()):
+            shutil.rmtree(work_dir, ignore_errors=True)
+            os.makedirs(work_dir)
+            state = dict(identity, consumed=0, ntotal=0)
+            index = None
+        else:
+            index = read_index(work_dir, writable=True)
+            print(f"Resuming build after {state['consumed']} FAQs ({index.ntotal} indexed)")
+
+        db = create_docstore(os.path.join(work_dir, DOCSTORE_FILE))
+        # Rows written after the last checkpoint are not in the saved index
+        db.execute("DELETE FROM faqs WHERE position >= ?", (state['ntotal'],))
+        db.execute("DELETE FROM variants WHERE faq NOT IN (SELECT id FROM faqs)")
+        seen = {doc_id for (doc_id,) in db.execute("SELECT id FROM faqs UNION ALL SELECT id FROM variants")}
+
+        n_total = None
+        if config.index_type in ('ivf_flat', 'ivf_pq') and index is None:
+            # IVF clustering is sized by corpus size, so count FAQs first (cheap next to embedding)
+            n_total = sum(1 for _ in iter_faqs(faqs_file))
+
+        resumed_from = state['consumed']
+        faqs = itertools.islice(iter_faqs(faqs_file), resumed_from, None)
+        pending_vectors: List[np.ndarray] = []
+        pending_rows: Batch = []
+        embedded = 0
+        batches_since_checkpoint = 0
+        start = time.perf_counter()
+
+        def flush():
+            """Add buffered vectors and rows to the index and sidecar."""
+            vectors = np.concatenate(pending_vectors)
+            first = index.ntotal
+            index.add(vectors)
+            db.executemany(
+                "INSERT INTO faqs VALUES (?, ?, ?, ?)",
+                [(first + i, doc_id, question, answer) for i, (doc_id, question, answer) in enumerate(pending_rows)]
+            )
+            pending_vectors.clear()
+            pending_rows.clear()
+
+        try:
+            for batch, consumed, vectors in self._embedded(self._batches(faqs, seen, resumed_from)):
+                if index is None:
+                    index = create_empty_index(config, vectors.shape[1], n_total or 1)
+                embedded += len(batch)
+                if dedup is not None:
+                    batch, vectors = self._collapse(dedup, batch, vectors, index, db, pending_rows, pending_vectors)
+                    if not batch:
+                        continue
+                pending_vectors.append(vectors)
+                pending_rows.extend(batch)
+
+                if not index.is_trained:
+                    if len(pending_rows) < _training_size(config, n_total):
+                        continue
+                    print(f"Training {config.index_type} index on {len(pending_rows)} vectors...")
+                    index.train(np.concatenate(pending_vectors))
+                    # Later batches are matched against the index for deduplication
+                    apply_search_params(index, config)
+                flush()
+
+                batches_since_checkpoint += 1
+                if batches_since_checkpoint >= self.checkpoint_every:
+                    state.update(consumed=consumed, ntotal=index.ntotal)
+                    self._checkpoint(work_dir, index, db, state)
+                    batches_since_checkpoint = 0
+                    rate = embedded / (time.perf_counter() - start)
+                    print(f"  {index.ntotal} FAQs indexed ({rate:.0f} docs/sec)")
+
+            if index is None:
+                raise ValueError(f"No FAQs found in {faqs_file}")
+            if pending_rows:
+                if not index.is_trained:
+                    index.train(np.concatenate(pending_vectors))
+                flush()
+            db.commit()
+
+            # The lexical index is cheap to build, so it is not checkpointed but built from the sidecar
+            variant_questions = defaultdict(list)
+            for doc_id, question in db.execute("SELECT faq, question FROM variants"):
+                variant_questions[doc_id].append(question)
+            bm25 = BM25Index()
+            for doc_id, question, answer in db.execute("SELECT id, question, answer FROM faqs ORDER BY position"):
+                bm25.add(doc_id, searchable_text(question, answer, variant_questions[doc_id]))
+            n_variants = sum(len(questions) for questions in variant_questions.values())
+
+            answers = None
+            if multi_vector is not None:
+                answers_start = time.perf_counter()
+                answers = self._build_answer_index(db, config, multi_vector)
+                print(f"Embedded {answers.index.ntotal} answer vectors in {time.perf_counter() - answers_start:.1f}s")
+        finally:
+            db.close()
+
+        seconds = time.perf_counter() - start
+        apply_search_params(index, config)
+        write_index(index, work_dir)
+        bm25.save(os.path.join(work_dir, BM25_FILE))
+        if answers is not None:
+            answers.save(work_dir)
+
+        os.makedirs(index_path, exist_ok=True)
+        for name in (INDEX_FILE, DOCSTORE_FILE, BM25_FILE, ANSWER_INDEX_FILE, ANSWER_OWNERS_FILE):
+            target = os.path.join(index_path, name)
+            if os.path.exists(os.path.join(work_dir, name)):
+                os.replace(os.path.join(work_dir, name), target)
+            elif os.path.exists(target):
+                # Left over from a build with other settings
+                os.remove(target)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+        stats = {
+            'documents': index.ntotal,
+            'embedded': embedded,
+            'resumed_from': resumed_from,
+            'seconds': seconds,
+            'docs_per_sec': embedded / seconds if seconds else 0.0,
+            'faqs': index.ntotal + n_variants,
+            'compression_ratio': (index.ntotal + n_variants) / index.ntotal,
+            'answer_vectors': answers.index.ntotal if answers is not None else 0,
+        }
+        print(f"Embedded {embedded} FAQs in {seconds:.1f}s ({stats['docs_per_sec']:.0f} docs/sec)")
+        if n_variants:
+            print(f"Collapsed {stats['faqs']} FAQs into {index.ntotal} entries "
+                  f"({n_variants} near-duplicates, compression ratio {stats['compression_ratio']:.2f})")
+        return stats
+
+    @staticmethod
+    def _read_state(work_dir: str) -> Optional[Dict]:
+        """Read the checkpoint state of a partial build, if any."""
+        path = os.path.join(work_dir, STATE_FILE)
+        if not os.path.exists(path) or not os.path.exists(os.path.join(work_dir, INDEX_FILE)):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def _checkpoint(work_dir: str, index: faiss.Index, db, state: Dict):
+        """Persist the partial index, sidecar rows and progress."""
+        db.commit()
+        write_index(index, work_dir)
+        with atomic_write(os.path.join(work_dir, STATE_FILE)) as tmp_path:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
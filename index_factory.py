@@ -0,0 +1,159 @@
+"""
+FAISS index construction for the FAQ vector store
+Supports exact (Flat) and approximate (IVF-Flat, HNSW, IVF-PQ) indexes
+"""
+import json
+import math
+import os
+from typing import Dict, Optional
+import faiss
+import numpy as np
+from faq_store import atomic_write
+
+
+INDEX_TYPES = ('flat', 'ivf_flat', 'hnsw', 'ivf_pq')
+CONFIG_FILE = "index_config.json"
+
+
+class IndexConfig:
+    """Build parameters and query-time knobs for a FAISS index"""
+
+    def __init__(self, index_type: str = 'flat', nlist: int = 0, nprobe: int = 8,
+                 hnsw_m: int = 32, ef_construction: int = 200, ef_search: int = 64,
+                 pq_m: int = 48, pq_nbits: int = 8):
+        """
+        Initialize the configuration
+
+        Args:
+            index_type: One of 'flat', 'ivf_flat', 'hnsw', 'ivf_pq'
+            nlist: Number of IVF clusters (0: about 4 * sqrt(corpus size))
+            nprobe: IVF clusters visited per query (query time)
+            hnsw_m: HNSW graph degree
+            ef_construction: HNSW candidate list size while building
+            ef_search: HNSW candidate list size per query (query time)
+            pq_m: Number of PQ sub-quantizers (must divide the embedding dimension)
+            pq_nbits: Bits per PQ sub-quantizer code
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}', expected one of {', '.join(INDEX_TYPES)}")
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+
+    def to_dict(self) -> Dict:
+        """Serialize the configuration."""
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "IndexConfig":
+        """Deserialize a configuration written by to_dict."""
+        return cls(**data)
+
+    @classmethod
+    def from_env(cls) -> "IndexConfig":
+        """
+        Build a configuration from environment variables
+
+        FAISS_INDEX_TYPE, FAISS_NLIST, FAISS_NPROBE, FAISS_HNSW_M,
+        FAISS_EF_CONSTRUCTION, FAISS_EF_SEARCH, FAISS_PQ_M, FAISS_PQ_NBITS
+        """
+        return cls(
+            index_type=os.getenv("FAISS_INDEX_TYPE", "flat").lower(),
+            nlist=int(os.getenv("FAISS_NLIST", "0")),
+            nprobe=int(os.getenv("FAISS_NPROBE", "8")),
+            hnsw_m=int(os.getenv("FAISS_HNSW_M", "32")),
+            ef_construction=int(os.getenv("FAISS_EF_CONSTRUCTION", "200")),
+            ef_search=int(os.getenv("FAISS_EF_SEARCH", "64")),
+            pq_m=int(os.getenv("FAISS_PQ_M", "48")),
+            pq_nbits=int(os.getenv("FAISS_PQ_NBITS", "8")),
+        )
+
+    def save(self, index_path: str):
+        """Write the configuration next to a saved index."""
+        with atomic_write(os.path.join(index_path, CONFIG_FILE)) as tmp_path:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, index_path: str) -> Optional["IndexConfig"]:
+        """Read the configuration saved next to an index, or None if there is none."""
+        path = os.path.join(index_path, CONFIG_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def __repr__(self) -> str:
+        return f"IndexConfig({', '.join(f'{k}={v!r}' for k, v in self.to_dict().items())})"
+
+
+def _nlist_for(config: IndexConfig, n_vectors: int) -> int:
+    """Pick the number of IVF clusters for a corpus size."""
+    nlist = config.nlist or int(4 * math.sqrt(n_vectors))
+    return max(1, min(nlist, n_vectors))
+
+
+def build_index(config: IndexConfig, vectors: np.ndarray) -> faiss.Index:
+    """
+    Build, train and fill a FAISS index
+
+    All index types use L2 distance, so scores stay comparable with the flat
+    baseline (for unit vectors, cosine = 1 - d / 2).
+
+    Args:
+        config: Index configuration
+        vectors: (n, d) float32 embeddings
+
+    Returns:
+        Populated FAISS index with query-time parameters applied
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = create_empty_index(config, vectors.shape[1], len(vectors))
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    apply_search_params(index, config)
+    return index
+
+
+def create_empty_index(config: IndexConfig, dimension: int, n_vectors: int) -> faiss.Index:
+    """
+    Create an untrained, empty FAISS index
+
+    Args:
+        config: Index configuration
+        dimension: Embedding dimension
+        n_vectors: Expected corpus size, used to size IVF clustering
+
+    Returns:
+        Empty FAISS index (IVF types still need train())
+    """
+    if config.index_type == 'flat':
+        return faiss.IndexFlatL2(dimension)
+
+    if config.index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dimension, config.hnsw_m)
+        index.hnsw.efConstruction = config.ef_construction
+        return index
+
+    nlist = _nlist_for(config, n_vectors)
+    quantizer = faiss.IndexFlatL2(dimension)
+    if config.index_type == 'ivf_flat':
+        return faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_L2)
+
+    if dimension % config.pq_m:
+        raise ValueError(f"pq_m={config.pq_m} must divide the embedding dimension {dimension}")
+    return faiss.IndexIVFPQ(quantizer, dimension, nlist, config.pq_m, config.pq_nbits)
+
+
+def apply_search_params(index: faiss.Index, config: IndexConfig):
+    """Set query-time knobs (nprobe, efSearch) on an index."""
+    if config.index_type in ('ivf_flat', 'ivf_pq'):
+        faiss.extract_index_ivf(index).nprobe = config.nprobe
+    elif config.index_type == 'hnsw':
+        faiss.downcast_index(index).hnsw.efSearch = config.ef_search
@@ -27,7 +27,7 @@ echo [2/5] Activating virtual environment...
 call venv\Scripts\activate.bat
 
 echo [3/5] Installing dependencies...
-pip install -r requirements.txt
+pip install -r requirements.txt -r requirements-torch.txt
 if errorlevel 1 (
     echo [ERROR] Failed to install dependencies
     pause
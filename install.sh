@@ -25,7 +25,7 @@ echo "[2/5] Activating virtual environment..."
 source venv/bin/activate
 
 echo "[3/5] Installing dependencies..."
-pip install -r requirements.txt
+pip install -r requirements.txt -r requirements-torch.txt
 if [ $? -ne 0 ]; then
     echo "[ERROR] Failed to install dependencies"
     exit 1
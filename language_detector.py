@@ -0,0 +1,163 @@
+"""
+Local, offline language identification
+Used by TranslationService to avoid remote detect calls for common inputs
+"""
+import json
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+
+DEFAULT_PROFILES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "language_profiles.json")
+
+# (start, end, script) code point ranges for scripts we can identify locally
+SCRIPT_RANGES = [
+    (0x0041, 0x024F, 'latin'),
+    (0x0370, 0x03FF, 'greek'),
+    (0x0400, 0x04FF, 'cyrillic'),
+    (0x0530, 0x058F, 'armenian'),
+    (0x0590, 0x05FF, 'hebrew'),
+    (0x0600, 0x06FF, 'arabic'),
+    (0x0900, 0x097F, 'devanagari'),
+    (0x0980, 0x09FF, 'bengali'),
+    (0x0E00, 0x0E7F, 'thai'),
+    (0x10A0, 0x10FF, 'georgian'),
+    (0x3040, 0x30FF, 'kana'),
+    (0x4E00, 0x9FFF, 'han'),
+    (0xAC00, 0xD7AF, 'hangul'),
+]
+
+# Script -> (language code, confidence). Scripts shared by several languages
+# get a lower confidence so the caller can fall back to the remote API.
+SCRIPT_LANGUAGES = {
+    'greek': ('el', 1.0),
+    'cyrillic': ('ru', 0.6),
+    'armenian': ('hy', 1.0),
+    'hebrew': ('iw', 0.9),
+    'arabic': ('ar', 0.6),
+    'devanagari': ('hi', 0.6),
+    'bengali': ('bn', 0.9),
+    'thai': ('th', 1.0),
+    'georgian': ('ka', 1.0),
+    'kana': ('ja', 1.0),
+    'han': ('zh-CN', 0.5),
+    'hangul': ('ko', 1.0),
+}
+
+# Letters that pin a shared script down to one language
+SCRIPT_LETTER_HINTS = {
+    'cyrillic': [('іїєґ', 'uk', 0.95), ('ыэё', 'ru', 0.9)],
+    'arabic': [('پچژگ', 'fa', 0.7)],
+}
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+
+
+def _script_of(char: str) -> Optional[str]:
+    """Return the script name for a character, or None if it is not a known letter."""
+    code = ord(char)
+    for start, end, script in SCRIPT_RANGES:
+        if start <= code <= end:
+            return script
+    return None
+
+
+class LanguageDetector(ABC):
+    """Interface for pluggable local language detectors"""
+
+    @abstractmethod
+    def detect(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Detect the language of the input text
+
+        Args:
+            text: Input text
+
+        Returns:
+            Tuple of (language code or None, confidence between 0 and 1)
+        """
+
+
+class LocalLanguageDetector(LanguageDetector):
+    """
+    Script-range classifier with a common-word model for Latin-script languages
+
+    Non-Latin scripts are identified from Unicode ranges. Latin-script text is
+    scored against the precomputed word and character profiles in
+    language_profiles.json.
+    """
+
+    def __init__(self, profiles_file: str = DEFAULT_PROFILES_FILE):
+        """
+        Initialize the detector
+
+        Args:
+            profiles_file: Path to JSON file with per-language 'words' and 'chars'
+        """
+        with open(profiles_file, 'r', encoding='utf-8') as f:
+            profiles = json.load(f)
+
+        self.words: Dict[str, set] = {lang: set(p['words']) for lang, p in profiles.items()}
+        self.chars: Dict[str, str] = {lang: p.get('chars', '') for lang, p in profiles.items()}
+
+    def detect(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Detect the language of the input text
+
+        Args:
+            text: Input text
+
+        Returns:
+            Tuple of (language code or None, confidence between 0 and 1)
+        """
+        text = text.lower()
+        script_counts: Dict[str, int] = {}
+        for char in text:
+            if char.isalpha():
+                script = _script_of(char) or 'other'
+                script_counts[script] = script_counts.get(script, 0) + 1
+
+        total = sum(script_counts.values())
+        if not total:
+            return None, 0.0
+
+        # Kana is only used by Japanese, even when mixed with Han characters
+        if script_counts.get('kana'):
+            return 'ja', 1.0
+
+        script = max(script_counts, key=script_counts.get)
+        share = script_counts[script] / total
+
+        if script == 'latin':
+            lang, confidence = self._detect_latin(text)
+            return lang, confidence * share
+
+        if script not in SCRIPT_LANGUAGES:
+            return None, 0.0
+
+        lang, confidence = SCRIPT_LANGUAGES[script]
+        for letters, hinted_lang, hinted_confidence in SCRIPT_LETTER_HINTS.get(script, []):
+            if any(letter in text for letter in letters):
+                lang, confidence = hinted_lang, hinted_confidence
+                break
+        return lang, confidence * share
+
+    def _detect_latin(self, text: str) -> Tuple[Optional[str], float]:
+        """Score lowercased Latin-script text against the word and character profiles."""
+        words = _WORD_RE.findall(text)
+        scores = {}
+        for lang, vocabulary in self.words.items():
+            score = sum(1 for word in words if word in vocabulary)
+            score += sum(2 for char in self.chars[lang] if char in text)
+            scores[lang] = score
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best_lang, best = ranked[0]
+        second = ranked[1][1] if len(ranked) > 1 else 0
+        if best == 0:
+            return None, 0.0
+
+        margin = 1.0 - (second / best) ** 2
+        evidence = min(1.0, best / 2)
+        return best_lang, margin * evidence
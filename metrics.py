@@ -0,0 +1,75 @@
+"""
+Lightweight in-process metrics for the chatbot services
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class Metrics:
+    """Thread-safe counters and timing observations"""
+
+    def __init__(self):
+        """Initialize empty counters and observations."""
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, value: int = 1):
+        """
+        Increment a counter
+
+        Args:
+            name: Counter name
+            value: Amount to add (default: 1)
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        """
+        Record a single observation (e.g. a latency in seconds)
+
+        Args:
+            name: Observation name
+            value: Observed value
+        """
+        with self._lock:
+            stats = self.timings.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            stats['count'] += 1
+            stats['total'] += value
+            stats['max'] = max(stats['max'], value)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Context manager that observes the elapsed time of its block under name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def get(self, name: str) -> int:
+        """Return the current value of a counter (0 if never incremented)."""
+        with self._lock:
+            return self.counters.get(name, 0)
+
+    def snapshot(self) -> Dict:
+        """
+        Get a copy of all counters and timings
+
+        Returns:
+            Dictionary with 'counters' and 'timings' (count, total, max, mean)
+        """
+        with self._lock:
+            timings = {}
+            for name, stats in self.timings.items():
+                timings[name] = dict(stats, mean=stats['total'] / stats['count'] if stats['count'] else 0.0)
+            return {'counters': dict(self.counters), 'timings': timings}
+
+    def reset(self):
+        """Clear all counters and timings."""
+        with self._lock:
+            self.counters.clear()
+            self.timings.clear()
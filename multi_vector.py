@@ -0,0 +1,202 @@
+"""
+Answer vectors searched alongside the question index
+Each FAQ can have vectors for its answer and answer chunks, owned by its
+position in the question index. Hits are aggregated per FAQ, so one FAQ
+matching on several vectors takes a single result slot.
+"""
+import math
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+import faiss
+import numpy as np
+from faq_store import atomic_write, read_index, write_index
+from index_factory import IndexConfig, apply_search_params, create_empty_index
+
+
+ANSWER_INDEX_FILE = "answers.faiss"
+ANSWER_OWNERS_FILE = "answer_owners.npy"
+AGGREGATIONS = ('max', 'sum')
+
+
+class MultiVectorConfig:
+    """Which answer vectors are indexed and how hits are combined per FAQ"""
+
+    def __init__(self, chunk_words: int = 0, aggregation: str = 'max'):
+        """
+        Initialize the configuration
+
+        Args:
+            chunk_words: Also index chunks of this many words of longer answers
+                         (0: one vector for the whole answer)
+            aggregation: Per-FAQ ranking score (query time): 'max' (best
+                         matching vector) or 'sum' (FAQs matching on several
+                         vectors rank higher)
+        """
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation '{aggregation}', expected one of {', '.join(AGGREGATIONS)}")
+        self.chunk_words = chunk_words
+        self.aggregation = aggregation
+
+    def to_dict(self) -> Dict:
+        """Settings that determine the indexed vectors, recorded with the index."""
+        return {'chunk_words': self.chunk_words}
+
+    @classmethod
+    def from_env(cls) -> Optional["MultiVectorConfig"]:
+        """
+        Build a configuration from environment variables, or None if disabled
+
+        MULTI_VECTOR (default false), ANSWER_CHUNK_WORDS (default 0),
+        MULTI_VECTOR_AGGREGATION (default max)
+        """
+        if os.getenv("MULTI_VECTOR", "false").lower() != "true":
+            return None
+        return cls(
+            chunk_words=int(os.getenv("ANSWER_CHUNK_WORDS", "0")),
+            aggregation=os.getenv("MULTI_VECTOR_AGGREGATION", "max").lower(),
+        )
+
+    def answer_texts(self, answer: str) -> List[str]:
+        """Texts embedded for an answer: the answer itself, then overlapping chunks of long answers."""
+        texts = [answer]
+        words = answer.split()
+        if self.chunk_words and len(words) > self.chunk_words:
+            stride = max(1, self.chunk_words - self.chunk_words // 4)
+            for start in range(0, len(words) - self.chunk_words // 4, stride):
+                texts.append(" ".join(words[start:start + self.chunk_words]))
+        return texts
+
+
+def aggregate(scores: np.ndarray, owners: np.ndarray, k: int, aggregation: str = 'max') -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Combine vector hits into per-FAQ results for a batch of queries
+
+    Args:
+        scores: (n, m) cosine similarities of the hits
+        owners: (n, m) FAQ positions owning the hits, -1 for no hit
+        k: Results per query
+        aggregation: 'max' or 'sum' of each FAQ's hit scores, used for ranking
+
+    Returns:
+        Tuple of (scores, ids) arrays of shape (n, k): each FAQ's best cosine
+        similarity and its position, ranked by the aggregated score; -inf and
+        -1 where there are fewer than k FAQs
+    """
+    n, m = scores.shape
+    valid = owners.ravel() >= 0
+    rows = np.repeat(np.arange(n), m)[valid]
+    faqs = owners.ravel()[valid]
+    hits = scores.ravel()[valid]
+
+    # Group hits by (query, FAQ), best hit first within each group
+    order = np.lexsort((-hits, faqs, rows))
+    rows, faqs, hits = rows[order], faqs[order], hits[order]
+    starts = np.flatnonzero(np.r_[True, (rows[1:] != rows[:-1]) | (faqs[1:] != faqs[:-1])]) if len(rows) else rows
+    best = hits[starts]
+    ranking = np.add.reduceat(hits, starts) if aggregation == 'sum' and len(starts) else best
+    rows, faqs = rows[starts], faqs[starts]
+
+    # Rank FAQs within each query and keep the first k
+    order = np.lexsort((-ranking, rows))
+    rows, faqs, best = rows[order], faqs[order], best[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = rank < k
+
+    out_scores = np.full((n, k), -np.inf, dtype=np.float32)
+    out_ids = np.full((n, k), -1, dtype=np.int64)
+    out_scores[rows[keep], rank[keep]] = best[keep]
+    out_ids[rows[keep], rank[keep]] = faqs[keep]
+    return out_scores, out_ids
+
+
+class AnswerVectors:
+    """FAISS index of answer vectors with the FAQ position owning each vector"""
+
+    def __init__(self, index: faiss.Index, owners: np.ndarray):
+        """
+        Wrap an index
+
+        Args:
+            index: FAISS index of answer vectors
+            owners: FAQ position per answer vector id (-1: removed)
+        """
+        self.index = index
+        self.owners = owners
+        self._vectors_per_faq: Optional[int] = None
+
+    @classmethod
+    def create(cls, config: IndexConfig, dimension: int, n_vectors: int) -> "AnswerVectors":
+        """Create an empty (untrained, for IVF types) answer index."""
+        return cls(create_empty_index(config, dimension, n_vectors), np.zeros(0, dtype=np.int64))
+
+    @property
+    def vectors_per_faq(self) -> int:
+        """Average number of answer vectors per FAQ, rounded up."""
+        if self._vectors_per_faq is None:
+            n_faqs = len(np.unique(self.owners[self.owners >= 0]))
+            self._vectors_per_faq = max(1, math.ceil(self.index.ntotal / n_faqs)) if n_faqs else 1
+        return self._vectors_per_faq
+
+    def add(self, vectors: np.ndarray, owners: Sequence[int]):
+        """Append vectors owned by the given FAQ positions."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = np.arange(len(self.owners), len(self.owners) + len(vectors), dtype=np.int64)
+        if isinstance(self.index, faiss.IndexIVF):
+            self.index.add_with_ids(vectors, ids)
+        else:
+            self.index.add(vectors)
+        self.owners = np.concatenate([self.owners, np.asarray(owners, dtype=np.int64)])
+        self._vectors_per_faq = None
+
+    def remove_owners(self, positions: Sequence[int], renumber: Optional[np.ndarray] = None):
+        """
+        Delete the vectors of removed FAQs
+
+        Args:
+            positions: FAQ positions being removed
+            renumber: Old -> new FAQ position map, when the question index
+                      compacts its positions on removal (flat indexes)
+        """
+        removed = np.isin(self.owners, np.asarray(positions, dtype=np.int64)) & (self.owners >= 0)
+        if isinstance(self.index, faiss.IndexIVF):
+            # IVF ids are explicit, so removed ids are left as holes
+            self.index.remove_ids(np.flatnonzero(removed).astype(np.int64))
+            self.owners[removed] = -1
+        else:
+            # Flat indexes compact on removal, keeping the order of the remaining vectors
+            self.index.remove_ids(np.flatnonzero(removed).astype(np.int64))
+            self.owners = self.owners[~removed]
+        if renumber is not None:
+            live = self.owners >= 0
+            self.owners[live] = renumber[self.owners[live]]
+        self._vectors_per_faq = None
+
+    def search(self, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search answer vectors
+
+        Returns:
+            Tuple of (cosine similarities, owning FAQ positions or -1), each (n, k)
+        """
+        distances, ids = self.index.search(vectors, k)
+        # Unit-length vectors: squared L2 distance d maps to cosine 1 - d / 2
+        scores = np.where(ids >= 0, 1.0 - distances / 2.0, -np.inf).astype(np.float32)
+        owners = np.where(ids >= 0, self.owners[np.maximum(ids, 0)], -1)
+        return scores, owners
+
+    def save(self, index_path: str):
+        """Write the index and owner array atomically."""
+        write_index(self.index, index_path, ANSWER_INDEX_FILE)
+        with atomic_write(os.path.join(index_path, ANSWER_OWNERS_FILE)) as tmp_path:
+            with open(tmp_path, 'wb') as f:
+                np.save(f, self.owners)
+
+    @classmethod
+    def load(cls, index_path: str, config: IndexConfig, writable: bool = False) -> Optional["AnswerVectors"]:
+        """Read the answer index saved next to a question index, or None if there is none."""
+        if not os.path.exists(os.path.join(index_path, ANSWER_INDEX_FILE)):
+            return None
+        index = read_index(index_path, writable=writable, name=ANSWER_INDEX_FILE)
+        apply_search_params(index, config)
+        owners = np.load(os.path.join(index_path, ANSWER_OWNERS_FILE))
+        return cls(index, owners)
@@ -0,0 +1,84 @@
+"""
+ONNX Runtime encoder for sentence-transformers models
+Runs MiniLM without PyTorch: tokenization with `tokenizers`, inference with
+`onnxruntime`, then the same mean pooling and L2 normalization as
+sentence-transformers, so vectors are compatible with indexes built on torch.
+"""
+import os
+from typing import List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+ONNX_MODEL_FILES = {
+    'onnx': "onnx/model.onnx",
+    # Dynamically quantized int8 weights (AVX2, runs on any recent x86 CPU)
+    'onnx-int8': "onnx/model_quint8_avx2.onnx",
+}
+
+
+class OnnxEmbeddings(Embeddings):
+    """Mean-pooled, normalized sentence embeddings computed with ONNX Runtime"""
+
+    def __init__(self, model_name: str, model_file: str = ONNX_MODEL_FILES['onnx'], model_dir: Optional[str] = None,
+                 max_length: int = 256, batch_size: int = 32, threads: Optional[int] = None):
+        """
+        Load the tokenizer and ONNX model
+
+        Args:
+            model_name: Hugging Face Hub repository of the model
+            model_file: ONNX file within the repository (or model_dir)
+            model_dir: Local directory with tokenizer.json and the ONNX file,
+                       instead of downloading from the Hub
+            max_length: Maximum tokens per text (256 for all-MiniLM-L6-v2,
+                        128 for paraphrase-multilingual-MiniLM-L12-v2)
+            batch_size: Texts per inference call
+            threads: ONNX Runtime intra-op threads (None: runtime default)
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        if model_dir:
+            tokenizer_path = os.path.join(model_dir, "tokenizer.json")
+            model_path = os.path.join(model_dir, model_file)
+        else:
+            from huggingface_hub import hf_hub_download
+            tokenizer_path = hf_hub_download(model_name, "tokenizer.json")
+            model_path = hf_hub_download(model_name, model_file)
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts batch by batch into an (n, d) float32 array."""
+        outputs = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + self.batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+            if 'token_type_ids' in self.input_names:
+                feeds['token_type_ids'] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+            token_embeddings = self.session.run(None, feeds)[0]
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            outputs.append(pooled.astype(np.float32))
+        return np.concatenate(outputs) if outputs else np.zeros((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of texts."""
+        return self._encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query."""
+        return self._encode([text])[0].tolist()
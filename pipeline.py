@@ -0,0 +1,496 @@
+"""
+RAG pipeline shared by the Streamlit app and other entry points
+"""
+import asyncio
+import re
+import time
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from metrics import Metrics
+from single_flight import request_key
+from translation_service import count_remote_calls
+
+
+NO_ANSWER_TEXT = "I couldn't find relevant information to answer your question. Please try rephrasing or ask about something else."
+
+# Pipeline-level counters (queries, cache hits, direct FAQ answers) and Translation API calls per generated answer
+pipeline_metrics = Metrics()
+
+# A sentence ends at ., !, ? (or their CJK forms) followed by whitespace, or at a newline;
+# the separator is captured so line breaks survive translation
+_SENTENCE_END_RE = re.compile(r"((?<=[.!?。！？])\s+|\n+)")
+
+
+def _new_state(detected_lang: str, translated: str, answer_lang: str, query_embedding: List[float]) -> Dict:
+    """Pipeline state after language detection, translation and embedding (see _prepare)."""
+    return {
+        'detected_lang': detected_lang,
+        'translated': translated,
+        'answer_lang': answer_lang,
+        'query_embedding': query_embedding,
+        'relevant_faqs': [],
+        'answer': None,
+    }
+
+
+def _cached_answer(state: Dict, answer_cache) -> Optional[Tuple[str, str]]:
+    """
+    Look the query up in the semantic answer cache, before any retrieval
+
+    Returns:
+        Tuple of (answer, its language) on a hit: the answer in the user's
+        language if cached, else the English one to translate; None on a miss
+    """
+    if answer_cache is None:
+        return None
+    cached_answers = answer_cache.lookup(state['query_embedding'])
+    for lang in (state['detected_lang'], 'en'):
+        if cached_answers and lang in cached_answers:
+            pipeline_metrics.incr('answer_cache_hits')
+            return cached_answers[lang], lang
+    return None
+
+
+def _direct_answer_faq(relevant_faqs: List[Dict], direct_answer_threshold: Optional[float]) -> Optional[Dict]:
+    """
+    Most similar FAQ if it scores at least direct_answer_threshold, so its answer is served without the LLM
+
+    The most similar FAQ is not necessarily the first one: hybrid search
+    returns FAQs in fused rank order.
+    """
+    if direct_answer_threshold is None or not relevant_faqs:
+        return None
+    best = max(relevant_faqs, key=lambda faq: faq['score'])
+    if best['score'] >= direct_answer_threshold:
+        pipeline_metrics.incr('direct_answers')
+        return best
+    return None
+
+
+def _store_answer(state: Dict, answer_cache, answer: str, final_answer: str):
+    """Cache a generated answer under the query, in the LLM's and the user's language."""
+    if answer_cache is not None:
+        answer_cache.store(state['query_embedding'], state['translated'],
+                           {state['answer_lang']: answer, state['detected_lang']: final_answer})
+
+
+def _prepare(user_input: str, translation_service, vector_service, answer_cache, direct_answer_threshold) -> Dict:
+    """
+    Run every stage before generation
+
+    With a multilingual vector store (cross-lingual retrieval) the input is
+    searched as-is and only its language is detected, so the query needs no
+    translation and the LLM answers in the user's language. The answer
+    cache is consulted before the FAQs are searched.
+
+    Returns:
+        Dictionary with 'detected_lang', 'translated' (the query text searched
+        and sent to the LLM), 'answer_lang' (language the LLM answers in),
+        'query_embedding', 'relevant_faqs' and 'answer' (a ready localized
+        answer from the answer cache or the direct FAQ path, else None)
+    """
+    if vector_service.multilingual:
+        detected_lang, translated = translation_service.detect_language(user_input), user_input
+    else:
+        detected_lang, translated = translation_service.translate_with_detection(user_input)
+    state = _new_state(detected_lang, translated, detected_lang if vector_service.multilingual else 'en',
+                       vector_service.embed_query(translated))
+
+    cached = _cached_answer(state, answer_cache)
+    if cached is not None:
+        answer, lang = cached
+        if lang != detected_lang:
+            answer = translation_service.translate_from_english(answer, detected_lang)
+            answer_cache.store(state['query_embedding'], translated, {detected_lang: answer})
+        state['answer'] = answer
+        return state
+
+    state['relevant_faqs'] = vector_service.get_relevant_context(translated, k=5, embedding=state['query_embedding'])
+    faq = _direct_answer_faq(state['relevant_faqs'], direct_answer_threshold)
+    if faq is not None:
+        state['answer'] = localize_faq_answer(faq['answer'], detected_lang, translation_service, vector_service)
+    return state
+
+
+def _flight_key(user_input: str, translation_service) -> Tuple[str, Optional[str]]:
+    """Coalescing key of a query; its language comes from the local detector (no remote call)."""
+    return request_key(user_input, translation_service.detector.detect(user_input)[0])
+
+
+def fallback_answer(relevant_faqs: List[Dict]) -> str:
+    """English answer used when the LLM produced nothing."""
+    return relevant_faqs[0]['answer'] if relevant_faqs else NO_ANSWER_TEXT
+
+
+def _localize(answer: str, answer_lang: str, detected_lang: str, translation_service) -> str:
+    """Translate an answer into the user's language unless the LLM already answered in it."""
+    if answer_lang == detected_lang:
+        return answer
+    return translation_service.translate_from_english(answer, detected_lang)
+
+
+async def _alocalize(answer: str, answer_lang: str, detected_lang: str, translation_service) -> str:
+    """Async variant of _localize."""
+    if answer_lang == detected_lang:
+        return answer
+    return await translation_service.atranslate_from_english(answer, detected_lang)
+
+
+def _pretranslated(answer: str, target_language: str, vector_service) -> Optional[str]:
+    """Translation of an English FAQ answer saved with the index, if there is one."""
+    translations = vector_service.answer_translations
+    localized = translations.get(answer, target_language) if translations is not None else None
+    if localized is not None:
+        pipeline_metrics.incr('pretranslated_answers')
+    return localized
+
+
+def localize_faq_answer(answer: str, target_language: str, translation_service, vector_service) -> str:
+    """
+    Translate an English FAQ answer (direct or fallback answer) into the user's language
+
+    Answers pre-translated into the language (see answer_translations.py)
+    are served from the index's sidecar without remote calls.
+    """
+    if target_language == 'en':
+        return answer
+    localized = _pretranslated(answer, target_language, vector_service)
+    if localized is not None:
+        return localized
+    return translation_service.translate_from_english(answer, target_language)
+
+
+async def alocalize_faq_answer(answer: str, target_language: str, translation_service, vector_service) -> str:
+    """Async variant of localize_faq_answer."""
+    if target_language == 'en':
+        return answer
+    localized = _pretranslated(answer, target_language, vector_service)
+    if localized is not None:
+        return localized
+    return await translation_service.atranslate_from_english(answer, target_language)
+
+
+def process_query(user_input: str, translation_service, vector_service, vertexai_service, answer_cache=None,
+                  direct_answer_threshold=None, single_flight=None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Process user query and generate AI-powered answer.
+
+    If the best FAQ match scores at least direct_answer_threshold (cosine
+    similarity), its answer is returned as-is and Gemini is not called.
+    With a SingleFlight, concurrent identical queries share one run of the
+    pipeline.
+
+    Returns:
+        Tuple of (answer, error message); exactly one of them is None
+    """
+    if single_flight is not None:
+        return single_flight.call(_flight_key(user_input, translation_service), process_query,
+                                  user_input, translation_service, vector_service, vertexai_service,
+                                  answer_cache, direct_answer_threshold)
+    with count_remote_calls() as translation_calls:
+        try:
+            pipeline_metrics.incr('queries')
+            state = _prepare(user_input, translation_service, vector_service, answer_cache, direct_answer_threshold)
+            if state['answer'] is not None:
+                return state['answer'], None
+
+            detected_lang, translated = state['detected_lang'], state['translated']
+            relevant_faqs = state['relevant_faqs']
+
+            answer_lang = state['answer_lang']
+            answer = vertexai_service.generate_answer(translated, relevant_faqs, language=answer_lang)
+            generated = answer is not None
+            pipeline_metrics.incr('llm_answers' if generated else 'llm_fallbacks')
+
+            if answer is None:
+                final_answer = localize_faq_answer(fallback_answer(relevant_faqs), detected_lang,
+                                                   translation_service, vector_service)
+            else:
+                final_answer = _localize(answer, answer_lang, detected_lang, translation_service)
+            if generated:
+                _store_answer(state, answer_cache, answer, final_answer)
+
+            return final_answer, None
+        except Exception as e:
+            error_msg = str(e)
+            print(f"Error in process_query: {error_msg}")
+            return None, f"Error processing query: {error_msg}"
+        finally:
+            pipeline_metrics.observe('translation_calls', translation_calls.count)
+
+
+def _complete_sentences(buffer: str) -> Tuple[List[Tuple[str, str]], str]:
+    """Split buffered text into (sentence, separator) pairs and the incomplete rest."""
+    parts = _SENTENCE_END_RE.split(buffer)
+    return list(zip(parts[0:-1:2], parts[1::2])), parts[-1]
+
+
+def _translate_sentences(chunks: Iterator[str], translation_service, target_language: str) -> Iterator[str]:
+    """Buffer streamed English chunks and yield each completed sentence translated, followed by its separator."""
+    buffer = ""
+    for chunk in chunks:
+        sentences, buffer = _complete_sentences(buffer + chunk)
+        for sentence, separator in sentences:
+            if sentence.strip():
+                yield translation_service.translate_from_english(sentence, target_language) + separator
+            else:
+                yield separator
+    if buffer.strip():
+        yield translation_service.translate_from_english(buffer, target_language)
+
+
+def stream_query(user_input: str, translation_service, vector_service, vertexai_service, answer_cache=None,
+                 direct_answer_threshold=None, single_flight=None) -> Iterator[str]:
+    """
+    Process user query and stream the answer as it is generated.
+
+    Answers generated in the user's language (English, or any language with
+    cross-lingual retrieval) are streamed token by token; otherwise each
+    sentence is translated as soon as it is complete. Cached and direct FAQ
+    answers are yielded in one piece. Errors are raised to the caller.
+    With a SingleFlight, concurrent identical queries share one stream.
+
+    Yields:
+        Chunks of the localized answer
+    """
+    if single_flight is not None:
+        yield from single_flight.stream(_flight_key(user_input, translation_service), stream_query,
+                                        user_input, translation_service, vector_service, vertexai_service,
+                                        answer_cache, direct_answer_threshold)
+        return
+
+    with count_remote_calls() as translation_calls:
+        try:
+            start = time.perf_counter()
+            pipeline_metrics.incr('queries')
+            state = _prepare(user_input, translation_service, vector_service, answer_cache, direct_answer_threshold)
+            if state['answer'] is not None:
+                pipeline_metrics.observe('time_to_first_token', time.perf_counter() - start)
+                yield state['answer']
+                return
+
+            detected_lang, translated = state['detected_lang'], state['translated']
+            relevant_faqs = state['relevant_faqs']
+
+            answer_parts = []
+
+            answer_lang = state['answer_lang']
+
+            def generated_chunks():
+                for chunk in vertexai_service.stream_answer(translated, relevant_faqs, language=answer_lang):
+                    answer_parts.append(chunk)
+                    yield chunk
+
+            if answer_lang == detected_lang:
+                localized = generated_chunks()
+            else:
+                localized = _translate_sentences(generated_chunks(), translation_service, detected_lang)
+
+            final_parts = []
+            for chunk in localized:
+                if not final_parts:
+                    pipeline_metrics.observe('time_to_first_token', time.perf_counter() - start)
+                final_parts.append(chunk)
+                yield chunk
+
+            # A stream that turned out empty or error-like is followed by the FAQ fallback
+            answer = vertexai_service.clean_answer("".join(answer_parts))
+            if answer is not None:
+                pipeline_metrics.incr('llm_answers')
+                _store_answer(state, answer_cache, answer, "".join(final_parts).strip())
+                return
+
+            pipeline_metrics.incr('llm_fallbacks')
+            pipeline_metrics.observe('time_to_first_token', time.perf_counter() - start)
+            yield localize_faq_answer(fallback_answer(relevant_faqs), detected_lang, translation_service, vector_service)
+        finally:
+            pipeline_metrics.observe('translation_calls', translation_calls.count)
+
+
+async def _aprepare(user_input: str, translation_service, vector_service, answer_cache, direct_answer_threshold) -> Dict:
+    """
+    Async variant of _prepare
+
+    Unless the input is confidently non-English, the raw input is embedded
+    speculatively while translation is in flight; the embedding is used if
+    the input turns out to need no translation. With cross-lingual
+    retrieval, the raw input is always embedded, alongside language
+    detection.
+    """
+    if vector_service.multilingual:
+        embedding = asyncio.ensure_future(vector_service.aembed_query(user_input))
+        try:
+            detected_lang = await translation_service.adetect_language(user_input)
+        except BaseException:
+            embedding.cancel()
+            raise
+        state = _new_state(detected_lang, user_input, detected_lang, await embedding)
+        return await _afinish_prepare(state, translation_service, vector_service, answer_cache, direct_answer_threshold)
+
+    lang, confidence = translation_service.detector.detect(user_input)
+    speculative = None
+    if lang in (None, 'en') or confidence < translation_service.min_confidence:
+        speculative = asyncio.ensure_future(vector_service.aembed_query(user_input))
+
+    try:
+        detected_lang, translated = await translation_service.atranslate_with_detection(user_input)
+    except BaseException:
+        if speculative is not None:
+            speculative.cancel()
+        raise
+
+    if speculative is not None and translated == user_input:
+        pipeline_metrics.incr('speculative_retrieval_hits')
+        query_embedding = await speculative
+    else:
+        if speculative is not None:
+            pipeline_metrics.incr('speculative_retrieval_misses')
+            speculative.cancel()
+        query_embedding = await vector_service.aembed_query(translated)
+
+    state = _new_state(detected_lang, translated, 'en', query_embedding)
+    return await _afinish_prepare(state, translation_service, vector_service, answer_cache, direct_answer_threshold)
+
+
+async def _afinish_prepare(state: Dict, translation_service, vector_service, answer_cache,
+                           direct_answer_threshold) -> Dict:
+    """Finish _aprepare from an embedded query: answer cache first, then FAQ search and the direct FAQ path."""
+    detected_lang, translated = state['detected_lang'], state['translated']
+    cached = _cached_answer(state, answer_cache)
+    if cached is not None:
+        answer, lang = cached
+        if lang != detected_lang:
+            answer = await translation_service.atranslate_from_english(answer, detected_lang)
+            answer_cache.store(state['query_embedding'], translated, {detected_lang: answer})
+        state['answer'] = answer
+        return state
+
+    state['relevant_faqs'] = await vector_service.aget_relevant_context(translated, k=5,
+                                                                        embedding=state['query_embedding'])
+    faq = _direct_answer_faq(state['relevant_faqs'], direct_answer_threshold)
+    if faq is not None:
+        state['answer'] = await alocalize_faq_answer(faq['answer'], detected_lang, translation_service, vector_service)
+    return state
+
+
+async def aprocess_query(user_input: str, translation_service, vector_service, vertexai_service, answer_cache=None,
+                         direct_answer_threshold=None, single_flight=None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Async variant of process_query
+
+    Blocking translation and retrieval calls run on the shared bounded
+    thread pool and Gemini is called through the chain's async API, so many
+    queries can be in flight on one event loop.
+
+    Returns:
+        Tuple of (answer, error message); exactly one of them is None
+    """
+    if single_flight is not None:
+        return await single_flight.acall(_flight_key(user_input, translation_service), aprocess_query,
+                                         user_input, translation_service, vector_service, vertexai_service,
+                                         answer_cache, direct_answer_threshold)
+    with count_remote_calls() as translation_calls:
+        try:
+            pipeline_metrics.incr('queries')
+            state = await _aprepare(user_input, translation_service, vector_service, answer_cache, direct_answer_threshold)
+            if state['answer'] is not None:
+                return state['answer'], None
+
+            detected_lang, translated = state['detected_lang'], state['translated']
+            relevant_faqs = state['relevant_faqs']
+
+            answer_lang = state['answer_lang']
+            answer = await vertexai_service.agenerate_answer(translated, relevant_faqs, language=answer_lang)
+            generated = answer is not None
+            pipeline_metrics.incr('llm_answers' if generated else 'llm_fallbacks')
+
+            if answer is None:
+                final_answer = await alocalize_faq_answer(fallback_answer(relevant_faqs), detected_lang,
+                                                          translation_service, vector_service)
+            else:
+                final_answer = await _alocalize(answer, answer_lang, detected_lang, translation_service)
+            if generated:
+                _store_answer(state, answer_cache, answer, final_answer)
+            return final_answer, None
+        except Exception as e:
+            error_msg = str(e)
+            print(f"Error in aprocess_query: {error_msg}")
+            return None, f"Error processing query: {error_msg}"
+        finally:
+            pipeline_metrics.observe('translation_calls', translation_calls.count)
+
+
+async def _atranslate_sentences(chunks: AsyncIterator[str], translation_service, target_language: str) -> AsyncIterator[str]:
+    """Async variant of _translate_sentences."""
+    buffer = ""
+    async for chunk in chunks:
+        sentences, buffer = _complete_sentences(buffer + chunk)
+        for sentence, separator in sentences:
+            if sentence.strip():
+                yield await translation_service.atranslate_from_english(sentence, target_language) + separator
+            else:
+                yield separator
+    if buffer.strip():
+        yield await translation_service.atranslate_from_english(buffer, target_language)
+
+
+async def astream_query(user_input: str, translation_service, vector_service, vertexai_service, answer_cache=None,
+                        direct_answer_threshold=None, single_flight=None) -> AsyncIterator[str]:
+    """
+    Async variant of stream_query
+
+    Yields:
+        Chunks of the localized answer
+    """
+    if single_flight is not None:
+        async for chunk in single_flight.astream(_flight_key(user_input, translation_service), astream_query,
+                                                 user_input, translation_service, vector_service, vertexai_service,
+                                                 answer_cache, direct_answer_threshold):
+            yield chunk
+        return
+
+    with count_remote_calls() as translation_calls:
+        try:
+            start = time.perf_counter()
+            pipeline_metrics.incr('queries')
+            state = await _aprepare(user_input, translation_service, vector_service, answer_cache, direct_answer_threshold)
+            if state['answer'] is not None:
+                pipeline_metrics.observe('time_to_first_token', time.perf_counter() - start)
+                yield state['answer']
+                return
+
+            detected_lang, translated = state['detected_lang'], state['translated']
+            relevant_faqs = state['relevant_faqs']
+
+            answer_parts = []
+
+            answer_lang = state['answer_lang']
+
+            async def generated_chunks():
+                async for chunk in vertexai_service.astream_answer(translated, relevant_faqs, language=answer_lang):
+                    answer_parts.append(chunk)
+                    yield chunk
+
+            if answer_lang == detected_lang:
+                localized = generated_chunks()
+            else:
+                localized = _atranslate_sentences(generated_chunks(), translation_service, detected_lang)
+
+            final_parts = []
+            async for chunk in localized:
+                if not final_parts:
+                    pipeline_metrics.observe('time_to_first_token', time.perf_counter() - start)
+                final_parts.append(chunk)
+                yield chunk
+
+            # A stream that turned out empty or error-like is followed by the FAQ fallback
+            answer = vertexai_service.clean_answer("".join(answer_parts))
+            if answer is not None:
+                pipeline_metrics.incr('llm_answers')
+                _store_answer(state, answer_cache, answer, "".join(final_parts).strip())
+                return
+
+            pipeline_metrics.incr('llm_fallbacks')
+            pipeline_metrics.observe('time_to_first_token', time.perf_counter() - start)
+            yield await alocalize_faq_answer(fallback_answer(relevant_faqs), detected_lang, translation_service, vector_service)
+        finally:
+            pipeline_metrics.observe('translation_calls', translation_calls.count)
@@ -0,0 +1,207 @@
+"""
+Client-side rate limiting for quota-bound remote services
+A token bucket per service paces calls under its quota. Callers waiting for a
+token are served by priority, so interactive requests go ahead of batch jobs,
+and the rate backs off when the service still answers with quota errors.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from metrics import Metrics
+
+
+# Request priorities, lower first
+INTERACTIVE = 0
+BATCH = 1
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """Run the remote calls made in this context (and in threads started with a copy of it) at a priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    """Priority of the remote calls made in this context."""
+    return _priority.get()
+
+
+class RateLimitedError(RuntimeError):
+    """Raised instead of calling a remote service when no rate limit token is available in time"""
+
+
+class RateLimiter:
+    """Token bucket with a priority queue of waiting callers and an adaptive rate"""
+
+    def __init__(self, name: str, rate: float, burst: Optional[float] = None,
+                 max_wait: Optional[Dict[int, float]] = None, backoff: float = 0.7, recovery: float = 0.05,
+                 min_rate_fraction: float = 0.1):
+        """
+        Initialize a full bucket
+
+        Args:
+            name: Service name, used in error messages
+            rate: Calls per second to stay under (e.g. 90% of the quota)
+            burst: Bucket capacity, i.e. calls that may go out at once after
+                   an idle period (default: one second of calls)
+            max_wait: Longest queueing time per priority, in seconds; callers
+                      whose expected wait is longer are shed on arrival
+                      (default: 2 s interactive, 60 s batch)
+            backoff: Factor the rate is multiplied by when the service
+                     reports a quota error
+            recovery: Fraction of rate regained per second without quota errors
+            min_rate_fraction: Floor of the backed-off rate, as a fraction of rate
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.max_wait = max_wait if max_wait is not None else {INTERACTIVE: 2.0, BATCH: 60.0}
+        self.backoff = backoff
+        self.recovery = recovery
+        self.min_rate = rate * min_rate_fraction
+        self.metrics = Metrics()
+        self._lock = threading.Lock()
+        self._current_rate = rate
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._throttled_at = float('-inf')
+        self._waiting: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def current_rate(self) -> float:
+        """Calls per second currently allowed."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._current_rate
+
+    def _refill(self, now: float):
+        """Add the tokens earned since the last update and recover the rate (lock held)."""
+        elapsed = now - self._updated
+        self._updated = now
+        self._current_rate = min(self.rate, self._current_rate + self.rate * self.recovery * elapsed)
+        self._tokens = min(self.burst, self._tokens + self._current_rate * elapsed)
+
+    def _enqueue(self, priority: int, timeout: Optional[float]) -> Tuple[Tuple[int, int], float, float]:
+        """
+        Join the queue, or shed the call if its expected wait is too long
+
+        Returns:
+            Tuple of (queue entry, arrival time, deadline)
+        """
+        now = time.monotonic()
+        max_wait = self.max_wait.get(priority, max(self.max_wait.values()))
+        if timeout is not None:
+            max_wait = min(max_wait, timeout)
+        entry = (priority, next(self._sequence))
+        with self._lock:
+            self._refill(now)
+            ahead = sum(1 for waiting in self._waiting if waiting < entry)
+            expected = max(0.0, ahead + 1 - self._tokens) / self._current_rate
+            if expected > max_wait:
+                self.metrics.incr('shed')
+                raise RateLimitedError(f"{self.name} rate limit: expected wait {expected:.1f}s exceeds {max_wait:.1f}s")
+            heapq.heappush(self._waiting, entry)
+        return entry, now, now + max_wait
+
+    def _poll(self, entry: Tuple[int, int], arrived: float, deadline: float) -> Optional[float]:
+        """
+        Take a token if the entry is first in the queue and one is available
+
+        Returns:
+            None once the token is taken, otherwise the time to sleep before polling again
+
+        Raises:
+            RateLimitedError: The deadline passed while queueing
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            if self._waiting[0] == entry and self._tokens >= 1:
+                heapq.heappop(self._waiting)
+                self._tokens -= 1
+                self.metrics.incr('granted')
+                self.metrics.observe('queue_seconds', now - arrived)
+                return None
+            if now >= deadline:
+                self.metrics.incr('rejected')
+                raise RateLimitedError(f"{self.name} rate limit: no token within {deadline - arrived:.1f}s")
+            ahead = sum(1 for waiting in self._waiting if waiting < entry)
+            expected = max(0.0, ahead + 1 - self._tokens) / self._current_rate
+        return min(max(expected, 0.001), deadline - now)
+
+    def _leave(self, entry: Tuple[int, int]):
+        """Remove an entry from the queue, if it is still waiting."""
+        with self._lock:
+            if entry in self._waiting:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+
+    def acquire(self, priority: Optional[int] = None, timeout: Optional[float] = None):
+        """
+        Wait for a token
+
+        Args:
+            priority: Queue priority (default: the context's request_priority)
+            timeout: Longest wait, on top of the priority's max_wait
+
+        Raises:
+            RateLimitedError: The call was shed or no token came in time; nothing was sent
+        """
+        entry, arrived, deadline = self._enqueue(current_priority() if priority is None else priority, timeout)
+        try:
+            while True:
+                delay = self._poll(entry, arrived, deadline)
+                if delay is None:
+                    return
+                time.sleep(delay)
+        except BaseException:
+            self._leave(entry)
+            raise
+
+    async def aacquire(self, priority: Optional[int] = None, timeout: Optional[float] = None):
+        """Async variant of acquire."""
+        entry, arrived, deadline = self._enqueue(current_priority() if priority is None else priority, timeout)
+        try:
+            while True:
+                delay = self._poll(entry, arrived, deadline)
+                if delay is None:
+                    return
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._leave(entry)
+            raise
+
+    def throttled(self):
+        """
+        Slow down after a quota error from the service
+
+        Errors within a second of the last slowdown are treated as the same
+        overload, since they come from calls that were already in flight.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.metrics.incr('throttled')
+            self._refill(now)
+            if now - self._throttled_at < 1.0:
+                return
+            self._throttled_at = now
+            self._current_rate = max(self.min_rate, self._current_rate * self.backoff)
+            self._tokens = min(self._tokens, 0.0)
+
+    def snapshot(self) -> Dict:
+        """Metrics, current rate and queue length of the limiter."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return dict(self.metrics.snapshot(), rate=round(self._current_rate, 3), queued=len(self._waiting))
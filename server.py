@@ -0,0 +1,177 @@
+"""
+Headless HTTP API for the RAG pipeline
+
+Run with:
+    python server.py --workers 4
+Each worker loads its own services after the fork: the FAISS index is
+memory-mapped, so its pages are shared anyway, while the SQLite connections
+(docstore, translation and embedding caches) must not cross a fork.
+
+Set STUB_GOOGLE_CLIENTS=true to load-test offline without Google credentials.
+"""
+import argparse
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from pipeline import aprocess_query, astream_query, pipeline_metrics
+from rate_limiter import BATCH, request_priority
+from services import (create_answer_cache, create_services, create_single_flight, direct_answer_threshold,
+                      stub_mode_enabled)
+
+load_dotenv()
+
+# Longest /batch request accepted, and queries of all /batch requests answered at once by this worker
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+_batch_semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+
+class AskRequest(BaseModel):
+    query: str
+
+
+class AskResponse(BaseModel):
+    answer: Optional[str]
+    error: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    queries: List[str]
+
+
+class BatchResponse(BaseModel):
+    results: List[AskResponse]
+
+
+# Services are created once per worker process and shared by all requests
+_state = {}
+
+
+def get_state() -> dict:
+    """Create the shared services on first use."""
+    if not _state:
+        translation_service, vector_service, vertexai_service = create_services()
+        _state.update(
+            translation_service=translation_service,
+            vector_service=vector_service,
+            vertexai_service=vertexai_service,
+            answer_cache=create_answer_cache(),
+            direct_answer_threshold=direct_answer_threshold(),
+            single_flight=create_single_flight(),
+        )
+    return _state
+
+
+def _pipeline_args() -> tuple:
+    """Positional arguments for the pipeline functions after the user input."""
+    state = get_state()
+    return (
+        state['translation_service'], state['vector_service'], state['vertexai_service'],
+        state['answer_cache'], state['direct_answer_threshold'], state['single_flight'],
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up the services before accepting requests."""
+    await asyncio.get_running_loop().run_in_executor(None, get_state)
+    yield
+
+
+app = FastAPI(title="Multilingual RAG Chatbot API", lifespan=lifespan)
+
+
+@app.post("/ask", response_model=AskResponse)
+async def ask(request: AskRequest) -> AskResponse:
+    """Answer a single query."""
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="query must not be empty")
+    answer, error = await aprocess_query(request.query, *_pipeline_args())
+    return AskResponse(answer=answer, error=error)
+
+
+@app.post("/ask/stream")
+async def ask_stream(request: AskRequest) -> StreamingResponse:
+    """Answer a single query, streaming the answer as plain text chunks."""
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="query must not be empty")
+
+    async def chunks():
+        try:
+            async for chunk in astream_query(request.query, *_pipeline_args()):
+                yield chunk
+        except Exception as e:
+            print(f"Error in astream_query: {e}")
+            yield f"\n\nI encountered an error: Error processing query: {e}"
+
+    return StreamingResponse(chunks(), media_type="text/plain; charset=utf-8")
+
+
+@app.post("/batch", response_model=BatchResponse)
+async def batch(request: BatchRequest) -> BatchResponse:
+    """
+    Answer up to BATCH_MAX_QUERIES queries concurrently, behind interactive requests for rate limits
+
+    All batches of the worker share BATCH_CONCURRENCY slots, so concurrent
+    batches cannot multiply the load. Results are in query order; empty
+    queries get an error row.
+    """
+    if len(request.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"at most {BATCH_MAX_QUERIES} queries per batch")
+    args = _pipeline_args()
+
+    async def answer_one(query: str) -> AskResponse:
+        if not query.strip():
+            return AskResponse(answer=None, error="query must not be empty")
+        async with _batch_semaphore:
+            answer, error = await aprocess_query(query, *args)
+            return AskResponse(answer=answer, error=error)
+
+    with request_priority(BATCH):
+        results = await asyncio.gather(*(answer_one(query) for query in request.queries))
+    return BatchResponse(results=list(results))
+
+
+@app.get("/health")
+async def health() -> dict:
+    """Report readiness and in-process metrics."""
+    if not _state:
+        return {"status": "starting"}
+    return {
+        "status": "ok",
+        "stub": stub_mode_enabled(),
+        "pid": os.getpid(),
+        "pipeline": pipeline_metrics.snapshot(),
+        "translation": _state['translation_service'].metrics.snapshot(),
+        "vertexai": _state['vertexai_service'].metrics.snapshot(),
+        "context": _state['vertexai_service'].context_builder.metrics.snapshot(),
+        "single_flight": _state['single_flight'].metrics.snapshot() if _state['single_flight'] else None,
+        "transport": {
+            name: service.remote_service.snapshot() if service.remote_service else None
+            for name, service in (('translate', _state['translation_service']), ('vertex', _state['vertexai_service']))
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the RAG pipeline over HTTP")
+    parser.add_argument("--host", default=os.getenv("SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVER_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVER_WORKERS", "1")))
+    parser.add_argument("--stub", action="store_true", help="use offline stand-ins for the Google clients")
+    args = parser.parse_args()
+
+    if args.stub:
+        os.environ["STUB_GOOGLE_CLIENTS"] = "true"
+
+    import uvicorn
+    uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Service construction shared by the Streamlit app, HTTP server and batch jobs
+Configuration is read from environment variables (see README)
+"""
+import os
+from typing import Optional, Tuple
+from answer_cache import SemanticAnswerCache
+from context_builder import ContextBuilder
+from embedding_backends import multilingual_enabled
+from faq_dedup import detector_from_env
+from index_factory import IndexConfig
+from multi_vector import MultiVectorConfig
+from single_flight import SingleFlight
+from translation_cache import TranslationCache
+from translation_service import TranslationService
+from transport import Transport
+from vectorstore_service import VectorStoreService
+from vertexai_service import VertexAIService
+
+
+def stub_mode_enabled() -> bool:
+    """Check whether STUB_GOOGLE_CLIENTS asks for offline stand-ins of the Google clients."""
+    return os.getenv("STUB_GOOGLE_CLIENTS", "false").lower() == "true"
+
+
+def create_services(stub: Optional[bool] = None) -> Tuple[TranslationService, VectorStoreService, VertexAIService]:
+    """
+    Create and warm up the translation, vector store and Vertex AI services
+
+    Args:
+        stub: Use offline stand-ins for the Google clients
+              (default: STUB_GOOGLE_CLIENTS environment variable)
+
+    Returns:
+        Tuple of (translation_service, vector_service, vertexai_service)
+    """
+    if stub is None:
+        stub = stub_mode_enabled()
+
+    project_id = os.getenv("GCP_PROJECT_ID")
+    region = os.getenv("GCP_REGION", "us-central1")
+
+    if not project_id and not stub:
+        raise ValueError("GCP_PROJECT_ID not found. Please set it in your .env file.")
+
+    llm = None
+    if stub:
+        from stubs import create_stub_llm, stub_latency
+        print("Using stub Google clients (no network calls)...")
+        llm = create_stub_llm(latency=stub_latency())
+
+    transport = create_transport()
+    print("Initializing translation service...")
+    translation_service = create_translation_service(stub, transport=transport)
+
+    print("Initializing vector store service...")
+    vector_service = create_vector_service()
+
+    print("Initializing Vertex AI service...")
+    vertexai_service = VertexAIService(
+        project_id=project_id or "stub",
+        location=region,
+        llm=llm,
+        context_builder=ContextBuilder.from_env(embed=vector_service.embed_queries),
+        transport=transport,
+        api_endpoint=os.getenv("VERTEX_API_ENDPOINT") or None
+    )
+
+    print("Loading vector store...")
+    vector_service.load_vectorstore()
+
+    print("All services initialized successfully!")
+    return translation_service, vector_service, vertexai_service
+
+
+def openai_embeddings_enabled() -> bool:
+    """Check whether USE_OPENAI_EMBEDDINGS asks for OpenAI embeddings and an OPENAI_API_KEY is set."""
+    return bool(os.getenv("OPENAI_API_KEY")) and os.getenv("USE_OPENAI_EMBEDDINGS", "false").lower() == "true"
+
+
+def create_vector_service(use_openai: Optional[bool] = None) -> VectorStoreService:
+    """
+    Create the vector store service (the index is not loaded yet)
+
+    Used by the services and by setup.py, so the index is built with the
+    same embedding model, index and deduplication settings it is served with.
+
+    Args:
+        use_openai: Use OpenAI embeddings (default: openai_embeddings_enabled)
+    """
+    return VectorStoreService(
+        use_openai=openai_embeddings_enabled() if use_openai is None else use_openai,
+        index_config=IndexConfig.from_env(),
+        embedding_cache_dir=os.getenv("EMBEDDING_CACHE_DIR") or None,
+        hybrid=os.getenv("HYBRID_SEARCH", "true").lower() == "true",
+        hybrid_candidates=int(os.getenv("HYBRID_CANDIDATES", "20")),
+        dedup=detector_from_env(),
+        multi_vector=MultiVectorConfig.from_env(),
+        multilingual=multilingual_enabled()
+    )
+
+
+def create_transport() -> Optional[Transport]:
+    """Create the shared transport of the Google clients (see Transport.from_env), or None if TRANSPORT_ENABLED is false."""
+    if os.getenv("TRANSPORT_ENABLED", "true").lower() != "true":
+        return None
+    return Transport.from_env()
+
+
+def create_translation_service(stub: Optional[bool] = None, transport: Optional[Transport] = None) -> TranslationService:
+    """
+    Create the translation service with its cache
+
+    Args:
+        stub: Use an offline stand-in for the Translation client
+              (default: STUB_GOOGLE_CLIENTS environment variable)
+        transport: Shared transport (default: a new one from create_transport)
+    """
+    if stub is None:
+        stub = stub_mode_enabled()
+    translate_client = None
+    if stub:
+        from stubs import StubTranslateClient, stub_latency
+        translate_client = StubTranslateClient(latency=stub_latency())
+
+    translation_cache = TranslationCache(
+        max_entries=int(os.getenv("TRANSLATION_CACHE_SIZE", "10000")),
+        ttl_seconds=float(os.getenv("TRANSLATION_CACHE_TTL", str(7 * 24 * 3600))),
+        db_path=os.getenv("TRANSLATION_CACHE_DB") or None
+    )
+    return TranslationService(
+        cache=translation_cache,
+        client=translate_client,
+        transport=transport if transport is not None else create_transport(),
+        api_endpoint=os.getenv("TRANSLATE_API_ENDPOINT") or None
+    )
+
+
+def create_answer_cache() -> Optional[SemanticAnswerCache]:
+    """Create the semantic answer cache, or None if ANSWER_CACHE_ENABLED is false."""
+    if os.getenv("ANSWER_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    return SemanticAnswerCache(
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+        max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "2000")),
+        ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600))),
+        path=os.getenv("ANSWER_CACHE_PATH") or None
+    )
+
+
+def create_single_flight() -> Optional[SingleFlight]:
+    """Create the request coalescing layer, or None if REQUEST_COALESCING is false."""
+    if os.getenv("REQUEST_COALESCING", "true").lower() != "true":
+        return None
+    return SingleFlight()
+
+
+def direct_answer_threshold() -> Optional[float]:
+    """Similarity above which FAQ answers are returned without the LLM (DIRECT_ANSWER_THRESHOLD, default 0.95)."""
+    value = os.getenv("DIRECT_ANSWER_THRESHOLD", "0.95")
+    return float(value) if value else None
@@ -1,11 +1,21 @@
 """
 Setup script to initialize the vector store
-Run this once before starting the app for the first time
+Run this once before starting the app for the first time, and again after
+editing faqs.json to update the index in place (--rebuild forces a full rebuild)
 """
 import os
+import sys
 from dotenv import load_dotenv
+from services import create_vector_service, openai_embeddings_enabled
 from vectorstore_service import VectorStoreService
 
+def build(vector_service: VectorStoreService, rebuild: bool):
+    """Create the index, or update an existing one incrementally"""
+    if rebuild or not os.path.exists(vector_service.index_path):
+        vector_service.create_vectorstore()
+    else:
+        vector_service.update_vectorstore()
+
 def main():
     print("=" * 60)
     print("Initializing Multilingual Chatbot")
@@ -14,10 +24,11 @@ def main():
     # Load environment variables
     load_dotenv()
     
+    rebuild = "--rebuild" in sys.argv[1:]
     print("\nCreating FAISS vector store from FAQs...")
     
-    # Check if OpenAI key is available
-    use_openai = bool(os.getenv("OPENAI_API_KEY"))
+    # Same embedding model as the app (OPENAI_API_KEY plus USE_OPENAI_EMBEDDINGS=true)
+    use_openai = openai_embeddings_enabled()
     
     if use_openai:
         print("OpenAI API key found - attempting to use OpenAI embeddings")
@@ -27,14 +38,14 @@ def main():
     
     try:
         # Initialize and create vector store
-        vector_service = VectorStoreService(use_openai=use_openai)
-        vector_service.create_vectorstore()
+        vector_service = create_vector_service(use_openai)
+        build(vector_service, rebuild)
     except Exception as e:
         if "insufficient_quota" in str(e) or "RateLimitError" in str(e):
             print("\nOpenAI quota exceeded! Switching to free HuggingFace embeddings...")
             print("This will download the model on first run (~90MB)")
-            vector_service = VectorStoreService(use_openai=False)
-            vector_service.create_vectorstore()
+            vector_service = create_vector_service(use_openai=False)
+            build(vector_service, rebuild)
         else:
             raise
     
@@ -0,0 +1,191 @@
+"""
+Request coalescing for identical in-flight queries
+Concurrent requests with the same key share one execution of the pipeline and
+all receive its result, so bursts of the same question cost one set of
+Translation, FAISS and Gemini calls.
+"""
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+from metrics import Metrics
+from translation_cache import normalize_text
+
+
+def request_key(query: str, language: Optional[str]) -> Tuple[str, Optional[str]]:
+    """Coalescing key of a query: its normalized text and language."""
+    return normalize_text(query), language
+
+
+class _Flight:
+    """Result of one shared call, available once done is set"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class _Stream:
+    """Chunks of one shared stream; every consumer replays them from the start"""
+
+    def __init__(self, condition):
+        self.condition = condition
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time and shares its outcome with concurrent callers"""
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self.metrics = Metrics()
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Flight] = {}
+        self._streams: Dict[Hashable, _Stream] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    def _join(self, flights: Dict, key: Hashable, create: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Get the flight for a key, creating it if there is none; returns (flight, created)."""
+        with self._lock:
+            flight = flights.get(key)
+            if flight is not None:
+                self.metrics.incr('coalesced')
+                return flight, False
+            flight = flights[key] = create()
+            self.metrics.incr('executed')
+            return flight, True
+
+    def _forget(self, flights: Dict, key: Hashable):
+        """Drop a finished flight, so later requests run afresh."""
+        with self._lock:
+            flights.pop(key, None)
+
+    def call(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """
+        Call func, or wait for the identical call already in flight
+
+        Args:
+            key: Identity of the request (see request_key)
+            func, *args, **kwargs: The computation
+
+        Returns:
+            The shared result; an exception of the shared call is raised to every caller
+        """
+        flight, leader = self._join(self._calls, key, _Flight)
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = func(*args, **kwargs)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._forget(self._calls, key)
+            flight.done.set()
+
+    def stream(self, key: Hashable, func: Callable[..., Iterator[str]], *args, **kwargs) -> Iterator[str]:
+        """
+        Stream the chunks of func, or of the identical stream already in flight
+
+        The shared stream is produced on a background thread, so it runs to
+        completion for the remaining consumers when one of them stops early.
+
+        Yields:
+            All chunks of the shared stream, from the first; its exception is
+            raised to every consumer
+        """
+        flight, leader = self._join(self._streams, key, lambda: _Stream(threading.Condition()))
+        if leader:
+            def produce():
+                try:
+                    for chunk in func(*args, **kwargs):
+                        with flight.condition:
+                            flight.chunks.append(chunk)
+                            flight.condition.notify_all()
+                except BaseException as e:
+                    flight.error = e
+                finally:
+                    self._forget(self._streams, key)
+                    with flight.condition:
+                        flight.done = True
+                        flight.condition.notify_all()
+
+            threading.Thread(target=produce, name="single-flight-stream", daemon=True).start()
+
+        position = 0
+        while True:
+            with flight.condition:
+                flight.condition.wait_for(lambda: position < len(flight.chunks) or flight.done)
+                chunks, done = flight.chunks[position:], flight.done
+            for chunk in chunks:
+                yield chunk
+            position += len(chunks)
+            if done and position == len(flight.chunks):
+                if flight.error is not None:
+                    raise flight.error
+                return
+
+    async def acall(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """
+        Async variant of call for coroutine functions
+
+        The shared call runs as its own task, so cancelling one caller (e.g. a
+        client disconnect) does not cancel it for the others.
+        """
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+
+        def create():
+            task = loop.create_task(func(*args, **kwargs))
+            task.add_done_callback(lambda _: self._forget(self._tasks, task_key))
+            return task
+
+        task, _ = self._join(self._tasks, task_key, create)
+        return await asyncio.shield(task)
+
+    async def astream(self, key: Hashable, func: Callable[..., AsyncIterator[str]], *args, **kwargs) -> AsyncIterator[str]:
+        """
+        Async variant of stream for async generator functions
+
+        The shared stream is produced by its own task, like acall.
+        """
+        loop = asyncio.get_running_loop()
+        stream_key = (loop, key)
+        flight, leader = self._join(self._streams, stream_key, lambda: _Stream(asyncio.Condition()))
+        if leader:
+            async def produce():
+                try:
+                    async for chunk in func(*args, **kwargs):
+                        async with flight.condition:
+                            flight.chunks.append(chunk)
+                            flight.condition.notify_all()
+                except BaseException as e:
+                    flight.error = e
+                finally:
+                    self._forget(self._streams, stream_key)
+                    async with flight.condition:
+                        flight.done = True
+                        flight.condition.notify_all()
+
+            flight.task = loop.create_task(produce())
+
+        position = 0
+        while True:
+            async with flight.condition:
+                await flight.condition.wait_for(lambda: position < len(flight.chunks) or flight.done)
+                chunks, done = flight.chunks[position:], flight.done
+            for chunk in chunks:
+                yield chunk
+            position += len(chunks)
+            if done and position == len(flight.chunks):
+                if flight.error is not None:
+                    raise flight.error
+                return
@@ -0,0 +1,245 @@
+"""
+Offline stand-ins for the Google clients and the embedding model
+Used by the HTTP server's stub mode for local load testing without credentials,
+as a local fake Translation API server for testing the transport layer, and
+as a tiny deterministic embedding model for index and pipeline tests
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Union
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import RunnableLambda
+from language_detector import LocalLanguageDetector
+
+
+class StubTranslateClient:
+    """Mimics google.cloud.translate_v2.Client without network access"""
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Initialize the stub client
+
+        Args:
+            latency: Simulated round-trip time per call, in seconds
+        """
+        self.latency = latency
+        self.detector = LocalLanguageDetector()
+
+    def detect_language(self, values: Union[str, List[str]]) -> Union[Dict, List[Dict]]:
+        """Detect languages locally; unknown input is reported as English."""
+        time.sleep(self.latency)
+        if isinstance(values, list):
+            return [self._detect(value) for value in values]
+        return self._detect(values)
+
+    def translate(self, values: Union[str, List[str]], target_language: str = 'en',
+                  source_language: str = None, **kwargs) -> Union[Dict, List[Dict]]:
+        """'Translate' by tagging the text with the target language; English targets are left unchanged."""
+        time.sleep(self.latency)
+        if isinstance(values, list):
+            return [self._translate(value, target_language, source_language) for value in values]
+        return self._translate(values, target_language, source_language)
+
+    def _detect(self, value: str) -> Dict:
+        lang, confidence = self.detector.detect(value)
+        return {'language': lang or 'en', 'confidence': confidence, 'input': value}
+
+    def _translate(self, value: str, target_language: str, source_language: str) -> Dict:
+        detected = source_language or self._detect(value)['language']
+        translated = value if target_language in ('en', detected) else f"[{target_language}] {value}"
+        result = {'translatedText': translated, 'input': value}
+        if source_language is None:
+            result['detectedSourceLanguage'] = detected
+        return result
+
+
+class FakeTranslateServer:
+    """
+    Local HTTP server speaking the Translation API v2 REST protocol
+
+    Answers like StubTranslateClient, with optional latency and transient
+    failures, so the real client and the transport (pooling, deadlines,
+    retries, circuit breaker) can be exercised without credentials. Point
+    TranslationService(api_endpoint=server.url) at it, with a transport
+    that does not authenticate.
+    """
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, failure_status: int = 503):
+        """
+        Initialize the server (not started)
+
+        Args:
+            latency: Delay before each response, in seconds
+            failure_rate: Fraction of requests answered with failure_status
+            failure_status: HTTP status of failed requests
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.client = StubTranslateClient()
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running server."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeTranslateServer":
+        """Serve on a free local port from a background thread."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+                with fake._lock:
+                    fake.requests += 1
+                time.sleep(fake.latency)
+                path = self.path.split('?', 1)[0]
+                if random.random() < fake.failure_rate:
+                    self._reply(fake.failure_status, {'error': {'code': fake.failure_status, 'message': "Unavailable"}})
+                elif path.endswith("/language/translate/v2/detect"):
+                    detections = [[{'language': d['language'], 'confidence': d['confidence'], 'isReliable': False}]
+                                  for d in fake.client.detect_language(list(body.get('q', [])))]
+                    self._reply(200, {'data': {'detections': detections}})
+                elif path.endswith("/language/translate/v2"):
+                    translations = fake.client.translate(list(body.get('q', [])), target_language=body.get('target', 'en'),
+                                                         source_language=body.get('source'))
+                    for translation in translations:
+                        translation.pop('input')
+                    self._reply(200, {'data': {'translations': translations}})
+                else:
+                    self._reply(404, {'error': {'code': 404, 'message': f"Unknown path {path}"}})
+
+            def _reply(self, status: int, payload: Dict):
+                data = json.dumps(payload).encode('utf-8')
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (e.g. its deadline passed) before the reply
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-translate-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        """Shut the server down."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeTranslateServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class StubEmbeddings(Embeddings):
+    """
+    Hashed bag-of-words embeddings, unit length
+
+    Texts sharing words get a positive cosine similarity, so retrieval tests
+    behave sensibly without downloading a model.
+    """
+
+    model_name = "stub-hashed-bag-of-words"
+
+    def __init__(self, dimension: int = 256):
+        """
+        Initialize the stub model
+
+        Args:
+            dimension: Vector dimension
+        """
+        self.dimension = dimension
+        self.calls = 0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in re.findall(r"\w+", text.casefold()):
+            vector[int(hashlib.md5(word.encode('utf-8')).hexdigest(), 16) % self.dimension] += 1.0
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            vector[0], norm = 1.0, 1.0
+        return (vector / norm).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts (one call)."""
+        self.calls += 1
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed one text (one call)."""
+        self.calls += 1
+        return self._embed(text)
+
+
+_FIRST_ANSWER_RE = re.compile(r"^A1: (.*)$", re.MULTILINE)
+_LANGUAGE_RE = re.compile(r"language with code '([\w-]+)'")
+
+
+def _stub_answer(prompt: PromptValue) -> str:
+    """Answer with the first FAQ answer found in the prompt's context, tagged like StubTranslateClient when not English."""
+    text = prompt.to_string()
+    match = _FIRST_ANSWER_RE.search(text)
+    answer = match.group(1) if match else "I could not find a relevant answer."
+    language = _LANGUAGE_RE.search(text)
+    if language and language.group(1) != 'en':
+        answer = f"[{language.group(1)}] {answer}"
+    return answer
+
+
+def create_stub_llm(latency: float = 0.0) -> RunnableLambda:
+    """
+    Create a stand-in for ChatVertexAI that echoes the best FAQ answer
+
+    Args:
+        latency: Simulated generation time per call, in seconds
+
+    Returns:
+        Runnable usable as VertexAIService(llm=...)
+    """
+    def invoke(prompt: PromptValue) -> str:
+        time.sleep(latency)
+        return _stub_answer(prompt)
+
+    async def ainvoke(prompt: PromptValue) -> str:
+        await asyncio.sleep(latency)
+        return _stub_answer(prompt)
+
+    return RunnableLambda(invoke, afunc=ainvoke)
+
+
+def stub_latency() -> float:
+    """Simulated per-call latency for stub clients, from STUB_LATENCY_MS (default: 0)."""
+    return float(os.getenv("STUB_LATENCY_MS", "0")) / 1000.0
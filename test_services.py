@@ -1,9 +1,41 @@
 """
 Test script to verify all services are working correctly
 """
+import asyncio
+import io
+import json
+import multiprocessing
 import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import faiss
+import numpy as np
 from dotenv import load_dotenv
+from langchain_core.runnables import RunnableLambda
+from answer_cache import SemanticAnswerCache
+from answer_translations import AnswerTranslations, translate_answers
+from batch import answer_batch, read_queries
+from bm25_index import BM25Index
+from context_builder import ContextBuilder
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from faq_dedup import DuplicateDetector
+from faq_store import DOCSTORE_FILE, create_docstore, read_index
+from index_builder import IndexBuilder
+from index_factory import IndexConfig, apply_search_params, build_index
+from language_detector import LocalLanguageDetector
+from multi_vector import MultiVectorConfig, aggregate
+from pipeline import (_atranslate_sentences, _translate_sentences, aprocess_query, astream_query, pipeline_metrics,
+                      process_query, stream_query)
+from rate_limiter import BATCH, INTERACTIVE, RateLimitedError, RateLimiter, request_priority
+from services import create_translation_service
+from single_flight import SingleFlight, request_key
+from stubs import StubEmbeddings, StubTranslateClient, create_stub_llm
+from translation_cache import TranslationCache
 from translation_service import TranslationService
+from transport import CircuitOpenError, RemoteService, RetryPolicy, Transport
 from vectorstore_service import VectorStoreService
 from vertexai_service import VertexAIService
 
@@ -25,11 +57,591 @@ def test_translation():
         back = service.translate_from_english("How do I reset my password?", "es")
         print(f"Translation to Spanish: '{back}'")
         
+        calls_before = service.metrics.get('remote_calls')
+        lang, translated = service.translate_with_detection(text_es)
+        print(f"Detect + translate: '{text_es}' -> {lang}, '{translated}'")
+        assert service.metrics.get('remote_calls') - calls_before == 1
+        
+        calls_before = service.metrics.get('remote_calls')
+        assert service.translate_with_detection("How do I reset my password?") == ('en', "How do I reset my password?")
+        assert service.metrics.get('remote_calls') == calls_before
+        print("English input short-circuited without remote calls")
+        
+        assert service.detect_batch([text_es, "How do I reset my password?"]) == ['es', 'en']
+        print("Batch detection: es, en")
+        
         return True
     except Exception as e:
         print(f"Translation service failed: {e}")
         return False
 
+def test_language_detector():
+    """Test the offline language detector."""
+    print("\nTesting Local Language Detector...")
+    print("-" * 50)
+    
+    try:
+        detector = LocalLanguageDetector()
+        samples = {
+            "How do I reset my password?": 'en',
+            "¿Cómo restablezco mi contraseña?": 'es',
+            "Wie kann ich mein Passwort ändern?": 'de',
+            "パスワードをリセットするには": 'ja',
+            "비밀번호를 어떻게 재설정하나요": 'ko',
+        }
+        for text, expected in samples.items():
+            lang, confidence = detector.detect(text)
+            print(f"'{text}' -> {lang} ({confidence:.2f})")
+            assert lang == expected and confidence >= 0.8
+        
+        lang, confidence = detector.detect("hola")
+        print(f"'hola' -> {lang} ({confidence:.2f}), falls back to remote detection")
+        assert confidence < 0.8
+        
+        return True
+    except Exception as e:
+        print(f"Local language detector failed: {e}")
+        return False
+
+def test_translation_cache():
+    """Test the two-tier translation cache."""
+    print("\nTesting Translation Cache...")
+    print("-" * 50)
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "cache.sqlite")
+            cache = TranslationCache(max_entries=2, db_path=db_path)
+            cache.put("¿Cómo restablezco mi contraseña?", 'auto', 'en', "How do I reset my password?", 'es')
+            assert cache.get("  ¿Cómo restablezco   mi contraseña? ", 'auto', 'en') == ("How do I reset my password?", 'es')
+            cache.put("US", 'en', 'es', "EE. UU.", 'en')
+            assert cache.get("us", 'en', 'es') is None
+            assert cache.get("¿Cómo restablezco mi contraseña?", 'auto', 'fr') is None
+            
+            cache.put("a", 'en', 'es', "a-es", 'en')
+            cache.put("b", 'en', 'es', "b-es", 'en')
+            assert len(cache) == 2
+            
+            reopened = TranslationCache(db_path=db_path)
+            assert reopened.get("¿Cómo restablezco mi contraseña?", 'auto', 'en') is not None
+            print(f"Cache metrics: {cache.metrics.snapshot()['counters']}")
+            
+            expired = TranslationCache(ttl_seconds=0, db_path=db_path)
+            assert expired.get("a", 'en', 'es') is None
+        
+        return True
+    except Exception as e:
+        print(f"Translation cache failed: {e}")
+        return False
+
+def test_answer_cache():
+    """Test the semantic answer cache."""
+    print("\nTesting Semantic Answer Cache...")
+    print("-" * 50)
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "answers.npz")
+            cache = SemanticAnswerCache(threshold=0.95, max_entries=2, path=path)
+            cache.store([1.0, 0.0, 0.0], "How do I reset my password?", {'en': "Use 'Forgot Password'."})
+            assert cache.lookup([0.99, 0.05, 0.0]) == {'en': "Use 'Forgot Password'."}
+            assert cache.lookup([0.0, 1.0, 0.0]) is None
+            
+            cache.store([0.99, 0.05, 0.0], "How can I reset my password?", {'es': "Usa 'Olvidé mi contraseña'."})
+            assert len(cache) == 1
+            assert set(cache.lookup([1.0, 0.0, 0.0])) == {'en', 'es'}
+            
+            cache.store([0.0, 1.0, 0.0], "How do I log in?", {'en': "Go to the login page."})
+            cache.store([0.0, 0.0, 1.0], "How do I sign up?", {'en': "Click 'Sign Up'."})
+            assert cache.lookup([1.0, 0.0, 0.0]) is None
+            print(f"Cache metrics: {cache.metrics.snapshot()['counters']}")
+            
+            cache.save()
+            reopened = SemanticAnswerCache(path=path)
+            assert len(reopened) == 2
+            
+            # Saving a cache whose entries all expired removes the stale file
+            expired = SemanticAnswerCache(ttl_seconds=0, path=path)
+            assert len(expired) == 0
+            expired.save()
+            assert os.listdir(tmp) == []
+        
+        return True
+    except Exception as e:
+        print(f"Semantic answer cache failed: {e}")
+        return False
+
+def test_answer_translations():
+    """Test the pre-translated answer sidecars."""
+    print("\nTesting Pre-Translated Answers...")
+    print("-" * 50)
+    
+    class TaggingTranslator:
+        """Offline translator that tags texts with the target language"""
+        def translate_batch_from_english(self, texts, target_language):
+            return [f"[{target_language}] {text}" for text in texts]
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = create_docstore(os.path.join(tmp, DOCSTORE_FILE))
+            db.executemany("INSERT INTO faqs VALUES (?, ?, ?, ?)", [
+                (0, "a", "How do I log in?", "Go to the login page."),
+                (1, "b", "How do I sign in?", "Go to the login page."),
+                (2, "c", "How do I sign up?", "Click 'Sign Up'."),
+            ])
+            db.commit()
+            db.close()
+            
+            stats = translate_answers(tmp, ['es', 'fr'], TaggingTranslator())
+            assert stats['es'] == {'translated': 2, 'kept': 0, 'dropped': 0}
+            assert translate_answers(tmp, ['es'], TaggingTranslator())['es']['translated'] == 0
+            
+            translations = AnswerTranslations.load(tmp)
+            assert translations.languages == ['es', 'fr']
+            assert translations.get("Click 'Sign Up'.", 'fr') == "[fr] Click 'Sign Up'."
+            assert translations.get("Click 'Sign Up'.", 'de') is None
+            assert translations.get("An edited answer.", 'es') is None
+            print(f"Lookup metrics: {translations.metrics.snapshot()['counters']}")
+            translations.close()
+        
+        return True
+    except Exception as e:
+        print(f"Pre-translated answers failed: {e}")
+        return False
+
+def test_streaming_translation():
+    """Test that sentence-by-sentence translation of streamed answers keeps line breaks."""
+    print("\nTesting Streaming Translation...")
+    print("-" * 50)
+    
+    class TaggingTranslator:
+        def translate_from_english(self, text, target_language):
+            return f"[{target_language}] {text}"
+        
+        async def atranslate_from_english(self, text, target_language):
+            return self.translate_from_english(text, target_language)
+    
+    try:
+        chunks = ["Steps:\nOpen", " settings. Then", " save.\n", "\n- Done", " here"]
+        translated = "".join(_translate_sentences(iter(chunks), TaggingTranslator(), 'es'))
+        print(f"Translated: {translated!r}")
+        assert translated == "[es] Steps:\n[es] Open settings. [es] Then save.\n\n[es] - Done here", translated
+        
+        async def collect():
+            async def achunks():
+                for chunk in chunks:
+                    yield chunk
+            return "".join([part async for part in _atranslate_sentences(achunks(), TaggingTranslator(), 'es')])
+        assert asyncio.run(collect()) == translated
+        
+        return True
+    except Exception as e:
+        print(f"Streaming translation failed: {e}")
+        return False
+
+class DictTranslateClient(StubTranslateClient):
+    """Stub client that really translates known texts to English and can fail for some target languages"""
+    
+    def __init__(self, table, fail_targets=()):
+        super().__init__()
+        self.table = table
+        self.fail_targets = set(fail_targets)
+    
+    def _translate(self, value, target_language, source_language):
+        if target_language in self.fail_targets:
+            raise RuntimeError(f"translation to '{target_language}' failed")
+        if target_language == 'en' and value in self.table:
+            lang, english = self.table[value]
+            return {'translatedText': english, 'input': value, 'detectedSourceLanguage': lang}
+        return super()._translate(value, target_language, source_language)
+
+class InMemoryFAQStore:
+    """Exact cosine search over a few FAQs, counting searches (stands in for VectorStoreService)"""
+    
+    multilingual = False
+    answer_translations = None
+    
+    def __init__(self, faqs):
+        self.faqs = faqs
+        self.embeddings = StubEmbeddings()
+        self.vectors = np.array(self.embeddings.embed_documents([faq['question'] for faq in faqs]))
+        self.searches = 0
+    
+    def embed_query(self, query):
+        return self.embeddings.embed_query(query)
+    
+    async def aembed_query(self, query):
+        return self.embed_query(query)
+    
+    def get_relevant_context(self, query, k=5, embedding=None):
+        self.searches += 1
+        scores = self.vectors @ np.asarray(embedding if embedding is not None else self.embed_query(query))
+        return [dict(self.faqs[i], score=float(scores[i])) for i in np.argsort(-scores)[:k]]
+    
+    async def aget_relevant_context(self, query, k=5, embedding=None):
+        return self.get_relevant_context(query, k, embedding)
+
+def test_pipeline():
+    """Test the async pipeline: answer cache before search, direct answers and speculative embedding."""
+    print("\nTesting Async Pipeline...")
+    print("-" * 50)
+    
+    class UnsureDetector:
+        def detect(self, text):
+            return None, 0.0
+    
+    try:
+        pipeline_metrics.reset()
+        faqs = [
+            {'question': "How do I reset my password?", 'answer': "Click 'Forgot Password'."},
+            {'question': "How do I contact support?", 'answer': "Email support@example.com."},
+            {'question': "What are your opening hours?", 'answer': "9am to 5pm."},
+        ]
+        store = InMemoryFAQStore(faqs)
+        # Every input is speculatively embedded, since the detector is never confident
+        translator = TranslationService(detector=UnsureDetector(), client=DictTranslateClient({
+            "¿Cómo restablezco mi contraseña?": ('es', "How do I reset my password?"),
+        }))
+        vertexai = VertexAIService(project_id="stub", llm=create_stub_llm())
+        cache = SemanticAnswerCache(threshold=0.95)
+        
+        answer, error = asyncio.run(aprocess_query("How do I reset my password?", translator, store, vertexai, cache))
+        assert (answer, error) == ("Click 'Forgot Password'.", None)
+        assert store.searches == 1
+        
+        answer, _ = asyncio.run(aprocess_query("How do I reset my password?", translator, store, vertexai, cache))
+        assert answer == "Click 'Forgot Password'." and store.searches == 1
+        answer, _ = asyncio.run(aprocess_query("¿Cómo restablezco mi contraseña?", translator, store, vertexai, cache))
+        print(f"Cached answer translated: {answer}")
+        assert answer == "[es] Click 'Forgot Password'." and store.searches == 1
+        
+        async def stream(query, **kwargs):
+            return [chunk async for chunk in astream_query(query, translator, store, vertexai, **kwargs)]
+        chunks = asyncio.run(stream("How do I contact support?"))
+        assert "".join(chunks) == "Email support@example.com."
+        chunks = asyncio.run(stream("What are your opening hours?", direct_answer_threshold=0.99))
+        assert chunks == ["9am to 5pm."]
+        
+        sync_answer = process_query("¿Cómo restablezco mi contraseña?", translator, store, vertexai, None, 0.99)
+        async_answer = asyncio.run(aprocess_query("¿Cómo restablezco mi contraseña?", translator, store, vertexai, None, 0.99))
+        assert sync_answer == async_answer == ("[es] Click 'Forgot Password'.", None)
+        
+        counters = pipeline_metrics.snapshot()['counters']
+        print(f"Pipeline metrics: {counters}")
+        assert counters['answer_cache_hits'] == 2
+        assert counters['llm_answers'] == 2 and counters['direct_answers'] == 3
+        assert counters['speculative_retrieval_hits'] == 4 and counters['speculative_retrieval_misses'] == 2
+        # Every turn records its own Translation API calls, whatever the answer source
+        translation_calls = pipeline_metrics.snapshot()['timings']['translation_calls']
+        assert translation_calls['count'] == counters['queries'] == 7
+        assert translation_calls['total'] == translator.metrics.get('remote_calls')
+        
+        # An error-like streamed answer is followed by the FAQ fallback, and not cached
+        erroring = VertexAIService(project_id="stub", llm=RunnableLambda(lambda prompt: "An error was encountered."))
+        chunks = list(stream_query("How do I contact support?", translator, store, erroring, cache))
+        assert chunks == ["An error was encountered.", "Email support@example.com."], chunks
+        assert erroring.metrics.get('rejected_streams') == 1
+        assert cache.lookup(store.embed_query("How do I contact support?")) is None
+        
+        return True
+    except Exception as e:
+        print(f"Async pipeline failed: {e}")
+        return False
+
+def test_single_flight():
+    """Test request coalescing of identical in-flight queries."""
+    print("\nTesting Request Coalescing...")
+    print("-" * 50)
+    
+    try:
+        single_flight = SingleFlight()
+        calls = []
+        
+        def slow_answer(query):
+            calls.append(query)
+            time.sleep(0.2)
+            return f"answer to {query}"
+        
+        key = request_key("How do I reset my password?", 'en')
+        assert request_key("  How do I   reset my password? ", 'en') == key
+        assert request_key("How do I RESET my password?", 'en') != key
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: single_flight.call(key, slow_answer, "reset"), range(8)))
+        assert results == ["answer to reset"] * 8 and calls == ["reset"]
+        
+        streams = []
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            for chunks in pool.map(lambda _: list(single_flight.stream(key, lambda: iter(["a", "b"]))), range(4)):
+                streams.append(chunks)
+        assert all(chunks == ["a", "b"] for chunks in streams)
+        
+        counters = single_flight.metrics.snapshot()['counters']
+        print(f"Coalescing metrics: {counters}")
+        assert counters['executed'] + counters['coalesced'] == 12 and counters['coalesced'] >= 7
+        
+        return True
+    except Exception as e:
+        print(f"Request coalescing failed: {e}")
+        return False
+
+def test_transport():
+    """Test the shared transport against a local fake Translation API server."""
+    print("\nTesting Transport...")
+    print("-" * 50)
+    
+    try:
+        from stubs import FakeTranslateServer
+        
+        with FakeTranslateServer() as server:
+            transport = Transport(pool_size=4, authenticate=False, retry=RetryPolicy(base_delay=0.01),
+                                  failure_threshold=3, reset_seconds=60)
+            service = TranslationService(transport=transport, api_endpoint=server.url)
+            assert service.translate_from_english("Hello", 'es') == "[es] Hello"
+            assert service.translate_from_english("Goodbye", 'fr') == "[fr] Goodbye"
+            assert server.connections == 1, "Calls should reuse one keep-alive connection"
+            
+            # Transient failures are retried, then open the breaker so later calls fail fast
+            server.failure_rate = 1.0
+            requests_before = server.requests
+            errors = []
+            for target in ('de', 'it', 'pt'):
+                try:
+                    service.translate_from_english("Thanks", target)
+                except Exception as e:
+                    errors.append(e)
+            assert not isinstance(errors[0], CircuitOpenError)
+            assert len(errors) == 3 and all(isinstance(e, CircuitOpenError) for e in errors[1:])
+            assert server.requests - requests_before == 3 and service.remote_service.breaker.state == 'open'
+            
+            # Deadlines cut slow calls off
+            slow = Transport(authenticate=False, timeouts={'translate': 0.2}, retry=RetryPolicy(max_attempts=1))
+            server.failure_rate, server.latency = 0.0, 1.0
+            start = time.perf_counter()
+            errors = []
+            try:
+                TranslationService(transport=slow, api_endpoint=server.url).translate_from_english("Slow", 'es')
+            except Exception as e:
+                errors.append(e)
+            assert errors and time.perf_counter() - start < 0.9
+            print(f"Transport metrics: {transport.snapshot()}")
+        
+        return True
+    except Exception as e:
+        print(f"Transport failed: {e}")
+        return False
+
+def test_rate_limiter():
+    """Test the client-side rate limiter and its priority queue."""
+    print("\nTesting Rate Limiter...")
+    print("-" * 50)
+    
+    try:
+        limiter = RateLimiter("test", rate=50, burst=1)
+        start = time.perf_counter()
+        for _ in range(6):
+            limiter.acquire()
+        assert time.perf_counter() - start >= 0.09, "Calls should be paced at the rate"
+        
+        # Interactive callers go ahead of batch callers already waiting
+        order = []
+        limiter = RateLimiter("test", rate=20, burst=1)
+        limiter.acquire()
+        
+        def take(priority, name):
+            limiter.acquire(priority)
+            order.append(name)
+        
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(take, BATCH, f"batch-{i}") for i in range(3)]
+            time.sleep(0.01)
+            futures.append(pool.submit(take, INTERACTIVE, "interactive"))
+            for future in futures:
+                future.result()
+        assert order[0] == "interactive", order
+        
+        # Callers that would wait too long are shed without queueing
+        limiter = RateLimiter("test", rate=1, max_wait={INTERACTIVE: 0.1})
+        limiter.acquire()
+        try:
+            limiter.acquire()
+            raise AssertionError("Expected the call to be shed")
+        except RateLimitedError:
+            pass
+        
+        # Quota errors slow the limiter down instead of opening the breaker
+        class QuotaError(Exception):
+            code = 429
+        
+        service = RemoteService("test", retry=RetryPolicy(base_delay=0.01), limiter=RateLimiter("test", rate=100))
+        attempts = []
+        
+        def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise QuotaError("Quota exceeded")
+            return "ok"
+        
+        with request_priority(BATCH):
+            assert service.call(flaky) == "ok"
+        snapshot = service.snapshot()
+        print(f"Rate limiter metrics: {snapshot}")
+        assert snapshot['breaker'] == 'closed' and snapshot['counters']['quota_errors'] == 1
+        assert service.limiter.current_rate < 100
+        
+        return True
+    except Exception as e:
+        print(f"Rate limiter failed: {e}")
+        return False
+
+def test_embedding_cache():
+    """Test the persistent embedding cache."""
+    print("\nTesting Embedding Cache...")
+    print("-" * 50)
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = EmbeddingCache(tmp, "test-model", normalize=True)
+            cache.put_many(["How do I log in?", "How do I sign up?"], [[1.0, 0.0], [0.0, 1.0]])
+            cache.put_many(["How do I log in?"], [[1.0, 0.0]])
+            assert len(cache) == 2
+            
+            reopened = EmbeddingCache(tmp, "test-model", normalize=True)
+            vectors = reopened.get_many(["How do I sign up?", "Unknown text"])
+            assert vectors[0].tolist() == [0.0, 1.0] and vectors[1] is None
+            assert EmbeddingCache(tmp, "test-model", normalize=False).get_many(["How do I log in?"]) == [None]
+            print(f"Cache metrics: {reopened.metrics.snapshot()['counters']}")
+            
+            # Only documents are stored by default; queries reuse them without growing the cache
+            model = StubEmbeddings()
+            cached = CachedEmbeddings(model, EmbeddingCache(tmp, model.model_name, normalize=True))
+            cached.embed_documents(["How do I log in?", "How do I sign up?"])
+            assert len(cached.cache) == 2 and model.calls == 1
+            assert cached.embed_query("How do I log in?") == model._embed("How do I log in?") and model.calls == 1
+            cached.embed_query("A new question?")
+            cached.embed_queries(["Another question?", "How do I sign up?"])
+            assert len(cached.cache) == 2 and model.calls == 3
+            cached.cache_queries = True
+            cached.embed_queries(["Another question?"])
+            assert len(cached.cache) == 3
+        
+        return True
+    except Exception as e:
+        print(f"Embedding cache failed: {e}")
+        return False
+
+def test_bm25_index():
+    """Test the BM25 keyword index."""
+    print("\nTesting BM25 Index...")
+    print("-" * 50)
+    
+    try:
+        bm25 = BM25Index()
+        bm25.add("login", "How do I log in? Go to the login page and enter your password.")
+        bm25.add("declined", "What does error E-4012 mean? Your card was declined.")
+        bm25.add("refund", "How do I get a refund? Contact support within 30 days.")
+        
+        results = bm25.search("I got E4012 at checkout", k=2)
+        print(f"Results: {results}")
+        assert results[0][0] == "declined"
+        assert bm25.search("unrelated words", k=2) == []
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bm25.npz")
+            bm25.save(path)
+            assert BM25Index.load(path).search("refund", k=1)[0][0] == "refund"
+        
+        return True
+    except Exception as e:
+        print(f"BM25 index failed: {e}")
+        return False
+
+def test_context_builder():
+    """Test context deduplication, score cutoff and token budget."""
+    print("\nTesting Context Builder...")
+    print("-" * 50)
+    
+    try:
+        vectors = {
+            "Click 'Forgot Password' on the login page.": [1.0, 0.0],
+            "Use the 'Forgot Password' link on the login page.": [0.99, 0.1],
+            "Contact support within 30 days for a refund.": [0.0, 1.0],
+        }
+        faqs = [
+            {'question': "How do I reset my password?", 'answer': "Click 'Forgot Password' on the login page.", 'score': 0.9},
+            {'question': "I forgot my password", 'answer': "Use the 'Forgot Password' link on the login page.", 'score': 0.8},
+            {'question': "How do I get a refund?", 'answer': "Contact support within 30 days for a refund.", 'score': 0.5},
+            {'question': "How do I sign up?", 'answer': "Click 'Sign Up'.", 'score': 0.1},
+        ]
+        builder = ContextBuilder(max_tokens=1000, min_score=0.3, dedup_threshold=0.92,
+                                 embed=lambda texts: [vectors[text] for text in texts])
+        result = builder.build(faqs)
+        print(f"Context ({result.tokens} tokens):\n{result.text}")
+        assert [faq['question'] for faq in result.faqs] == ["How do I reset my password?", "How do I get a refund?"]
+        assert (result.below_min_score, result.duplicates) == (1, 1)
+        
+        small = ContextBuilder(max_tokens=35, min_score=None, dedup_threshold=None).build(faqs)
+        assert small.tokens <= 35 and small.truncated == 1
+        assert small.faqs[-1]['answer'].endswith("...")
+        assert ContextBuilder().build([]).faqs == []
+        
+        return True
+    except Exception as e:
+        print(f"Context builder failed: {e}")
+        return False
+
+def test_faq_dedup():
+    """Test near-duplicate FAQ detection."""
+    print("\nTesting Near-Duplicate FAQ Detection...")
+    print("-" * 50)
+    
+    try:
+        detector = DuplicateDetector(threshold=0.95, min_answer_overlap=0.8)
+        vectors = [[1.0, 0.0, 0.0], [0.99, 0.1, 0.0], [0.99, 0.0, 0.1], [0.0, 1.0, 0.0]]
+        answers = [
+            "Click 'Forgot Password' on the login page.",
+            "Click 'Forgot Password' on the login page!",
+            "Contact support to unlock your account.",
+            "Refunds take 5 business days.",
+        ]
+        matches = detector.match(vectors, answers)
+        print(f"Matches: {matches}")
+        assert matches == [None, ('batch', 0), None, None]
+        
+        pending = detector.match([[0.0, 0.99, 0.1]], ["Refunds take 5 business days"],
+                                 pending_vectors=[[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]],
+                                 pending_answers=[answers[0], answers[3]])
+        assert pending == [('pending', 1)]
+        
+        return True
+    except Exception as e:
+        print(f"Near-duplicate detection failed: {e}")
+        return False
+
+def test_multi_vector():
+    """Test answer chunking and per-FAQ aggregation of multi-vector hits."""
+    print("\nTesting Multi-Vector Aggregation...")
+    print("-" * 50)
+    
+    try:
+        config = MultiVectorConfig(chunk_words=8)
+        texts = config.answer_texts(" ".join(f"word{i}" for i in range(20)))
+        print(f"Answer texts: {len(texts)}")
+        assert len(texts) == 4 and texts[1].split()[0] == "word0" and texts[-1].split()[-1] == "word19"
+        
+        # Query 0: FAQ 1 matches on two vectors, FAQ 2 on one better vector; query 1 has a missing hit
+        scores = np.array([[0.9, 0.85, 0.92, 0.1], [0.5, 0.4, -np.inf, 0.3]], dtype=np.float32)
+        owners = np.array([[1, 1, 2, 3], [4, 4, -1, 5]])
+        best_scores, ids = aggregate(scores, owners, k=3, aggregation='max')
+        assert ids.tolist() == [[2, 1, 3], [4, 5, -1]]
+        assert best_scores[0].tolist() == [np.float32(0.92), np.float32(0.9), np.float32(0.1)]
+        _, ids = aggregate(scores, owners, k=3, aggregation='sum')
+        assert ids.tolist() == [[1, 2, 3], [4, 5, -1]]
+        
+        return True
+    except Exception as e:
+        print(f"Multi-vector aggregation failed: {e}")
+        return False
+
 def test_vectorstore():
     """Test vector store service."""
     print("\nTesting Vector Store Service...")
@@ -50,6 +662,454 @@ def test_vectorstore():
         print(f"Vector store service failed: {e}")
         return False
 
+def test_incremental_index():
+    """Test incremental index updates after FAQ edits."""
+    print("\nTesting Incremental Index Updates...")
+    print("-" * 50)
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            faqs_file = os.path.join(tmp, "faqs.json")
+            faqs = [
+                {'question': "How do I reset my password?", 'answer': "Click 'Forgot Password'."},
+                {'question': "How do I contact support?", 'answer': "Email support@example.com."},
+                {'question': "What are your opening hours?", 'answer': "9am to 5pm."},
+            ]
+            with open(faqs_file, 'w', encoding='utf-8') as f:
+                json.dump(faqs, f)
+            service = VectorStoreService(faqs_file=faqs_file, index_path=os.path.join(tmp, "index"))
+            service.create_vectorstore()
+            
+            faqs[1]['answer'] = "Use the chat widget."
+            faqs.append({'question': "Do you ship abroad?", 'answer': "Yes, worldwide."})
+            del faqs[2]
+            with open(faqs_file, 'w', encoding='utf-8') as f:
+                json.dump(faqs, f)
+            added, removed = service.update_vectorstore()
+            print(f"Added {added}, removed {removed}")
+            assert (added, removed) == (2, 2)
+            assert service.vectorstore.index.ntotal == 3
+            assert service.get_best_match("How can I reach support?")['answer'] == "Use the chat widget."
+            
+            reopened = VectorStoreService(faqs_file=faqs_file, index_path=service.index_path)
+            reopened.load_vectorstore()
+            assert reopened.get_best_match("Do you ship abroad?")['answer'] == "Yes, worldwide."
+        
+        return True
+    except Exception as e:
+        print(f"Incremental index update failed: {e}")
+        return False
+
+def _load_in_worker(faqs_file, index_path):
+    """Load (or build) an index like a starting server worker; returns embedding calls and a best match."""
+    service = VectorStoreService(faqs_file=faqs_file, index_path=index_path, embeddings=StubEmbeddings())
+    service.load_vectorstore()
+    return service.embeddings.calls, service.get_best_match("How do I reset my password?")['answer']
+
+def test_concurrent_index_load():
+    """Test that processes starting together build a missing index once."""
+    print("\nTesting Concurrent Index Load...")
+    print("-" * 50)
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            faqs_file = os.path.join(tmp, "faqs.json")
+            faqs = [
+                {'question': "How do I reset my password?", 'answer': "Click 'Forgot Password'."},
+                {'question': "How do I contact support?", 'answer': "Email support@example.com."},
+            ]
+            with open(faqs_file, 'w', encoding='utf-8') as f:
+                json.dump(faqs, f)
+            index_path = os.path.join(tmp, "index")
+            workers = 4
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                results = list(pool.map(_load_in_worker, [faqs_file] * workers, [index_path] * workers))
+            
+            builders = sum(1 for calls, _ in results if calls)
+            print(f"Workers that embedded FAQs: {builders} of {workers}")
+            assert builders == 1
+            assert all(answer == "Click 'Forgot Password'." for _, answer in results)
+            leftovers = [name for name in os.listdir(index_path) if '.tmp' in name]
+            assert not leftovers, leftovers
+        
+        return True
+    except Exception as e:
+        print(f"Concurrent index load failed: {e}")
+        return False
+
+def test_server():
+    """Test the HTTP API with stub Google clients."""
+    print("\nTesting HTTP API...")
+    print("-" * 50)
+    
+    stub_env = os.environ.get("STUB_GOOGLE_CLIENTS")
+    os.environ["STUB_GOOGLE_CLIENTS"] = "true"
+    try:
+        from fastapi.testclient import TestClient
+        import server
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            faqs_file = os.path.join(tmp, "faqs.json")
+            with open(faqs_file, 'w', encoding='utf-8') as f:
+                json.dump([
+                    {'question': "How do I reset my password?", 'answer': "Click 'Forgot Password'."},
+                    {'question': "How do I contact support?", 'answer': "Email support@example.com."},
+                ], f)
+            vector_service = VectorStoreService(faqs_file=faqs_file, index_path=os.path.join(tmp, "index"),
+                                                embeddings=StubEmbeddings())
+            vector_service.load_vectorstore()
+            # Pre-populated state stands in for create_services, which would load the real models
+            server._state.update(
+                translation_service=create_translation_service(stub=True),
+                vector_service=vector_service,
+                vertexai_service=VertexAIService(project_id="stub", llm=create_stub_llm()),
+                answer_cache=None,
+                direct_answer_threshold=None,
+                single_flight=SingleFlight(),
+            )
+            
+            with TestClient(server.app) as client:
+                response = client.post("/ask", json={'query': "How do I reset my password?"})
+                print(f"/ask: {response.json()}")
+                assert response.status_code == 200
+                assert response.json() == {'answer': "Click 'Forgot Password'.", 'error': None}
+                assert client.post("/ask", json={'query': "   "}).status_code == 400
+                
+                response = client.post("/ask/stream", json={'query': "¿Cómo me pongo en contacto con el soporte técnico?"})
+                print(f"/ask/stream: {response.text!r}")
+                assert response.status_code == 200
+                # The stub translator tags instead of translating, so only the target language is checked
+                assert response.text.startswith("[es] ")
+                
+                queries = ["How do I contact support?", "", "How do I reset my password?"]
+                results = client.post("/batch", json={'queries': queries}).json()['results']
+                print(f"/batch: {results}")
+                assert [result['answer'] for result in results] == [
+                    "Email support@example.com.", None, "Click 'Forgot Password'."
+                ]
+                assert results[1]['error'] and results[0]['error'] is None
+                too_many = ["How do I contact support?"] * (server.BATCH_MAX_QUERIES + 1)
+                assert client.post("/batch", json={'queries': too_many}).status_code == 400
+                
+                health = client.get("/health").json()
+                print(f"/health: status={health['status']}, stub={health['stub']}, pipeline={health['pipeline']}")
+                assert health['status'] == "ok" and health['stub'] is True
+                assert health['pipeline']['counters']['queries'] >= 4
+        
+        return True
+    except Exception as e:
+        print(f"HTTP API failed: {e}")
+        return False
+    finally:
+        if stub_env is None:
+            os.environ.pop("STUB_GOOGLE_CLIENTS", None)
+        else:
+            os.environ["STUB_GOOGLE_CLIENTS"] = stub_env
+        server_module = sys.modules.get('server')
+        if server_module is not None:
+            server_module._state.clear()
+
+SAMPLE_FAQS = [
+    {'question': "How do I reset my password?", 'answer': "Click 'Forgot Password'."},
+    {'question': "How do I contact support?", 'answer': "Email support@example.com."},
+    {'question': "What are your opening hours?", 'answer': "9am to 5pm."},
+    {'question': "Do you ship abroad?", 'answer': "Yes, worldwide."},
+]
+
+def _stub_vectorstore(tmp, faqs=SAMPLE_FAQS, **kwargs):
+    """Index FAQs with StubEmbeddings in a temporary directory and load them."""
+    faqs_file = os.path.join(tmp, "faqs.json")
+    with open(faqs_file, 'w', encoding='utf-8') as f:
+        json.dump(faqs, f)
+    service = VectorStoreService(faqs_file=faqs_file, index_path=os.path.join(tmp, "index"),
+                                 embeddings=StubEmbeddings(), **kwargs)
+    service.load_vectorstore()
+    return service
+
+def test_direct_answers():
+    """Test cosine scores and the direct FAQ answer path, which skips the LLM."""
+    print("\nTesting Direct FAQ Answers...")
+    print("-" * 50)
+    
+    llm_calls = []
+    
+    def counting_llm(prompt):
+        llm_calls.append(prompt)
+        return "Generated answer."
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            service = _stub_vectorstore(tmp)
+            for query in ("How do I reset my password?", "password reset", "Where is the moon?"):
+                scores = [match['score'] for match in service.get_relevant_context(query, k=4)]
+                print(f"Scores for '{query}': {[round(score, 3) for score in scores]}")
+                assert all(0.0 <= score <= 1.0 + 1e-5 for score in scores), scores
+                assert scores == sorted(scores, reverse=True)
+            assert service.get_relevant_context("How do I reset my password?")[0]['score'] > 0.999
+            
+            translator = TranslationService(client=StubTranslateClient())
+            vertexai = VertexAIService(project_id="stub", llm=RunnableLambda(counting_llm))
+            pipeline_metrics.reset()
+            answer, error = process_query("How do I reset my password?", translator, service, vertexai,
+                                          direct_answer_threshold=0.95)
+            assert (answer, error) == ("Click 'Forgot Password'.", None) and not llm_calls
+            answer, error = process_query("password reset", translator, service, vertexai,
+                                          direct_answer_threshold=0.95)
+            assert (answer, error) == ("Generated answer.", None) and len(llm_calls) == 1
+            counters = pipeline_metrics.snapshot()['counters']
+            print(f"Pipeline metrics: {counters}")
+            assert counters['direct_answers'] == 1 and counters['llm_answers'] == 1
+        
+        # Hybrid fusion ranks another FAQ first; the exact match is still answered directly
+        with tempfile.TemporaryDirectory() as tmp:
+            service = _stub_vectorstore(tmp, hybrid=True)
+            exact = "How do I reset my password?"
+            others = [doc_id for doc_id in service.vectorstore.index_to_docstore_id.values()
+                      if service.vectorstore.docstore.search(doc_id).page_content != exact]
+            service.bm25.search = lambda text, k: [(doc_id, 1.0) for doc_id in others[:k]]
+            matches = service.get_relevant_context(exact, k=4)
+            assert matches[0]['question'] != exact and max(m['score'] for m in matches) > 0.999
+            answer, error = process_query(exact, translator, service, vertexai, direct_answer_threshold=0.95)
+            assert (answer, error) == ("Click 'Forgot Password'.", None) and len(llm_calls) == 1
+        
+        return True
+    except Exception as e:
+        print(f"Direct FAQ answers failed: {e}")
+        return False
+
+def test_batch_search():
+    """Test that batched searches match per-query searches, also with k above the index size."""
+    print("\nTesting Batched Search...")
+    print("-" * 50)
+    
+    queries = ["How do I reset my password?", "contact support", "opening hours", "Where is the moon?"]
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            service = _stub_vectorstore(tmp)
+            ntotal = service.vectorstore.index.ntotal
+            for k in (1, 3, ntotal + 2):
+                single = [service.search_with_scores(query, k=k) for query in queries]
+                batched = service.search_by_vectors(service.embed_queries(queries), k=k, texts=queries)
+                assert [[m['question'] for m in row] for row in batched] == [[m['question'] for m in row] for row in single]
+                for batch_row, single_row in zip(batched, single):
+                    assert np.allclose([m['score'] for m in batch_row], [m['score'] for m in single_row], atol=1e-6)
+                
+                results = service.search_batch(queries, k=k)
+                assert results.ids.shape == results.scores.shape == (len(queries), k)
+                for row_ids, row_scores, single_row in zip(results.ids, results.scores, single):
+                    hits = row_ids >= 0
+                    assert [service.get_faq(position)['question'] for position in row_ids[hits]] == \
+                        [m['question'] for m in single_row]
+                    assert np.allclose(row_scores[hits], [m['score'] for m in single_row], atol=1e-6)
+                    assert hits.sum() == min(k, ntotal) and np.all(np.isneginf(row_scores[~hits]))
+            print(f"Batched results match per-query results for k up to {ntotal + 2} ({ntotal} FAQs)")
+        
+        return True
+    except Exception as e:
+        print(f"Batched search failed: {e}")
+        return False
+
+def test_index_factory():
+    """Test building each FAISS index type, persisting its configuration and setting query-time knobs."""
+    print("\nTesting Index Factory...")
+    print("-" * 50)
+    
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((1000, 64)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    configs = [
+        IndexConfig('flat'),
+        IndexConfig('ivf_flat', nlist=16, nprobe=16),
+        IndexConfig('hnsw', hnsw_m=16, ef_search=128),
+        IndexConfig('ivf_pq', nlist=16, nprobe=16, pq_m=16, pq_nbits=4),
+    ]
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for config in configs:
+                index = build_index(config, vectors)
+                assert index.ntotal == len(vectors)
+                _, ids = index.search(vectors[:100], 1)
+                recall = float(np.mean(ids[:, 0] == np.arange(100)))
+                print(f"{config.index_type}: self-recall@1 {recall:.2f}")
+                assert recall >= (1.0 if config.index_type == 'flat' else 0.9)
+                
+                config.save(tmp)
+                assert IndexConfig.load(tmp).to_dict() == config.to_dict()
+                
+                config.nprobe, config.ef_search = 4, 32
+                apply_search_params(index, config)
+                if config.index_type in ('ivf_flat', 'ivf_pq'):
+                    assert faiss.extract_index_ivf(index).nprobe == 4
+                elif config.index_type == 'hnsw':
+                    assert faiss.downcast_index(index).hnsw.efSearch == 32
+            
+            try:
+                IndexConfig('ivf_pq', pq_m=48).save(tmp)
+                build_index(IndexConfig.load(tmp), vectors)
+                raise AssertionError("pq_m not dividing the dimension was accepted")
+            except ValueError:
+                pass
+        
+        for config in (IndexConfig('ivf_flat', nprobe=1), IndexConfig('hnsw', ef_search=16)):
+            with tempfile.TemporaryDirectory() as tmp:
+                service = _stub_vectorstore(tmp, index_config=config)
+                reopened = VectorStoreService(faqs_file=service.faqs_file, index_path=service.index_path,
+                                              embeddings=StubEmbeddings())
+                reopened.load_vectorstore()
+                assert reopened.index_config.index_type == config.index_type
+                reopened.set_search_params(nprobe=3, ef_search=48)
+                index = reopened.vectorstore.index
+                if config.index_type == 'ivf_flat':
+                    assert faiss.extract_index_ivf(index).nprobe == 3
+                else:
+                    assert faiss.downcast_index(index).hnsw.efSearch == 48
+                assert reopened.get_best_match("Do you ship abroad?")['answer'] == "Yes, worldwide."
+        
+        return True
+    except Exception as e:
+        print(f"Index factory failed: {e}")
+        return False
+
+def test_index_resume():
+    """Test that an interrupted index build resumes from its checkpoint and matches a clean build."""
+    print("\nTesting Index Build Resume...")
+    print("-" * 50)
+    
+    class InterruptedEmbeddings(StubEmbeddings):
+        def __init__(self, fail_after):
+            super().__init__()
+            self.fail_after = fail_after
+        
+        def embed_documents(self, texts):
+            if self.calls >= self.fail_after:
+                raise RuntimeError("interrupted")
+            return super().embed_documents(texts)
+    
+    def build(index_path, embeddings):
+        builder = IndexBuilder(embeddings, batch_size=3, workers=1, checkpoint_every=1)
+        return builder.build(faqs_file, index_path, IndexConfig(), StubEmbeddings.model_name)
+    
+    def interrupt(index_path):
+        try:
+            build(index_path, InterruptedEmbeddings(fail_after=2))
+            raise AssertionError("build was not interrupted")
+        except RuntimeError:
+            pass
+        assert os.path.exists(index_path + ".partial")
+        assert not os.path.exists(os.path.join(index_path, DOCSTORE_FILE))
+    
+    def contents(index_path):
+        index = read_index(index_path)
+        db = sqlite3.connect(os.path.join(index_path, DOCSTORE_FILE))
+        rows = db.execute("SELECT position, id FROM faqs ORDER BY position").fetchall()
+        db.close()
+        return index.reconstruct_n(0, index.ntotal), rows
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            faqs_file = os.path.join(tmp, "faqs.json")
+            with open(faqs_file, 'w', encoding='utf-8') as f:
+                json.dump([{'question': f"Question number {i}?", 'answer': f"Answer {i}."} for i in range(10)], f)
+            
+            clean = os.path.join(tmp, "clean")
+            build(clean, StubEmbeddings())
+            
+            resumed = os.path.join(tmp, "resumed")
+            interrupt(resumed)
+            stats = build(resumed, StubEmbeddings())
+            print(f"Resumed after {stats['resumed_from']} FAQs, embedded {stats['embedded']}")
+            assert stats['resumed_from'] == 6 and stats['embedded'] == 4
+            assert not os.path.exists(resumed + ".partial")
+            clean_vectors, clean_rows = contents(clean)
+            resumed_vectors, resumed_rows = contents(resumed)
+            assert resumed_rows == clean_rows and np.array_equal(resumed_vectors, clean_vectors)
+            
+            # A resume needs the FAQ file the checkpoint was taken from (same mtime and size)
+            restarted = os.path.join(tmp, "restarted")
+            interrupt(restarted)
+            stat = os.stat(faqs_file)
+            os.utime(faqs_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            stats = build(restarted, StubEmbeddings())
+            assert stats['resumed_from'] == 0 and stats['embedded'] == 10
+            assert contents(restarted)[1] == clean_rows
+        
+        return True
+    except Exception as e:
+        print(f"Index build resume failed: {e}")
+        return False
+
+def test_batch():
+    """Test the batch job: batched translation, embedding and search, result order and error rows."""
+    print("\nTesting Batch Answering...")
+    print("-" * 50)
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            queries_file = os.path.join(tmp, "queries.jsonl")
+            with open(queries_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'id': "q1", 'query': "How do I reset my password?"}) + "\n")
+                f.write(json.dumps("¿Cómo me pongo en contacto con el soporte?", ensure_ascii=False) + "\n")
+                f.write(json.dumps({'id': "q3", 'query': "Quels sont vos horaires d'ouverture ?"}) + "\n")
+            
+            service = _stub_vectorstore(tmp)
+            searches = []
+            search_by_vectors = service.search_by_vectors
+            service.search_by_vectors = lambda embeddings, **kwargs: searches.append(len(embeddings)) or \
+                search_by_vectors(embeddings, **kwargs)
+            translator = TranslationService(client=DictTranslateClient({
+                "¿Cómo me pongo en contacto con el soporte?": ('es', "How do I contact support?"),
+                "Quels sont vos horaires d'ouverture ?": ('fr', "What are your opening hours?"),
+            }, fail_targets={'fr'}))
+            vertexai = VertexAIService(project_id="stub", llm=create_stub_llm())
+            embedding_calls = service.embeddings.calls
+            
+            output = io.StringIO()
+            summary = answer_batch(read_queries(queries_file), output, translator, service, vertexai, concurrency=1)
+            records = [json.loads(line) for line in output.getvalue().splitlines()]
+            for record in records:
+                print(f"  {record}")
+            
+            # One worker completes the LLM calls in input order
+            assert [record['id'] for record in records] == ["q1", 2, "q3"]
+            assert [record['language'] for record in records] == ['en', 'es', 'fr']
+            assert records[0]['answer'] == "Click 'Forgot Password'." and records[0]['source'] == 'llm'
+            assert records[1]['answer'] == "[es] Email support@example.com." and records[1]['error'] is None
+            assert records[2]['answer'] is None and "'fr'" in records[2]['error']
+            assert summary['total'] == 3 and summary['errors'] == 1
+            
+            # One list translate call for both non-English queries, one embedding call, one FAISS search
+            counters = translator.metrics.snapshot()['counters']
+            print(f"Translation metrics: {counters}, embedding calls: {service.embeddings.calls - embedding_calls}")
+            assert counters['remote_calls.translate'] == 3
+            assert service.embeddings.calls - embedding_calls == 1 and searches == [3]
+            
+            # Invalid lines and failed chunks become error records; the job carries on
+            with open(queries_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'id': "q4", 'question': "How do I contact support?"}) + "\n")
+                f.write("{not json\n")
+            failures = iter([RuntimeError("FAISS unavailable")])
+            
+            def flaky_search(embeddings, **kwargs):
+                for error in failures:
+                    raise error
+                return search_by_vectors(embeddings, **kwargs)
+            service.search_by_vectors = flaky_search
+            output = io.StringIO()
+            summary = answer_batch(read_queries(queries_file), output, translator, service, vertexai,
+                                   concurrency=1, chunk_size=1)
+            records = {record['id']: record for record in map(json.loads, output.getvalue().splitlines())}
+            print(f"  With failures: {summary}")
+            assert set(records) == {"q1", 2, "q3", "q4", 5}
+            assert "FAISS unavailable" in records["q1"]['error']
+            assert records[2]['answer'] == "[es] Email support@example.com."
+            assert "'query'" in records["q4"]['error'] and "Invalid JSON" in records[5]['error']
+            assert summary['total'] == 5 and summary['errors'] == 4
+        
+        return True
+    except Exception as e:
+        print(f"Batch answering failed: {e}")
+        return False
+
 def test_vertexai():
     """Test Vertex AI service."""
     print("\nTesting Vertex AI Service...")
@@ -71,6 +1131,17 @@ def test_vertexai():
         print(f"Question: '{question}'")
         print(f"  Answer: '{answer}'")
         
+        streamed = "".join(service.stream_answer(question, context))
+        print(f"  Streamed: '{streamed}'")
+        print(f"  Timings: {service.metrics.snapshot()['timings']}")
+        assert streamed
+        
+        question_es = "Olvidé mi contraseña, ¿qué hago?"
+        answer_es = service.generate_answer(question_es, context, language='es')
+        print(f"Question: '{question_es}'")
+        print(f"  Answer (es): '{answer_es}'")
+        assert answer_es
+        
         return True
     except Exception as e:
         print(f"Vertex AI service failed: {e}")
@@ -102,7 +1173,29 @@ def main():
     
     results = []
     results.append(("Translation", test_translation()))
+    results.append(("Language Detector", test_language_detector()))
+    results.append(("Translation Cache", test_translation_cache()))
+    results.append(("Answer Cache", test_answer_cache()))
+    results.append(("Pre-Translated Answers", test_answer_translations()))
+    results.append(("Streaming Translation", test_streaming_translation()))
+    results.append(("Async Pipeline", test_pipeline()))
+    results.append(("Request Coalescing", test_single_flight()))
+    results.append(("Transport", test_transport()))
+    results.append(("Rate Limiter", test_rate_limiter()))
+    results.append(("Embedding Cache", test_embedding_cache()))
+    results.append(("BM25 Index", test_bm25_index()))
+    results.append(("Context Builder", test_context_builder()))
+    results.append(("Near-Duplicate FAQs", test_faq_dedup()))
+    results.append(("Multi-Vector", test_multi_vector()))
     results.append(("Vector Store", test_vectorstore()))
+    results.append(("Incremental Index", test_incremental_index()))
+    results.append(("Concurrent Index Load", test_concurrent_index_load()))
+    results.append(("Direct FAQ Answers", test_direct_answers()))
+    results.append(("Batched Search", test_batch_search()))
+    results.append(("Index Factory", test_index_factory()))
+    results.append(("Index Build Resume", test_index_resume()))
+    results.append(("Batch Answering", test_batch()))
+    results.append(("HTTP API", test_server()))
     results.append(("Vertex AI", test_vertexai()))
     
     print("\n" + "=" * 50)
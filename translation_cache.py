@@ -0,0 +1,158 @@
+"""
+Two-tier translation cache: in-process LRU plus optional SQLite store
+"""
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Tuple
+from metrics import Metrics
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for use as a cache key (Unicode NFC, whitespace collapsed)
+
+    Case is kept: it can change a translation ("US" vs. "us", names, acronyms).
+    """
+    text = unicodedata.normalize('NFC', text)
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+class TranslationCache:
+    """Caches translations keyed by (normalized text, source language, target language)"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 7 * 24 * 3600,
+                 db_path: Optional[str] = None, max_disk_entries: int = 200000):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of entries kept in memory (LRU eviction)
+            ttl_seconds: Time after which entries expire, in both tiers
+            db_path: Path to a SQLite file for the persistent tier (None: memory only)
+            max_disk_entries: Maximum number of rows kept in the SQLite tier
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self.metrics = Metrics()
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[str, str, float]]" = OrderedDict()
+        self._db = None
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                " text TEXT NOT NULL, source TEXT NOT NULL, target TEXT NOT NULL,"
+                " translated TEXT NOT NULL, detected TEXT NOT NULL, created REAL NOT NULL,"
+                " PRIMARY KEY (text, source, target))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS translations_created ON translations (created)")
+            self._prune_disk()
+
+    def _expired(self, created: float) -> bool:
+        """Check whether an entry created at the given time has outlived the TTL."""
+        return time.time() - created > self.ttl_seconds
+
+    def get(self, text: str, source: str, target: str) -> Optional[Tuple[str, str]]:
+        """
+        Look up a cached translation
+
+        Args:
+            text: Source text
+            source: Source language code, or 'auto' if it was detected
+            target: Target language code
+
+        Returns:
+            Tuple of (translated_text, detected_source_language), or None on a miss
+        """
+        key = (normalize_text(text), source, target)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[2]):
+                    self._entries.move_to_end(key)
+                    self.metrics.incr('hits')
+                    return entry[0], entry[1]
+                del self._entries[key]
+                self.metrics.incr('expired')
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT translated, detected, created FROM translations"
+                    " WHERE text = ? AND source = ? AND target = ?", key
+                ).fetchone()
+                if row is not None and not self._expired(row[2]):
+                    self._store_memory(key, row[0], row[1], row[2])
+                    self.metrics.incr('hits')
+                    self.metrics.incr('disk_hits')
+                    return row[0], row[1]
+
+            self.metrics.incr('misses')
+            return None
+
+    def put(self, text: str, source: str, target: str, translated: str, detected: str):
+        """
+        Store a translation
+
+        Args:
+            text: Source text
+            source: Source language code, or 'auto' if it was detected
+            target: Target language code
+            translated: Translated text
+            detected: Detected (or given) source language
+        """
+        key = (normalize_text(text), source, target)
+        created = time.time()
+
+        with self._lock:
+            self._store_memory(key, translated, detected, created)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?)",
+                    key + (translated, detected, created)
+                )
+                self._db.commit()
+                self.metrics.incr('disk_writes')
+                if self.metrics.get('disk_writes') % 1000 == 0:
+                    self._prune_disk()
+
+    def _store_memory(self, key: Tuple[str, str, str], translated: str, detected: str, created: float):
+        """Insert into the LRU tier, evicting the least recently used entries. Caller holds the lock."""
+        self._entries[key] = (translated, detected, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.metrics.incr('evictions')
+
+    def _prune_disk(self):
+        """Drop expired rows and the oldest rows beyond max_disk_entries."""
+        self._db.execute("DELETE FROM translations WHERE created < ?", (time.time() - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM translations WHERE rowid IN ("
+            " SELECT rowid FROM translations ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+        self._db.commit()
+
+    def clear(self):
+        """Remove all entries from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM translations")
+                self._db.commit()
+
+    def __len__(self) -> int:
+        """Number of entries in the in-memory tier."""
+        return len(self._entries)
@@ -1,17 +1,116 @@
 """
 Translation module using Google Cloud Translation API
 """
+import contextvars
 import os
-from typing import Tuple
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
 from google.cloud import translate_v2 as translate
+from async_utils import run_blocking
+from language_detector import LanguageDetector, LocalLanguageDetector
+from metrics import Metrics
+from translation_cache import TranslationCache
+from transport import Transport
+
+
+# Maximum number of text segments sent in one batched translate request
+TRANSLATE_BATCH_SIZE = 100
+
+
+class RemoteCallCounter:
+    """Number of Translation API calls made within a count_remote_calls() block"""
+
+    def __init__(self):
+        self.count = 0
+
+
+_call_counter: contextvars.ContextVar[Optional[RemoteCallCounter]] = contextvars.ContextVar(
+    "translation_call_counter", default=None)
+
+
+@contextmanager
+def count_remote_calls() -> Iterator[RemoteCallCounter]:
+    """Count the Translation API calls made in this context (and in threads started with a copy of it)."""
+    counter = RemoteCallCounter()
+    token = _call_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        try:
+            _call_counter.reset(token)
+        except ValueError:
+            # A generator holding the block was closed from another context
+            # (e.g. when garbage collected); the variable is left to that context.
+            pass
 
 
 class TranslationService:
     """Handles language detection and translation using GCP Translation API"""
     
-    def __init__(self):
-        """Initialize the translation client."""
-        self.client = translate.Client()
+    def __init__(self, detector: Optional[LanguageDetector] = None, min_confidence: float = 0.8,
+                 cache: Optional[TranslationCache] = None, client=None, transport: Optional[Transport] = None,
+                 api_endpoint: Optional[str] = None):
+        """
+        Initialize the translation client
+        
+        Args:
+            detector: Local language detector tried before the remote API
+                      (default: LocalLanguageDetector)
+            min_confidence: Minimum local confidence needed to skip remote detection
+            cache: Translation cache (default: in-memory TranslationCache)
+            client: Translation client to use instead of translate.Client()
+                    (e.g. a stub for offline testing)
+            transport: Shared transport: the client uses its pooled session,
+                       and calls get its deadline, retries and circuit breaker
+                       (default: the client library's own connection handling)
+            api_endpoint: Translation API base URL (e.g. a local fake server)
+        """
+        if client is None:
+            client_kwargs = {}
+            if transport is not None:
+                client_kwargs['_http'] = transport.session()
+            if api_endpoint:
+                client_kwargs['client_options'] = {'api_endpoint': api_endpoint}
+            client = translate.Client(**client_kwargs)
+        self.client = client
+        self.remote_service = transport.service('translate') if transport is not None else None
+        self.detector = detector or LocalLanguageDetector()
+        self.min_confidence = min_confidence
+        self.cache = cache if cache is not None else TranslationCache()
+        self.metrics = Metrics()
+    
+    def _remote(self, method: str, *args, **kwargs):
+        """Call a Translation API client method, counting and timing the round trip."""
+        start = time.perf_counter()
+        try:
+            if self.remote_service is not None:
+                return self.remote_service.call(getattr(self.client, method), *args, **kwargs)
+            return getattr(self.client, method)(*args, **kwargs)
+        finally:
+            self.metrics.incr('remote_calls')
+            self.metrics.incr(f'remote_calls.{method}')
+            counter = _call_counter.get()
+            if counter is not None:
+                counter.count += 1
+            self.metrics.observe('remote_call_seconds', time.perf_counter() - start)
+    
+    def detect_locally(self, text: str) -> Optional[str]:
+        """
+        Detect the language with the local detector only
+        
+        Args:
+            text: Input text
+            
+        Returns:
+            Language code, or None if the local detector is not confident enough
+        """
+        lang, confidence = self.detector.detect(text)
+        if lang is not None and confidence >= self.min_confidence:
+            self.metrics.incr('local_detections')
+            return lang
+        self.metrics.incr('local_detection_fallbacks')
+        return None
     
     def detect_language(self, text: str) -> str:
         """
@@ -23,9 +122,33 @@ class TranslationService:
         Returns:
             Language code (e.g., 'en', 'es', 'fr')
         """
-        result = self.client.detect_language(text)
+        local_lang = self.detect_locally(text)
+        if local_lang is not None:
+            return local_lang
+        
+        result = self._remote('detect_language', text)
         return result['language']
     
+    def detect_batch(self, texts: List[str]) -> List[str]:
+        """
+        Detect the languages of many texts with at most one batched request per TRANSLATE_BATCH_SIZE texts
+        
+        Args:
+            texts: Input texts
+            
+        Returns:
+            Language codes, in input order; texts the local detector is
+            confident about need no remote detection
+        """
+        results: List[Optional[str]] = [self.detect_locally(text) for text in texts]
+        pending = [i for i, lang in enumerate(results) if lang is None]
+        for start in range(0, len(pending), TRANSLATE_BATCH_SIZE):
+            batch = pending[start:start + TRANSLATE_BATCH_SIZE]
+            response = self._remote('detect_language', [texts[i] for i in batch])
+            for i, result in zip(batch, response):
+                results[i] = result['language']
+        return results
+    
     def translate_to_english(self, text: str) -> str:
         """
         Translate text to English
@@ -36,11 +159,8 @@ class TranslationService:
         Returns:
             Translated English text
         """
-        if self.detect_language(text) == 'en':
-            return text
-        
-        result = self.client.translate(text, target_language='en')
-        return result['translatedText']
+        _, translated = self.translate_with_detection(text)
+        return translated
     
     def translate_from_english(self, text: str, target_language: str) -> str:
         """
@@ -56,20 +176,132 @@ class TranslationService:
         if target_language == 'en':
             return text
         
-        result = self.client.translate(text, target_language=target_language)
+        cached = self.cache.get(text, 'en', target_language)
+        if cached is not None:
+            return cached[0]
+        
+        result = self._remote('translate', text, target_language=target_language, source_language='en')
+        self.cache.put(text, 'en', target_language, result['translatedText'], 'en')
         return result['translatedText']
     
+    def translate_batch_from_english(self, texts: List[str], target_language: str) -> List[str]:
+        """
+        Translate many English texts to one language with batched requests
+        
+        Cached texts cost nothing; the rest are sent in list requests of up
+        to TRANSLATE_BATCH_SIZE texts each.
+        
+        Args:
+            texts: English texts
+            target_language: Target language code
+            
+        Returns:
+            Translated texts, in input order
+        """
+        if target_language == 'en':
+            return list(texts)
+        
+        results: List[Optional[str]] = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            cached = self.cache.get(text, 'en', target_language)
+            if cached is not None:
+                results[i] = cached[0]
+            else:
+                pending.append(i)
+        
+        for start in range(0, len(pending), TRANSLATE_BATCH_SIZE):
+            batch = pending[start:start + TRANSLATE_BATCH_SIZE]
+            response = self._remote('translate', [texts[i] for i in batch],
+                                    target_language=target_language, source_language='en')
+            for i, result in zip(batch, response):
+                self.cache.put(texts[i], 'en', target_language, result['translatedText'], 'en')
+                results[i] = result['translatedText']
+        
+        return results
+    
     def translate_with_detection(self, text: str) -> Tuple[str, str]:
         """
         Detect language and translate to English in one call
         
+        Languages the local detector is confident about need no remote
+        detection: English costs no calls at all, anything else a single
+        translate call. Otherwise one translate call is made and its
+        detectedSourceLanguage doubles as the language detection.
+        Repeated inputs are served from the translation cache.
+        
         Args:
             text: Input text
             
         Returns:
             Tuple of (detected_language, translated_text)
         """
-        detected_lang = self.detect_language(text)
-        translated = self.translate_to_english(text)
+        local_lang = self.detect_locally(text)
+        if local_lang == 'en':
+            return 'en', text
+        
+        cached = self.cache.get(text, 'auto', 'en')
+        if cached is not None:
+            translated, detected_lang = cached
+            return detected_lang, translated
+        
+        if local_lang is not None:
+            result = self._remote('translate', text, target_language='en', source_language=local_lang)
+            detected_lang, translated = local_lang, result['translatedText']
+        else:
+            result = self._remote('translate', text, target_language='en')
+            detected_lang = result.get('detectedSourceLanguage', 'en')
+            translated = text if detected_lang == 'en' else result['translatedText']
+        
+        self.cache.put(text, 'auto', 'en', translated, detected_lang)
         return detected_lang, translated
-
+    
+    def translate_batch_with_detection(self, texts: List[str]) -> List[Tuple[str, str]]:
+        """
+        Detect languages and translate many texts to English with batched requests
+        
+        English and cached inputs cost nothing; the rest are sent in list
+        requests of up to TRANSLATE_BATCH_SIZE texts each.
+        
+        Args:
+            texts: Input texts
+            
+        Returns:
+            List of (detected_language, translated_text), in input order
+        """
+        results: List[Optional[Tuple[str, str]]] = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            if self.detect_locally(text) == 'en':
+                results[i] = ('en', text)
+                continue
+            cached = self.cache.get(text, 'auto', 'en')
+            if cached is not None:
+                results[i] = (cached[1], cached[0])
+                continue
+            pending.append(i)
+        
+        for start in range(0, len(pending), TRANSLATE_BATCH_SIZE):
+            batch = pending[start:start + TRANSLATE_BATCH_SIZE]
+            response = self._remote('translate', [texts[i] for i in batch], target_language='en')
+            for i, result in zip(batch, response):
+                detected_lang = result.get('detectedSourceLanguage', 'en')
+                translated = texts[i] if detected_lang == 'en' else result['translatedText']
+                self.cache.put(texts[i], 'auto', 'en', translated, detected_lang)
+                results[i] = (detected_lang, translated)
+        
+        return results
+    
+    async def adetect_language(self, text: str) -> str:
+        """Async variant of detect_language; remote calls run on the shared thread pool."""
+        return await run_blocking(self.detect_language, text)
+    
+    async def atranslate_from_english(self, text: str, target_language: str) -> str:
+        """Async variant of translate_from_english; remote calls run on the shared thread pool."""
+        if target_language == 'en':
+            return text
+        return await run_blocking(self.translate_from_english, text, target_language)
+    
+    async def atranslate_with_detection(self, text: str) -> Tuple[str, str]:
+        """Async variant of translate_with_detection; remote calls run on the shared thread pool."""
+        return await run_blocking(self.translate_with_detection, text)
@@ -0,0 +1,531 @@
+"""
+Shared transport for the Google API clients
+Pooled keep-alive HTTP sessions, per-call deadlines, retries with jittered
+exponential backoff, a circuit breaker and an optional rate limiter per
+remote service, so a slow, failing or throttling backend degrades to the
+fallback paths instead of piling up requests.
+"""
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import Metrics
+from rate_limiter import BATCH, INTERACTIVE, RateLimitedError, RateLimiter
+
+
+# HTTP statuses worth retrying: timeouts, throttling and server-side errors
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Absolute time.monotonic() deadline of the remote call running in this context
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("transport_deadline", default=None)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a remote service whose circuit breaker is open"""
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left until the deadline of the current remote call, or None outside of one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """HTTP status of a failed call, or None if it did not get a response."""
+    # google.api_core exceptions carry the HTTP status as .code, requests errors on .response
+    status = getattr(error, 'code', None)
+    if not isinstance(status, int):
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Check whether an error is transient: connection problems, timeouts, throttling or 5xx responses."""
+    if isinstance(error, (CircuitOpenError, RateLimitedError)):
+        return False
+    if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError, requests.ConnectionError, requests.Timeout)):
+        return True
+    return status_code(error) in RETRYABLE_STATUS
+
+
+class DeadlineHTTPAdapter(HTTPAdapter):
+    """HTTP adapter that caps each request's timeout at the remaining deadline of the current call"""
+
+    def send(self, request, timeout=None, **kwargs):
+        remaining = remaining_time()
+        if remaining is not None:
+            if remaining <= 0:
+                raise requests.Timeout("Deadline exceeded before the request was sent")
+            if timeout is None:
+                timeout = remaining
+            elif isinstance(timeout, tuple):
+                timeout = tuple(remaining if part is None else min(part, remaining) for part in timeout)
+            else:
+                timeout = min(timeout, remaining)
+        return super().send(request, timeout=timeout, **kwargs)
+
+
+def create_session(pool_size: int = 32, authenticate: bool = True) -> requests.Session:
+    """
+    Create a keep-alive HTTP session for the Google REST clients
+
+    Args:
+        pool_size: Connections kept open per host, at least the number of
+                   concurrent calls (beyond it, requests wait for a connection
+                   instead of opening and closing extra ones)
+        authenticate: Attach Application Default Credentials (False: plain
+                      session, e.g. for a local fake server)
+
+    Returns:
+        Session whose requests never outlive the current call's deadline
+    """
+    if authenticate:
+        import google.auth
+        from google.auth.transport.requests import AuthorizedSession
+        credentials, _ = google.auth.default(scopes=["https://www.googleapis.com/auth/cloud-platform"])
+        session = AuthorizedSession(credentials)
+    else:
+        session = requests.Session()
+    adapter = DeadlineHTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.25, max_delay: float = 4.0):
+        """
+        Initialize the policy
+
+        Args:
+            max_attempts: Attempts per call, including the first
+            base_delay: Upper bound of the first backoff, in seconds
+            max_delay: Cap of the backoff upper bound, in seconds
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """Random delay before retry number attempt + 1 (full jitter spreads out synchronized retries)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Stops calls to a failing service for a while, then lets a single probe through"""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        """
+        Initialize a closed breaker
+
+        Args:
+            failure_threshold: Consecutive transient failures that open the breaker
+            reset_seconds: Time the breaker stays open before a probe call is allowed
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        """Current state: closed, open or half_open."""
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Check whether a call may go out now; in half-open state only one probe at a time does."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self._state = self.HALF_OPEN
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def release_probe(self):
+        """Give up a probe call that ended without an outcome (e.g. it was cancelled)."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        """Close the breaker after a call the service answered."""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> bool:
+        """Count a transient failure; returns True if this opened the breaker."""
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == self.HALF_OPEN or (self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+
+class RemoteService:
+    """Deadline, retry and circuit breaker policy for the calls to one remote service"""
+
+    def __init__(self, name: str, timeout: float = 10.0, retry: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None, retry_ratio: float = 0.1,
+                 limiter: Optional[RateLimiter] = None):
+        """
+        Initialize the policy
+
+        Args:
+            name: Service name, used in error messages
+            timeout: Deadline of a call, retries included, in seconds
+            retry: Backoff policy (default: RetryPolicy())
+            breaker: Circuit breaker (default: CircuitBreaker())
+            retry_ratio: Retry budget earned per successful call; retries are
+                         skipped when the budget is spent, so a struggling
+                         service sees at most about this many extra calls per call
+            limiter: Rate limiter every attempt waits on, slowed down by quota
+                     errors (429) from the service (default: no limit)
+        """
+        self.name = name
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.retry_ratio = retry_ratio
+        self.limiter = limiter
+        self.metrics = Metrics()
+        self._lock = threading.Lock()
+        self._retry_tokens = 10.0
+
+    def _check_breaker(self):
+        """Raise CircuitOpenError if the breaker does not let a call through."""
+        if not self.breaker.allow():
+            self.metrics.incr('short_circuited')
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit breaker open)")
+
+    def _admit(self, deadline: Optional[float]):
+        """Let an attempt through the breaker, then wait for a rate limit token (until the deadline, for retries)."""
+        self._check_breaker()
+        if self.limiter is not None:
+            try:
+                self.limiter.acquire(timeout=None if deadline is None else deadline - time.monotonic())
+            except BaseException:
+                self.breaker.release_probe()
+                raise
+
+    async def _aadmit(self, deadline: Optional[float]):
+        """Async variant of _admit."""
+        self._check_breaker()
+        if self.limiter is not None:
+            try:
+                await self.limiter.aacquire(timeout=None if deadline is None else deadline - time.monotonic())
+            except BaseException:
+                self.breaker.release_probe()
+                raise
+
+    def _succeeded(self):
+        """Record a call the service answered."""
+        self.breaker.record_success()
+        with self._lock:
+            self._retry_tokens = min(10.0, self._retry_tokens + self.retry_ratio)
+
+    def _failed_midstream(self, error: BaseException):
+        """Record a stream failing after its first chunk (not retried, since output was already sent)."""
+        self.metrics.incr('failures')
+        if is_retryable(error) and self.breaker.record_failure():
+            self.metrics.incr('breaker_opened')
+
+    def _retry_delay(self, error: BaseException, attempt: int, deadline: float) -> Optional[float]:
+        """
+        Record a failed attempt and decide whether to retry it
+
+        Returns:
+            Backoff before the next attempt, or None if the error should be raised
+        """
+        if not is_retryable(error):
+            # The service answered (e.g. a 400), so it is not degraded
+            self.breaker.record_success()
+            self.metrics.incr('errors')
+            return None
+        if status_code(error) == 429:
+            # Over quota: the service is healthy, so slow down instead of opening the breaker
+            self.metrics.incr('quota_errors')
+            self.breaker.release_probe()
+            if self.limiter is not None:
+                self.limiter.throttled()
+        elif self.breaker.record_failure():
+            self.metrics.incr('breaker_opened')
+        delay = self.retry.backoff(attempt)
+        with self._lock:
+            can_retry = (attempt + 1 < self.retry.max_attempts and self._retry_tokens >= 1
+                         and time.monotonic() + delay < deadline)
+            if can_retry:
+                self._retry_tokens -= 1
+        if not can_retry:
+            self.metrics.incr('failures')
+            return None
+        self.metrics.incr('retries')
+        return delay
+
+    def call(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Call func with retries under the service's deadline and circuit breaker
+
+        HTTP requests made through a create_session session within the call
+        are cut off at the deadline.
+
+        Args:
+            func, *args, **kwargs: The remote call
+            timeout: Deadline of this call (default: the service's timeout)
+
+        Raises:
+            CircuitOpenError: The breaker is open; nothing was sent
+            RateLimitedError: No rate limit token came in time; nothing was sent
+        """
+        deadline = None
+        attempt = 0
+        while True:
+            self._admit(deadline)
+            if deadline is None:
+                # Rate limit queueing comes before the deadline starts
+                deadline = time.monotonic() + (timeout or self.timeout)
+            token = _deadline.set(deadline)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+            else:
+                self._succeeded()
+                self.metrics.observe('call_seconds', time.perf_counter() - start)
+                return result
+            finally:
+                _deadline.reset(token)
+            time.sleep(delay)
+            attempt += 1
+
+    def stream(self, func: Callable[..., Iterator], *args, timeout: Optional[float] = None, **kwargs) -> Iterator:
+        """
+        Stream from func, retrying only until the first chunk arrives
+
+        The deadline applies to the first chunk; once output has been yielded,
+        a failure is raised to the caller.
+        """
+        deadline = None
+        attempt = 0
+        while True:
+            self._admit(deadline)
+            if deadline is None:
+                # Rate limit queueing comes before the deadline starts
+                deadline = time.monotonic() + (timeout or self.timeout)
+            token = _deadline.set(deadline)
+            try:
+                iterator = iter(func(*args, **kwargs))
+                first = next(iterator, None)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+            else:
+                break
+            finally:
+                _deadline.reset(token)
+            time.sleep(delay)
+            attempt += 1
+
+        # The service is answering once output starts
+        self._succeeded()
+        try:
+            if first is not None:
+                yield first
+            yield from iterator
+        except Exception as e:
+            self._failed_midstream(e)
+            raise
+
+    async def acall(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Async variant of call for coroutine functions; each attempt is cancelled at the deadline."""
+        deadline = None
+        attempt = 0
+        while True:
+            await self._aadmit(deadline)
+            if deadline is None:
+                # Rate limit queueing comes before the deadline starts
+                deadline = time.monotonic() + (timeout or self.timeout)
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(func(*args, **kwargs), max(0.0, deadline - time.monotonic()))
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+            else:
+                self._succeeded()
+                self.metrics.observe('call_seconds', time.perf_counter() - start)
+                return result
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def astream(self, func: Callable[..., AsyncIterator], *args, timeout: Optional[float] = None,
+                      **kwargs) -> AsyncIterator:
+        """Async variant of stream for async generator functions."""
+        deadline = None
+        attempt = 0
+        while True:
+            await self._aadmit(deadline)
+            if deadline is None:
+                # Rate limit queueing comes before the deadline starts
+                deadline = time.monotonic() + (timeout or self.timeout)
+            iterator = func(*args, **kwargs).__aiter__()
+            try:
+                first = await asyncio.wait_for(iterator.__anext__(), max(0.0, deadline - time.monotonic()))
+            except StopAsyncIteration:
+                self._succeeded()
+                return
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+            else:
+                break
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        self._succeeded()
+        try:
+            yield first
+            async for chunk in iterator:
+                yield chunk
+        except Exception as e:
+            self._failed_midstream(e)
+            raise
+
+    def snapshot(self) -> Dict:
+        """Metrics, breaker state and rate limiter of the service."""
+        return dict(self.metrics.snapshot(), breaker=self.breaker.state,
+                    rate_limiter=self.limiter.snapshot() if self.limiter is not None else None)
+
+
+class Transport:
+    """Shared HTTP session and per-service call policies of the Google API clients"""
+
+    def __init__(self, pool_size: int = 32, authenticate: bool = True, timeouts: Optional[Dict[str, float]] = None,
+                 retry: Optional[RetryPolicy] = None, failure_threshold: int = 5, reset_seconds: float = 30.0,
+                 rate_limits: Optional[Dict[str, float]] = None, max_wait: Optional[Dict[int, float]] = None):
+        """
+        Initialize the transport
+
+        Args:
+            pool_size: Keep-alive connections per host in the shared session
+            authenticate: Use Application Default Credentials (False: e.g. a local fake server)
+            timeouts: Per-call deadline by service name, in seconds (default: 10)
+            retry: Backoff policy shared by the services (default: RetryPolicy())
+            failure_threshold: Consecutive transient failures that open a service's breaker
+            reset_seconds: Time a breaker stays open before a probe call
+            rate_limits: Calls per second by service name, shared by all
+                         calls through this transport (default: no limits)
+            max_wait: Longest rate limit queueing time per request priority
+                      (default: see RateLimiter)
+        """
+        self.pool_size = pool_size
+        self.authenticate = authenticate
+        self.timeouts = timeouts or {}
+        self.retry = retry or RetryPolicy()
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.rate_limits = rate_limits or {}
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        self._services: Dict[str, RemoteService] = {}
+
+    @classmethod
+    def from_env(cls) -> "Transport":
+        """
+        Build a transport from environment variables
+
+        TRANSPORT_POOL_SIZE (default BLOCKING_POOL_SIZE or 32),
+        TRANSPORT_AUTHENTICATE (default true), TRANSLATE_TIMEOUT (default 5 s),
+        VERTEX_TIMEOUT (default 30 s), RETRY_MAX_ATTEMPTS (default 3),
+        RETRY_BASE_DELAY (default 0.25 s), BREAKER_FAILURES (default 5),
+        BREAKER_RESET_SECONDS (default 30), TRANSLATE_RATE_LIMIT and
+        VERTEX_RATE_LIMIT (calls per second, default 0: unlimited),
+        RATE_LIMIT_MAX_WAIT (interactive, default 2 s),
+        BATCH_RATE_LIMIT_MAX_WAIT (default 60 s)
+        """
+        rate_limits = {
+            'translate': float(os.getenv("TRANSLATE_RATE_LIMIT", "0")),
+            'vertex': float(os.getenv("VERTEX_RATE_LIMIT", "0")),
+        }
+        return cls(
+            pool_size=int(os.getenv("TRANSPORT_POOL_SIZE") or os.getenv("BLOCKING_POOL_SIZE", "32")),
+            authenticate=os.getenv("TRANSPORT_AUTHENTICATE", "true").lower() == "true",
+            timeouts={
+                'translate': float(os.getenv("TRANSLATE_TIMEOUT", "5")),
+                'vertex': float(os.getenv("VERTEX_TIMEOUT", "30")),
+            },
+            retry=RetryPolicy(
+                max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", "3")),
+                base_delay=float(os.getenv("RETRY_BASE_DELAY", "0.25")),
+            ),
+            failure_threshold=int(os.getenv("BREAKER_FAILURES", "5")),
+            reset_seconds=float(os.getenv("BREAKER_RESET_SECONDS", "30")),
+            rate_limits={name: rate for name, rate in rate_limits.items() if rate > 0},
+            max_wait={
+                INTERACTIVE: float(os.getenv("RATE_LIMIT_MAX_WAIT", "2")),
+                BATCH: float(os.getenv("BATCH_RATE_LIMIT_MAX_WAIT", "60")),
+            },
+        )
+
+    def session(self) -> requests.Session:
+        """The shared keep-alive session, created on first use."""
+        with self._lock:
+            if self._session is None:
+                self._session = create_session(self.pool_size, self.authenticate)
+            return self._session
+
+    def service(self, name: str) -> RemoteService:
+        """The call policy of a remote service, created on first use."""
+        with self._lock:
+            if name not in self._services:
+                rate = self.rate_limits.get(name)
+                self._services[name] = RemoteService(
+                    name,
+                    timeout=self.timeouts.get(name, 10.0),
+                    retry=self.retry,
+                    breaker=CircuitBreaker(self.failure_threshold, self.reset_seconds),
+                    limiter=RateLimiter(name, rate, max_wait=self.max_wait) if rate else None,
+                )
+            return self._services[name]
+
+    def snapshot(self) -> Dict:
+        """Metrics and breaker state per service."""
+        with self._lock:
+            services = dict(self._services)
+        return {name: service.snapshot() for name, service in services.items()}
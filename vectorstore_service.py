@@ -1,18 +1,47 @@
 """
 Vector store service using FAISS for FAQ retrieval
-Supports both OpenAI and HuggingFace embeddings
+Supports both OpenAI and HuggingFace embeddings, optionally fused with BM25
 """
 import json
 import os
-from typing import List, Dict
+from collections import defaultdict
+import numpy as np
+from typing import List, Dict, NamedTuple, Optional, Tuple
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 from langchain.docstore.document import Document
+from langchain_core.embeddings import Embeddings
+from answer_translations import AnswerTranslations
+from async_utils import run_blocking
+from bm25_index import BM25_FILE, BM25Index
+from embedding_backends import create_embeddings
+from embedding_cache import CachedEmbeddings
+from faq_dedup import DuplicateDetector
+from faq_store import (DOCSTORE_FILE, PositionMap, SQLiteDocstore, atomic_write, faq_id, index_lock, read_index,
+                       searchable_text, write_docstore, write_index)
+from index_builder import IndexBuilder
+from index_factory import IndexConfig, apply_search_params
+from multi_vector import AnswerVectors, MultiVectorConfig, aggregate
+
+
+MANIFEST_FILE = "manifest.json"
+RRF_K = 60  # Reciprocal rank fusion constant: score = sum of 1 / (RRF_K + rank)
+
+
+class SearchResults(NamedTuple):
+    """Compact results of a batched search"""
+    scores: np.ndarray  # (n_queries, k) float32 cosine similarities, -inf where there is no hit
+    ids: np.ndarray     # (n_queries, k) int64 FAISS positions, -1 where there is no hit
 
 
 class VectorStoreService:
     """Handles FAQ storage and retrieval using FAISS vector store"""
     
-    def __init__(self, faqs_file: str = "faqs.json", index_path: str = "faiss_index", use_openai: bool = False):
+    def __init__(self, faqs_file: str = "faqs.json", index_path: str = "faiss_index", use_openai: bool = False,
+                 index_config: Optional[IndexConfig] = None, embedding_cache_dir: Optional[str] = None,
+                 hybrid: bool = False, hybrid_candidates: int = 20, dedup: Optional[DuplicateDetector] = None,
+                 multi_vector: Optional[MultiVectorConfig] = None, multilingual: bool = False,
+                 embeddings: Optional[Embeddings] = None):
         """
         Initialize the vector store service
         
@@ -21,26 +50,52 @@ class VectorStoreService:
             index_path: Path to save/load FAISS index
             use_openai: If True, use OpenAI embeddings (requires credits).
                        If False, use free HuggingFace embeddings (default)
+            index_config: FAISS index type and parameters used when building
+                          (default: exact flat index). When loading, the saved
+                          build parameters win and only the query-time knobs
+                          (nprobe, ef_search) are taken from this config.
+            embedding_cache_dir: Directory of a persistent embedding cache, so
+                                 rebuilds and repeated queries reuse vectors
+                                 (default: no cache)
+            hybrid: Fuse FAISS results with BM25 keyword matches over
+                    questions and answers (reciprocal rank fusion)
+            hybrid_candidates: Results taken from each retriever before fusion
+            dedup: Collapse near-duplicate FAQs (paraphrased questions with
+                   near-identical answers) into one indexed entry each;
+                   the other questions are kept as variants of it
+            multi_vector: Also index answer (and answer chunk) vectors, so
+                          queries matching answer content find the FAQ;
+                          hits are aggregated per FAQ
+            multilingual: Embed with a multilingual HuggingFace model, so
+                          queries can be searched in their own language
+                          without translating them to English first
+            embeddings: Embedding model to use instead of the one selected by
+                        use_openai and multilingual (e.g. stubs.StubEmbeddings
+                        in tests); indexed under its model_name
         """
         self.faqs_file = faqs_file
         self.index_path = index_path
         self.use_openai = use_openai
+        self.index_config = index_config
+        self.hybrid = hybrid
+        self.hybrid_candidates = hybrid_candidates
+        self.dedup = dedup
+        self.multi_vector = multi_vector
+        self.multilingual = multilingual and not use_openai
+        self.answer_vectors: Optional[AnswerVectors] = None
+        # Pre-translated answers saved next to the index (see answer_translations.py)
+        self.answer_translations: Optional[AnswerTranslations] = None
+        self.bm25: Optional[BM25Index] = None
+        # Variant FAQ id -> (canonical document id, question); loaded for updates only
+        self.variants: Dict[str, Tuple[str, str]] = {}
         
-        if use_openai:
-            print("Using OpenAI embeddings...")
-            from langchain_openai import OpenAIEmbeddings
-            self.embeddings = OpenAIEmbeddings(
-                model="text-embedding-3-small",
-                api_key=os.getenv("OPENAI_API_KEY"),
-            )
+        if embeddings is not None:
+            self.embedding_model = getattr(embeddings, 'model_name', type(embeddings).__name__)
+            self.embeddings = embeddings
         else:
-            print("Using HuggingFace embeddings...")
-            from langchain_community.embeddings import HuggingFaceEmbeddings
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2",
-                model_kwargs={'device': 'cpu'},
-                encode_kwargs={'normalize_embeddings': True}
-            )
+            print("Using OpenAI embeddings..." if use_openai else "Using HuggingFace embeddings...")
+            self.embedding_model, self.embeddings = create_embeddings(use_openai, embedding_cache_dir,
+                                                                      multilingual=self.multilingual)
         
         self.vectorstore = None
         self.faqs = []
@@ -51,62 +106,526 @@ class VectorStoreService:
             self.faqs = json.load(f)
         return self.faqs
     
-    def create_vectorstore(self):
-        """Create and save FAISS vector store from FAQs"""
-        self.load_faqs()
-        
-        # Create documents from FAQs
-        documents = []
+    def _faq_documents(self) -> Dict[str, Document]:
+        """Documents for the loaded FAQs keyed by content hash (exact duplicates collapse)"""
+        documents = {}
         for faq in self.faqs:
-            doc = Document(
+            documents[faq_id(faq)] = Document(
                 page_content=faq['question'],
                 metadata={'answer': faq['answer']}
             )
-            documents.append(doc)
+        return documents
+    
+    def _faqs_signature(self) -> Optional[List[int]]:
+        """Modification time and size of the FAQ file, or None if it is missing"""
+        if not os.path.exists(self.faqs_file):
+            return None
+        stat = os.stat(self.faqs_file)
+        return [stat.st_mtime_ns, stat.st_size]
+    
+    def _read_manifest(self) -> Optional[Dict]:
+        """Read the manifest saved next to the index, or None if there is none"""
+        path = os.path.join(self.index_path, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _index_compatible(self, manifest: Optional[Dict]) -> bool:
+        """Whether a saved index is in the native format and matches the current embedding model"""
+        return (
+            manifest is not None
+            and manifest.get('embedding_model') == self.embedding_model
+            and manifest.get('dedup') == (self.dedup.to_dict() if self.dedup is not None else None)
+            and manifest.get('multi_vector') == (self.multi_vector.to_dict() if self.multi_vector is not None else None)
+            and os.path.exists(os.path.join(self.index_path, DOCSTORE_FILE))
+        )
+    
+    def _save(self):
+        """Write the index, the FAQ sidecar, the index configuration and the manifest"""
+        os.makedirs(self.index_path, exist_ok=True)
+        write_index(self.vectorstore.index, self.index_path)
+        write_docstore(self.index_path, self.vectorstore.index_to_docstore_id, self.vectorstore.docstore,
+                       self.variants)
+        if self.answer_vectors is not None:
+            self.answer_vectors.save(self.index_path)
         
-        print(f"Creating embeddings for {len(documents)} FAQs...")
+        # BM25 needs no embeddings, so it is simply rebuilt from the FAQ text
+        variant_questions = defaultdict(list)
+        for doc_id, question in self.variants.values():
+            variant_questions[doc_id].append(question)
+        bm25 = BM25Index()
+        for doc_id in self.vectorstore.index_to_docstore_id.values():
+            doc = self.vectorstore.docstore.search(doc_id)
+            bm25.add(doc_id, searchable_text(doc.page_content, doc.metadata['answer'], variant_questions[doc_id]))
+        bm25.save(os.path.join(self.index_path, BM25_FILE))
+        self.bm25 = bm25
+        self._write_metadata()
+    
+    def _write_metadata(self):
+        """Write the index configuration and the manifest"""
+        self.index_config.save(self.index_path)
+        manifest = {
+            'embedding_model': self.embedding_model,
+            'faqs_signature': self._faqs_signature(),
+            'dedup': self.dedup.to_dict() if self.dedup is not None else None,
+            'multi_vector': self.multi_vector.to_dict() if self.multi_vector is not None else None,
+        }
+        # Written last and atomically: readers see either the old or the new index as a whole
+        with atomic_write(os.path.join(self.index_path, MANIFEST_FILE)) as tmp_path:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+    
+    def create_vectorstore(self, builder: Optional[IndexBuilder] = None) -> Dict:
+        """
+        Create and save FAISS vector store from FAQs
+        
+        FAQs are streamed from the file and embedded in batches; see
+        IndexBuilder for batch size, worker and checkpoint settings. Other
+        processes building or updating the same index are waited for.
         
-        self.vectorstore = FAISS.from_documents(documents, self.embeddings)
-        self.vectorstore.save_local(self.index_path)
+        Args:
+            builder: Index builder (default: IndexBuilder.from_env)
+            
+        Returns:
+            Build statistics, including docs_per_sec and, with deduplication,
+            the compression_ratio of FAQs to indexed entries
+        """
+        with index_lock(self.index_path):
+            return self._create_vectorstore(builder)
+    
+    def _create_vectorstore(self, builder: Optional[IndexBuilder] = None) -> Dict:
+        """create_vectorstore with the index lock held."""
+        config = self.index_config or IndexConfig()
+        builder = builder or IndexBuilder.from_env(self.embeddings, use_openai=self.use_openai,
+                                                   multilingual=self.multilingual)
+        
+        print(f"Building {config.index_type} index from {self.faqs_file}...")
+        stats = builder.build(self.faqs_file, self.index_path, config, self.embedding_model,
+                              dedup=self.dedup, multi_vector=self.multi_vector)
+        self.index_config = config
+        self._write_metadata()
+        self._load_index()
         print(f"Vector store created and saved to {self.index_path}")
+        return stats
+    
+    def update_vectorstore(self) -> Tuple[int, int]:
+        """
+        Bring the saved index in line with the FAQ file without a full rebuild
         
-    def load_vectorstore(self):
-        """Load existing FAISS vector store"""
-        if os.path.exists(self.index_path):
-            self.vectorstore = FAISS.load_local(
-                self.index_path, 
-                self.embeddings,
-                allow_dangerous_deserialization=True
+        FAQs are identified by content hash, so only new or edited entries are
+        embedded; removed or edited-away entries are deleted from the index and
+        docstore in place. With deduplication, new FAQs that duplicate an
+        indexed one become its variants. HNSW indexes cannot remove vectors,
+        and a removed canonical FAQ would orphan its variants, so such
+        deletions fall back to create_vectorstore. Other processes building
+        or updating the same index are waited for.
+        
+        Returns:
+            Tuple of (added, removed) FAQ counts
+        """
+        with index_lock(self.index_path):
+            return self._update_vectorstore()
+    
+    def _update_vectorstore(self) -> Tuple[int, int]:
+        """update_vectorstore with the index lock held."""
+        if self.vectorstore is None or isinstance(self.vectorstore.docstore, SQLiteDocstore):
+            if not self._index_compatible(self._read_manifest()):
+                self._create_vectorstore()
+                return len(self.vectorstore.index_to_docstore_id), 0
+            self._load_index(writable=True)
+        
+        self.load_faqs()
+        documents = self._faq_documents()
+        current = set(self.vectorstore.index_to_docstore_id.values())
+        removed = [doc_id for doc_id in current if doc_id not in documents]
+        added = [doc_id for doc_id in documents if doc_id not in current and doc_id not in self.variants]
+        removed_variants = [variant_id for variant_id in self.variants if variant_id not in documents]
+        n_added, n_removed = len(added), len(removed) + len(removed_variants)
+        
+        if removed and self.index_config.index_type == 'hnsw':
+            print("HNSW indexes cannot remove entries. Rebuilding...")
+            self._create_vectorstore()
+            return n_added, n_removed
+        for variant_id in removed_variants:
+            del self.variants[variant_id]
+        if set(removed) & {doc_id for doc_id, _ in self.variants.values()}:
+            print("Removed FAQs have near-duplicate variants. Rebuilding...")
+            self._create_vectorstore()
+            return n_added, n_removed
+        
+        if removed:
+            self._remove_documents(removed)
+        if added:
+            print(f"Creating embeddings for {len(added)} new or changed FAQs...")
+            vectors = np.asarray(
+                self.embeddings.embed_documents([documents[doc_id].page_content for doc_id in added]),
+                dtype=np.float32
+            )
+            if self.dedup is not None:
+                added, vectors = self._collapse_added(added, documents, vectors)
+            if added:
+                self._add_documents({doc_id: documents[doc_id] for doc_id in added}, vectors)
+        
+        self._save()
+        print(f"Vector store updated: {n_added} added, {n_removed} removed")
+        return n_added, n_removed
+    
+    def _collapse_added(self, added: List[str], documents: Dict[str, Document],
+                        vectors: np.ndarray) -> Tuple[List[str], np.ndarray]:
+        """Record new FAQs that duplicate an indexed (or another new) FAQ as variants; return the rest"""
+        id_map = self.vectorstore.index_to_docstore_id
+        docstore = self.vectorstore.docstore
+        matches = self.dedup.match(
+            vectors, [documents[doc_id].metadata['answer'] for doc_id in added],
+            index=self.vectorstore.index,
+            index_answer=lambda position: docstore.search(id_map[position]).metadata['answer'],
+        )
+        keep = []
+        for row, match in enumerate(matches):
+            if match is None:
+                keep.append(row)
+                continue
+            source, position = match
+            canonical = id_map[position] if source == 'index' else added[position]
+            self.variants[added[row]] = (canonical, documents[added[row]].page_content)
+        return [added[row] for row in keep], vectors[keep]
+    
+    def _remove_documents(self, doc_ids: List[str]):
+        """Delete entries from the FAISS index, docstore and answer index"""
+        targets = set(doc_ids)
+        positions = [pos for pos, doc_id in self.vectorstore.index_to_docstore_id.items() if doc_id in targets]
+        if self.index_config.index_type == 'flat':
+            if self.answer_vectors is not None:
+                # Remaining positions keep their order and are renumbered from 0
+                old_positions = np.asarray(sorted(self.vectorstore.index_to_docstore_id), dtype=np.int64)
+                remaining = old_positions[~np.isin(old_positions, positions)]
+                renumber = np.full(old_positions.max() + 1, -1, dtype=np.int64)
+                renumber[remaining] = np.arange(len(remaining))
+                self.answer_vectors.remove_owners(positions, renumber)
+            # Flat indexes compact on removal; LangChain renumbers positions to match
+            self.vectorstore.delete(doc_ids)
+            return
+        
+        # IVF indexes keep explicit ids, so remove by id and leave the others untouched
+        if self.answer_vectors is not None:
+            self.answer_vectors.remove_owners(positions)
+        self.vectorstore.index.remove_ids(np.asarray(positions, dtype=np.int64))
+        for pos in positions:
+            del self.vectorstore.index_to_docstore_id[pos]
+        self.vectorstore.docstore.delete(doc_ids)
+    
+    def _add_documents(self, documents: Dict[str, Document], vectors: np.ndarray):
+        """Append entries to the FAISS index, docstore and answer index"""
+        id_map = self.vectorstore.index_to_docstore_id
+        if self.index_config.index_type in ('flat', 'hnsw'):
+            start = self.vectorstore.index.ntotal
+            self.vectorstore.add_embeddings(
+                list(zip([doc.page_content for doc in documents.values()], vectors.tolist())),
+                metadatas=[doc.metadata for doc in documents.values()],
+                ids=list(documents)
             )
-            print(f"Vector store loaded from {self.index_path}")
         else:
-            print(f"No vector store found at {self.index_path}. Creating new one...")
-            self.create_vectorstore()
+            # IVF ids can be sparse after removals, so assign fresh ones past the largest
+            start = max(id_map) + 1 if id_map else 0
+            positions = np.arange(start, start + len(documents), dtype=np.int64)
+            self.vectorstore.index.add_with_ids(np.ascontiguousarray(vectors), positions)
+            self.vectorstore.docstore.add(documents)
+            id_map.update(zip(positions.tolist(), documents))
+        
+        if self.answer_vectors is not None:
+            texts, owners = [], []
+            for position, doc in enumerate(documents.values(), start=start):
+                for text in self.multi_vector.answer_texts(doc.metadata['answer']):
+                    texts.append(text)
+                    owners.append(position)
+            self.answer_vectors.add(np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32), owners)
     
-    def search(self, query: str, k: int = 1) -> List[Dict]:
+    def _load_index(self, writable: bool = False):
         """
-        Search for most relevant FAQs
+        Load the saved index and apply query-time parameters
+        
+        Args:
+            writable: Read the index and FAQs into memory so entries can be
+                      added or removed. Otherwise the index is memory-mapped
+                      and FAQs are fetched from the sidecar on demand.
+        """
+        index = read_index(self.index_path, writable=writable)
+        docstore = SQLiteDocstore(self.index_path)
+        self.variants = {}
+        if writable:
+            documents, index_to_docstore_id = docstore.load_all()
+            self.variants = docstore.load_variants()
+            docstore.close()
+            docstore = InMemoryDocstore(documents)
+        else:
+            index_to_docstore_id = PositionMap(docstore)
+        self.vectorstore = FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+        bm25_path = os.path.join(self.index_path, BM25_FILE)
+        self.bm25 = BM25Index.load(bm25_path) if os.path.exists(bm25_path) else None
+        config = IndexConfig.load(self.index_path) or IndexConfig()
+        if self.index_config is not None:
+            config.nprobe = self.index_config.nprobe
+            config.ef_search = self.index_config.ef_search
+        apply_search_params(self.vectorstore.index, config)
+        self.index_config = config
+        self.answer_vectors = (
+            AnswerVectors.load(self.index_path, config, writable=writable) if self.multi_vector is not None else None
+        )
+        self.answer_translations = None if writable else AnswerTranslations.load(self.index_path)
+    
+    def load_vectorstore(self):
+        """
+        Load existing FAISS vector store
+        
+        The index is memory-mapped read-only, so processes serving the same
+        index share its pages, and FAQs are read from the SQLite sidecar only
+        when they are returned. An index built with another embedding model (or before manifests
+        existed) is rebuilt; an index older than the FAQ file is updated
+        incrementally. When several processes start at once, one of them
+        rebuilds or updates the index under the index lock and the others
+        load its result.
+        """
+        with index_lock(self.index_path, shared=True):
+            if self._index_current(self._read_manifest()):
+                self._load_index()
+                print(f"Vector store loaded from {self.index_path} ({self.index_config.index_type} index)")
+                return
+        
+        with index_lock(self.index_path):
+            # Another process may have rebuilt or updated the index while this one waited
+            manifest = self._read_manifest()
+            if manifest is None:
+                print(f"No vector store found at {self.index_path}. Creating new one...")
+                self._create_vectorstore()
+            elif not self._index_compatible(manifest):
+                print(f"Vector store at {self.index_path} has no manifest or another embedding model. Rebuilding...")
+                self._create_vectorstore()
+            elif not self._index_current(manifest):
+                print(f"{self.faqs_file} changed since the index was saved. Updating...")
+                self._update_vectorstore()
+                self._load_index()
+            else:
+                self._load_index()
+            print(f"Vector store loaded from {self.index_path} ({self.index_config.index_type} index)")
+    
+    def _index_current(self, manifest: Optional[Dict]) -> bool:
+        """Whether a saved index is compatible and up to date with the FAQ file"""
+        if not self._index_compatible(manifest):
+            return False
+        signature = self._faqs_signature()
+        return signature is None or manifest.get('faqs_signature') == signature
+    
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """
+        Change query-time knobs of the loaded index
+        
+        Args:
+            nprobe: IVF clusters visited per query
+            ef_search: HNSW candidate list size per query
+        """
+        if self.vectorstore is None:
+            self.load_vectorstore()
+        if nprobe is not None:
+            self.index_config.nprobe = nprobe
+        if ef_search is not None:
+            self.index_config.ef_search = ef_search
+        apply_search_params(self.vectorstore.index, self.index_config)
+        if self.answer_vectors is not None:
+            apply_search_params(self.answer_vectors.index, self.index_config)
+    
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a query with the configured embedding model
         
         Args:
             query: User query (should be in English)
-            k: Number of results to return
             
         Returns:
-            List of matching FAQ dictionaries
+            Query embedding vector
+        """
+        return self.embeddings.embed_query(query)
+    
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed many queries in one batched call to the embedding model
+        
+        Args:
+            queries: User queries (should be in English)
+            
+        Returns:
+            List of query embedding vectors
+        """
+        if isinstance(self.embeddings, CachedEmbeddings):
+            return self.embeddings.embed_queries(queries)
+        return self.embeddings.embed_documents(queries)
+    
+    def search_batch(self, queries: List[str], k: int = 1) -> SearchResults:
+        """
+        Search for the most relevant FAQs of many queries at once
+        
+        All queries are encoded in one embedding call and searched with a
+        single FAISS search over the (n, d) query matrix.
+        
+        Args:
+            queries: User queries (should be in English)
+            k: Number of results per query
+            
+        Returns:
+            SearchResults arrays; resolve ids with get_faq
+        """
+        return self.search_batch_by_vectors(self.embed_queries(queries), k=k)
+    
+    def search_batch_by_vectors(self, embeddings, k: int = 1) -> SearchResults:
+        """
+        Search with precomputed query embeddings in a single FAISS call
+        
+        Args:
+            embeddings: (n, d) array or list of query embeddings
+            k: Number of results per query
+            
+        Returns:
+            SearchResults arrays; resolve ids with get_faq
+        """
+        if self.vectorstore is None:
+            self.load_vectorstore()
+        
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        distances, ids = self.vectorstore.index.search(vectors, k)
+        # Embeddings are unit length, so squared L2 distance d maps to cosine 1 - d / 2
+        scores = np.where(ids >= 0, 1.0 - distances / 2.0, -np.inf).astype(np.float32)
+        if self.answer_vectors is not None:
+            # Enough answer hits that k distinct FAQs survive aggregation
+            answer_scores, owners = self.answer_vectors.search(vectors, k * self.answer_vectors.vectors_per_faq)
+            scores, ids = aggregate(
+                np.concatenate([scores, answer_scores], axis=1),
+                np.concatenate([ids.astype(np.int64), owners], axis=1),
+                k, self.multi_vector.aggregation
+            )
+        return SearchResults(scores=scores, ids=ids.astype(np.int64))
+    
+    def get_faq(self, position: int) -> Dict:
+        """
+        Look up the FAQ stored at a FAISS position
+        
+        Args:
+            position: Index position, as returned in SearchResults.ids
+            
+        Returns:
+            Dictionary with 'question' and 'answer' keys
+        """
+        docstore = self.vectorstore.docstore
+        if isinstance(docstore, SQLiteDocstore):
+            doc = docstore.get_by_position(position)
+        else:
+            doc = docstore.search(self.vectorstore.index_to_docstore_id[int(position)])
+        return {'question': doc.page_content, 'answer': doc.metadata['answer']}
+    
+    def search_by_vectors(self, embeddings: List[List[float]], k: int = 1,
+                          texts: Optional[List[str]] = None) -> List[List[Dict]]:
+        """
+        Search for the most relevant FAQs of many queries in one FAISS call
+        
+        Args:
+            embeddings: Query embeddings, e.g. from embed_queries
+            k: Number of results per query
+            texts: Query texts; with hybrid search enabled, dense results are
+                   fused with BM25 matches for these texts
+            
+        Returns:
+            One list of scored FAQ dictionaries per query (as in search_with_scores)
         """
         if self.vectorstore is None:
             self.load_vectorstore()
+        if texts is not None and self.hybrid and self.bm25 is not None:
+            results = self.search_batch_by_vectors(embeddings, k=max(k, self.hybrid_candidates))
+            return [
+                self._fuse(text, row_scores, row_ids, k)
+                for text, row_scores, row_ids in zip(texts, results.scores, results.ids)
+            ]
         
-        results = self.vectorstore.similarity_search(query, k=k)
+        results = self.search_batch_by_vectors(embeddings, k=k)
+        
+        all_matches = []
+        for row_scores, row_ids in zip(results.scores, results.ids):
+            matches = []
+            for score, position in zip(row_scores, row_ids):
+                if position < 0:
+                    continue
+                matches.append(dict(self.get_faq(position), score=float(score)))
+            all_matches.append(matches)
+        
+        return all_matches
+    
+    def _fuse(self, text: str, row_scores: np.ndarray, row_ids: np.ndarray, k: int) -> List[Dict]:
+        """
+        Fuse one query's dense candidates with its BM25 matches by reciprocal rank
+        
+        Returns:
+            Top k FAQ dictionaries in fused order. 'score' stays the cosine
+            similarity; a FAQ found only by BM25 gets the weakest dense
+            candidate's score, an upper bound on its own.
+        """
+        dense = {}
+        for score, position in zip(row_scores, row_ids):
+            if position >= 0:
+                dense[self.vectorstore.index_to_docstore_id[int(position)]] = float(score)
+        lexical = self.bm25.search(text, self.hybrid_candidates)
+        
+        fused = defaultdict(float)
+        for ranking in (list(dense), [doc_id for doc_id, _ in lexical]):
+            for rank, doc_id in enumerate(ranking, start=1):
+                fused[doc_id] += 1.0 / (RRF_K + rank)
+        
+        floor = min(dense.values()) if dense else 0.0
         matches = []
-        for doc in results:
+        for doc_id in sorted(fused, key=fused.get, reverse=True)[:k]:
+            doc = self.vectorstore.docstore.search(doc_id)
             matches.append({
                 'question': doc.page_content,
-                'answer': doc.metadata['answer']
+                'answer': doc.metadata['answer'],
+                'score': dense.get(doc_id, floor),
+                'rrf_score': fused[doc_id],
             })
-        
         return matches
     
+    def search_with_scores(self, query: str, k: int = 1, embedding: Optional[List[float]] = None) -> List[Dict]:
+        """
+        Search for most relevant FAQs, keeping similarity scores
+        
+        Args:
+            query: User query (should be in English)
+            k: Number of results to return
+            embedding: Precomputed embedding of the query, to avoid embedding it again
+            
+        Returns:
+            List of matching FAQ dictionaries with 'question', 'answer' and
+            'score' (cosine similarity, higher is better), best match first.
+            Hybrid results are ordered by fused rank and also carry 'rrf_score'.
+        """
+        if embedding is None:
+            embedding = self.embed_query(query)
+        return self.search_by_vectors([embedding], k=k, texts=[query])[0]
+    
+    def search(self, query: str, k: int = 1, embedding: Optional[List[float]] = None) -> List[Dict]:
+        """
+        Search for most relevant FAQs
+        
+        Args:
+            query: User query (should be in English)
+            k: Number of results to return
+            embedding: Precomputed embedding of the query, to avoid embedding it again
+            
+        Returns:
+            List of matching FAQ dictionaries
+        """
+        return [
+            {'question': match['question'], 'answer': match['answer']}
+            for match in self.search_with_scores(query, k=k, embedding=embedding)
+        ]
+    
     def get_best_match(self, query: str) -> Dict:
         """
         Get the single best matching FAQ.
@@ -120,16 +639,29 @@ class VectorStoreService:
         results = self.search(query, k=1)
         return results[0] if results else {'question': '', 'answer': 'I could not find a relevant answer.'}
     
-    def get_relevant_context(self, query: str, k: int = 5) -> List[Dict]:
+    def get_relevant_context(self, query: str, k: int = 5, embedding: Optional[List[float]] = None) -> List[Dict]:
         """
         Get multiple relevant FAQs for better context
         
         Args:
             query: User query (should be in English)
             k: Number of relevant FAQs to retrieve (default: 5)
+            embedding: Precomputed embedding of the query
             
         Returns:
-            List of matching FAQ dictionaries
+            List of matching FAQ dictionaries, including similarity 'score'
         """
-        results = self.search(query, k=k)
+        results = self.search_with_scores(query, k=k, embedding=embedding)
         return results if results else []
+    
+    async def aembed_query(self, query: str) -> List[float]:
+        """Async variant of embed_query; encoding runs on the shared thread pool."""
+        return await run_blocking(self.embed_query, query)
+    
+    async def asearch_with_scores(self, query: str, k: int = 1, embedding: Optional[List[float]] = None) -> List[Dict]:
+        """Async variant of search_with_scores; encoding and FAISS search run on the shared thread pool."""
+        return await run_blocking(self.search_with_scores, query, k, embedding)
+    
+    async def aget_relevant_context(self, query: str, k: int = 5, embedding: Optional[List[float]] = None) -> List[Dict]:
+        """Async variant of get_relevant_context."""
+        return await run_blocking(self.get_relevant_context, query, k, embedding)
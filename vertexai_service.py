@@ -2,32 +2,63 @@
 Vertex AI service for answer generation using Gemini
 """
 import os
+import time
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Union
 from langchain_google_vertexai import ChatVertexAI
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
+from async_utils import run_blocking
+from context_builder import NO_CONTEXT_TEXT, ContextBuilder
+from metrics import Metrics
+from rate_limiter import RateLimitedError
+from transport import CircuitOpenError, Transport
 
 
 class VertexAIService:
     """Handles answer generation using Google Vertex AI (Gemini)"""
     
-    def __init__(self, project_id: str, location: str = "us-central1"):
+    def __init__(self, project_id: str, location: str = "us-central1", llm: Optional[Runnable] = None,
+                 context_builder: Optional[ContextBuilder] = None, transport: Optional[Transport] = None,
+                 api_endpoint: Optional[str] = None):
         """
         Initialize Vertex AI service
         
         Args:
             project_id: GCP project ID
             location: GCP region (default: us-central1)
+            llm: Chat model to use instead of Gemini (e.g. a stub for offline testing)
+            context_builder: Selects the FAQs sent as context when answers are
+                             generated from retrieved FAQs (default: ContextBuilder())
+            transport: Shared transport giving Gemini calls a deadline, retries,
+                       a circuit breaker and a rate limit; while the breaker is
+                       open or no rate limit token comes in time, calls fail
+                       fast so the pipeline serves the FAQ fallback
+                       (default: the client library's own retries)
+            api_endpoint: Vertex AI API endpoint (e.g. a local fake server)
         """
         self.project_id = project_id
         self.location = location
+        self.context_builder = context_builder if context_builder is not None else ContextBuilder()
         
-        self.llm = ChatVertexAI(
-            model_name="gemini-2.5-flash",
-            temperature=0.4,
-            max_output_tokens=2048,
-            project=project_id,
-            location=location
-        )
+        self.remote_service = transport.service('vertex') if transport is not None else None
+        
+        if llm is None:
+            llm_kwargs = {}
+            if self.remote_service is not None:
+                # Retries and deadlines are handled by the transport; the gRPC channel already keeps its connection alive
+                llm_kwargs.update(max_retries=0, timeout=self.remote_service.timeout)
+            if api_endpoint:
+                llm_kwargs.update(api_endpoint=api_endpoint, api_transport="rest")
+            llm = ChatVertexAI(
+                model_name="gemini-2.5-flash",
+                temperature=0.4,
+                max_output_tokens=2048,
+                project=project_id,
+                location=location,
+                **llm_kwargs
+            )
+        self.llm = llm
         
         self.prompt = ChatPromptTemplate.from_messages([
             ("system", """You are a helpful AI assistant with access to a knowledge base.
@@ -43,43 +74,224 @@ Based on this information, answer the user's question directly and accurately.
 - Be conversational, natural, and helpful
 - Don't just repeat the FAQ answers - actually answer what the user is asking
 - Synthesize information from multiple sources if relevant
-- Keep answers concise but complete"""),
+- Keep answers concise but complete
+- Write the answer in the language with code '{language}', whatever the language of the information above"""),
             ("user", "{question}")
         ])
         
         self.chain = self.prompt | self.llm | StrOutputParser()
+        self.metrics = Metrics()
+    
+    @staticmethod
+    def _has_input(question: str, context: str) -> bool:
+        """Check that there is a question and usable context to answer it from."""
+        if not question or not question.strip():
+            return False
+        if not context or context.strip() == NO_CONTEXT_TEXT:
+            return False
+        return True
     
-    def generate_answer(self, question: str, context: str) -> str:
+    def build_context(self, context: Union[str, List[Dict]]) -> str:
+        """
+        Turn retrieved FAQs into the context block and record its size
+        
+        Args:
+            context: Retrieved FAQs (best first), assembled by the context
+                     builder, or an already formatted context string
+            
+        Returns:
+            Context string sent to the model
+        """
+        if not isinstance(context, str):
+            context = self.context_builder.build(context).text
+        if context and context.strip() != NO_CONTEXT_TEXT:
+            self.metrics.observe('context_tokens', self.context_builder.token_counter(context))
+        return context
+    
+    def _invoke(self, inputs: Dict) -> str:
+        """Run the chain, through the transport when there is one."""
+        if self.remote_service is None:
+            return self.chain.invoke(inputs)
+        return self.remote_service.call(self.chain.invoke, inputs)
+    
+    def _stream(self, inputs: Dict) -> Iterator[str]:
+        """Stream the chain, through the transport when there is one."""
+        if self.remote_service is None:
+            return self.chain.stream(inputs)
+        return self.remote_service.stream(self.chain.stream, inputs)
+    
+    async def _ainvoke(self, inputs: Dict) -> str:
+        """Async variant of _invoke."""
+        if self.remote_service is None:
+            return await self.chain.ainvoke(inputs)
+        return await self.remote_service.acall(self.chain.ainvoke, inputs)
+    
+    def _astream(self, inputs: Dict) -> AsyncIterator[str]:
+        """Async variant of _stream."""
+        if self.remote_service is None:
+            return self.chain.astream(inputs)
+        return self.remote_service.astream(self.chain.astream, inputs)
+    
+    @staticmethod
+    def clean_answer(response: str) -> Optional[str]:
+        """Strip a generated (or fully streamed) answer, mapping empty or error-like output to None."""
+        result = response.strip()
+        if not result or "error" in result.lower() and "encountered" in result.lower():
+            return None
+        return result
+    
+    def _fall_back(self, error: Exception, action: str, question: str, context: Union[str, List[Dict]]):
+        """Record a failed generation, for which the pipeline serves the FAQ fallback."""
+        if isinstance(error, CircuitOpenError):
+            # Vertex AI is degraded: fail fast to the FAQ fallback
+            self.metrics.incr('circuit_open_fallbacks')
+        elif isinstance(error, RateLimitedError):
+            # Over our share of the quota: the FAQ fallback beats queueing longer
+            self.metrics.incr('rate_limited_fallbacks')
+        else:
+            print(f"Error {action} answer: {error}")
+            print(f"Question: {question[:100]}")
+            print(f"Context length: {len(context) if context else 0}")
+    
+    def _check_streamed(self, parts: List[str]):
+        """Apply the clean_answer check to a finished stream, whose chunks were already yielded."""
+        if parts and self.clean_answer("".join(parts)) is None:
+            self.metrics.incr('rejected_streams')
+    
+    def generate_answer(self, question: str, context: Union[str, List[Dict]], language: str = 'en') -> str:
         """
         Generate answer using Vertex AI with retrieved context
         
         Args:
-            question: User's question (in English)
-            context: String containing formatted context from multiple FAQs
+            question: User's question (in English, or in its own language
+                      with cross-lingual retrieval)
+            context: Retrieved FAQs (see build_context) or a formatted context string
+            language: Language code of the answer
             
         Returns:
             Generated answer, or None if error occurred (for fallback handling)
         """
         try:
-            if not question or not question.strip():
-                return None
-            
-            if not context or context.strip() == "No relevant information found in the knowledge base.":
+            context = self.build_context(context)
+            if not self._has_input(question, context):
                 return None
             
-            response = self.chain.invoke({
+            response = self._invoke({
                 "context": context,
-                "question": question
+                "question": question,
+                "language": language
             })
-            result = response.strip()
+            return self.clean_answer(response)
+        except Exception as e:
+            self._fall_back(e, "generating", question, context)
+            return None
+    
+    def stream_answer(self, question: str, context: Union[str, List[Dict]], language: str = 'en') -> Iterator[str]:
+        """
+        Generate answer using Vertex AI, yielding text chunks as they arrive
+        
+        Args:
+            question: User's question (in English, or in its own language
+                      with cross-lingual retrieval)
+            context: Retrieved FAQs (see build_context) or a formatted context string
+            language: Language code of the answer
             
-            if not result or "error" in result.lower() and "encountered" in result.lower():
+        Yields:
+            Chunks of the generated answer. Nothing is yielded if the input is
+            unusable or the call fails before the first chunk (for fallback
+            handling); failures after the first chunk are re-raised. Once the
+            stream finishes, the whole text gets the clean_answer check;
+            callers should serve the fallback if it fails
+        """
+        context = self.build_context(context)
+        if not self._has_input(question, context):
+            return
+        
+        start = time.perf_counter()
+        parts = []
+        try:
+            for chunk in self._stream({
+                "context": context,
+                "question": question,
+                "language": language
+            }):
+                if not chunk:
+                    continue
+                if not parts:
+                    self.metrics.observe('time_to_first_token', time.perf_counter() - start)
+                parts.append(chunk)
+                yield chunk
+            self.metrics.observe('generation_seconds', time.perf_counter() - start)
+            self._check_streamed(parts)
+        except Exception as e:
+            self._fall_back(e, "streaming", question, context)
+            if parts:
+                raise
+    
+    async def agenerate_answer(self, question: str, context: Union[str, List[Dict]], language: str = 'en') -> str:
+        """
+        Async variant of generate_answer, using the chain's native async support
+        
+        Args:
+            question: User's question (in English, or in its own language
+                      with cross-lingual retrieval)
+            context: Retrieved FAQs (see build_context) or a formatted context string
+            language: Language code of the answer
+            
+        Returns:
+            Generated answer, or None if error occurred (for fallback handling)
+        """
+        try:
+            if not isinstance(context, str):
+                # Deduplication embeds the answers: keep it off the event loop
+                context = await run_blocking(self.build_context, context)
+            else:
+                context = self.build_context(context)
+            if not self._has_input(question, context):
                 return None
             
-            return result
+            response = await self._ainvoke({
+                "context": context,
+                "question": question,
+                "language": language
+            })
+            return self.clean_answer(response)
         except Exception as e:
-            error_msg = str(e)
-            print(f"Error generating answer: {error_msg}")
-            print(f"Question: {question[:100]}")
-            print(f"Context length: {len(context) if context else 0}")
+            self._fall_back(e, "generating", question, context)
             return None
+    
+    async def astream_answer(self, question: str, context: Union[str, List[Dict]], language: str = 'en') -> AsyncIterator[str]:
+        """
+        Async variant of stream_answer
+        
+        Yields:
+            Chunks of the generated answer, with the same fallback behaviour as stream_answer
+        """
+        if not isinstance(context, str):
+            # Deduplication embeds the answers: keep it off the event loop
+            context = await run_blocking(self.build_context, context)
+        else:
+            context = self.build_context(context)
+        if not self._has_input(question, context):
+            return
+        
+        start = time.perf_counter()
+        parts = []
+        try:
+            async for chunk in self._astream({
+                "context": context,
+                "question": question,
+                "language": language
+            }):
+                if not chunk:
+                    continue
+                if not parts:
+                    self.metrics.observe('time_to_first_token', time.perf_counter() - start)
+                parts.append(chunk)
+                yield chunk
+            self.metrics.observe('generation_seconds', time.perf_counter() - start)
+            self._check_streamed(parts)
+        except Exception as e:
+            self._fall_back(e, "streaming", question, context)
+            if parts:
+                raise